@@ -0,0 +1,107 @@
+"""
+Нагрузочный тест обработчика "✅ Выполнено": синхронные вызовы базы данных
+внутри event loop против асинхронного API database.async_db.
+
+Каждый смоделированный обработчик делает то же, что handle_habit_done:
+mark_habit + get_user + get_habits и два "сетевых" ожидания (ответ
+на callback и редактирование сообщения). Параллельно приходят лёгкие
+обновления без обращения к базе (/help): их задержка показывает, насколько
+запросы к базе задерживают остальных пользователей. Печатает p50/p99.
+
+Задержка считается от момента, когда обновление должно было прийти по
+расписанию, а не от начала обработчика: пока синхронный запрос держит
+event loop, новые обновления ждут в очереди, и это ожидание тоже входит
+в задержку (иначе заблокированный loop сам занижает свои замеры).
+
+Запуск: python -m benchmarks.bench_async_handlers
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import database.async_db as adb
+import database.database as db
+from database.connection import close_all_connections
+
+USERS = 200
+UPDATES = 4000
+RATE = 2000          # обновлений в секунду
+NETWORK_DELAY = 0.002
+
+
+async def sync_handler(arrived: float, telegram_id: int, habit_id: int) -> float:
+    db.mark_habit(habit_id, "done")
+    await asyncio.sleep(NETWORK_DELAY)
+    user = db.get_user(telegram_id)
+    db.get_habits(user[0])
+    await asyncio.sleep(NETWORK_DELAY)
+    return time.perf_counter() - arrived
+
+
+async def async_handler(arrived: float, telegram_id: int, habit_id: int) -> float:
+    await adb.mark_habit(habit_id, "done")
+    await asyncio.sleep(NETWORK_DELAY)
+    user = await adb.get_user(telegram_id)
+    await adb.get_habits(user[0])
+    await asyncio.sleep(NETWORK_DELAY)
+    return time.perf_counter() - arrived
+
+
+async def light_handler(arrived: float) -> float:
+    await asyncio.sleep(NETWORK_DELAY)
+    return time.perf_counter() - arrived
+
+
+async def run_load(handler, habits):
+    """Подаёт обновления с постоянной частотой RATE, через одно — лёгкие"""
+    db_tasks, light_tasks = [], []
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        arrived = start + i / RATE
+        delay = arrived - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if i % 2:
+            light_tasks.append(asyncio.create_task(light_handler(arrived)))
+        else:
+            telegram_id, habit_id = habits[i % len(habits)]
+            db_tasks.append(asyncio.create_task(handler(arrived, telegram_id, habit_id)))
+    return await asyncio.gather(*db_tasks), await asyncio.gather(*light_tasks)
+
+
+def report(name: str, latencies: list) -> float:
+    """Печатает p50/p99 и возвращает p99, мс"""
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{name:<36} p50={p50:8.1f} ms   p99={p99:8.1f} ms")
+    return p99
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        habits = []
+        for telegram_id in range(1, USERS + 1):
+            user_id = db.add_user_if_not_exists(telegram_id, "", "", "")
+            habits.append((telegram_id, db.add_habit(user_id, "Зарядка")))
+
+        p99 = {}
+        for name, handler in (("sync db in event loop", sync_handler),
+                              ("database.async_db", async_handler)):
+            db_latencies, light_latencies = asyncio.run(run_load(handler, habits))
+            p99[name] = (report(f"{name}: done", db_latencies), report(f"{name}: /help", light_latencies))
+        # Асинхронный API не хуже ни для нажатий, ни для остальных пользователей
+        sync_done, sync_help = p99["sync db in event loop"]
+        async_done, async_help = p99["database.async_db"]
+        assert async_done < sync_done and async_help < sync_help, p99
+
+        adb.shutdown()
+        close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Бенчмарк DateParser.parse_date и сверка с прежней реализацией
+
+Прежний алгоритм (re.search по каждому паттерну по очереди) воспроизведён
+здесь как эталон: на корпусе фраз результаты должны совпадать полностью.
+Первые символы из таблицы паттернов проверяются на каждом совпадении.
+
+Запуск: python -m benchmarks.bench_date_parser
+"""
+import re
+import time
+
+from utils.date_parser import DateParser
+from utils.clock import clock
+
+CORPUS = [
+    "сегодня", "Завтра", "вчера", "today", "tomorrow в 9 утра",
+    "25.12.2024", "2024-12-25", "1/3", "31.02.2024", "31.02", "29.02.2023 или 01.03",
+    "через 3 дня", "через 1 день", "через 2 недели", "через 5 месяцев",
+    "понедельник", "в пятницу", "Пт и вс", "вторник и понедельник", "sunday",
+    "читать 30 минут каждый день", "пить воду", "бегать по утрам в 7:30",
+    "созвон 12.05 и 25.12.2024", "1.2.3.2024", "2024.13.01", "0.0",
+    "встреча в среду через 2 дня", "ср", "вс 10.10", "через 10 дней, а не завтра",
+    "", "   ", "12", "abc", "пн-пт", "долг 15-20", "20.5.2025 в 19:00",
+]
+
+
+class LegacyDateParser(DateParser):
+    def parse_date(self, text):
+        text = text.lower().strip()
+        today = clock.midnight()
+        for pattern, parser_func in self.date_patterns.items():
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                try:
+                    return parser_func(match, today)
+                except (ValueError, TypeError):
+                    continue
+        return None
+
+
+def measure(name: str, parser, texts, rounds: int = 200):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            parser.parse_date(text)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {rounds * len(texts) / elapsed:>12,.0f} parses/sec")
+
+
+def main():
+    parser, legacy = DateParser(cache_size=0), LegacyDateParser()
+    # Фразы корпуса и все их подфразы до 4 слов, как в TextParser
+    phrases = set(CORPUS)
+    for text in CORPUS:
+        words = text.split()
+        for i in range(len(words)):
+            for j in range(i + 1, min(i + 5, len(words) + 1)):
+                phrases.add(' '.join(words[i:j]))
+    phrases = sorted(phrases)
+
+    for text in phrases:
+        assert parser.parse_date(text) == legacy.parse_date(text), text
+    for pattern, first_chars, _parser_func in parser._table:
+        first = re.compile('[' + first_chars + ']', re.IGNORECASE)
+        for text in phrases:
+            for match in re.finditer(pattern, text, re.IGNORECASE):
+                assert first.match(match.group()), (pattern, first_chars, match.group())
+    print(f"golden corpus: {len(phrases)} phrases identical")
+
+    measure("legacy", legacy, phrases)
+    measure("compiled", parser, phrases)
+
+
+if __name__ == "__main__":
+    main()
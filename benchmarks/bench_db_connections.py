@@ -0,0 +1,64 @@
+"""
+Микробенчмарк слоя доступа к SQLite: новое соединение на каждый вызов
+(как было раньше) против долгоживущего соединения потока.
+
+Запуск: python -m benchmarks.bench_db_connections
+"""
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date
+
+import database.database as db
+from database.connection import close_all_connections
+
+N = 5000
+
+
+def legacy_get_habit_by_id(habit_id: int):
+    conn = sqlite3.connect(db.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, user_id, name, description FROM habits WHERE id=?", (habit_id,))
+    habit = cursor.fetchone()
+    conn.close()
+    return habit
+
+
+def legacy_mark_habit(habit_id: int, status: str):
+    conn = sqlite3.connect(db.DB_PATH)
+    cursor = conn.cursor()
+    # С уникальным индексом (habit_id, action_date) повторная отметка дня — замена
+    cursor.execute("INSERT OR REPLACE INTO habit_actions (habit_id, action_date, status) VALUES (?, ?, ?)",
+                   (habit_id, date.today(), status))
+    conn.commit()
+    conn.close()
+
+
+def measure(name: str, func, n: int = N):
+    start = time.perf_counter()
+    for i in range(n):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<40} {n / elapsed:>12,.0f} ops/sec")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        user_id = db.add_user_if_not_exists(1, "bench", "Bench", "")
+        for i in range(100):
+            db.add_habit(user_id, f"Привычка {i}")
+        habit_ids = [h[0] for h in db.get_habits(user_id)]
+
+        measure("read:  connect per call", lambda i: legacy_get_habit_by_id(habit_ids[i % 100]))
+        measure("read:  pooled connection", lambda i: db.get_habit_by_id(habit_ids[i % 100]))
+        measure("write: connect per call", lambda i: legacy_mark_habit(habit_ids[i % 100], "done"), N // 5)
+        measure("write: pooled connection", lambda i: db.mark_habit(habit_ids[i % 100], "done"), N // 5)
+
+        close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
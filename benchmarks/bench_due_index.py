@@ -0,0 +1,125 @@
+"""
+Бенчмарк индекса сроков привычек против обхода is_habit_due
+
+Прежний способ узнать, какие привычки пора выполнять, — собрать словарь
+каждой привычки и вызвать CalendarIntegration.is_habit_due. Теперь срок
+хранится в habits.next_due_at (частичный индекс) и в куче DueIndex.
+Проверяется, что все три способа дают одни и те же привычки, в том числе
+после отметок, которые сдвигают сроки.
+
+Запуск: python -m benchmarks.bench_due_index
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import database.database as db
+from database.connection import close_all_connections
+from database.due_index import DEFAULT_REMINDER_HOUR
+from utils.calendar_integration import calendar_integration
+from utils.clock import clock
+from utils.timezones import from_timestamp, to_timestamp
+
+HABITS = 50_000
+FREQUENCIES = [('daily', 1), ('daily', 2), ('weekly', 1), ('weekly', 2), ('monthly', 1)]
+
+
+def legacy_due(conn, now: datetime) -> set:
+    """
+    Все привычки с частотой через is_habit_due, как раньше. is_habit_due
+    считает вхождение наступившим с полуночи, индекс — с часа напоминаний
+    """
+    due = set()
+    rows = conn.execute("""
+        SELECT h.id, h.frequency_type, h.frequency_interval, s.last_completion, h.created_at
+        FROM habits h LEFT JOIN habit_stats s ON s.habit_id = h.id
+        WHERE h.frequency_type IS NOT NULL
+    """)
+    for habit_id, frequency_type, interval, last_completion, created_at in rows:
+        created = from_timestamp(datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc).timestamp())
+        habit_data = {
+            'frequency': {'type': frequency_type, 'interval': interval},
+            'last_completion': datetime.fromisoformat(last_completion) if last_completion else None,
+            'start_date': datetime.combine(created.date(), datetime.min.time()),
+        }
+        if calendar_integration.is_habit_due(habit_data, now - timedelta(hours=DEFAULT_REMINDER_HOUR)):
+            due.add(habit_id)
+    return due
+
+
+def fill(conn, user_id: int, rng: random.Random):
+    """Привычки с частотой и последним выполнением в пределах двух месяцев"""
+    today = clock.today()
+    with conn:
+        conn.executemany(
+            "INSERT INTO habits (user_id, name, description, frequency_type, frequency_interval) VALUES (?, ?, '', ?, ?)",
+            [(user_id, f"Привычка {number}", *rng.choice(FREQUENCIES)) for number in range(HABITS)]
+        )
+        habit_ids = [row[0] for row in conn.execute("SELECT id FROM habits")]
+        for habit_id in habit_ids:
+            if rng.random() < 0.9:
+                db._mark_habit(conn, habit_id, today - timedelta(days=rng.randint(0, 60)), "done")
+            else:
+                db.due.refresh(conn, habit_id)
+    return habit_ids
+
+
+def main():
+    rng = random.Random(18)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        conn = db.get_connection()
+        user_id = db.add_user_if_not_exists(1, "bench", "Bench", "")
+        habit_ids = fill(conn, user_id, rng)
+        print(f"{db.load_due_index()} привычек в индексе сроков")
+
+        now = clock.now()
+        start = time.perf_counter()
+        expected = legacy_due(conn, now)
+        legacy_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        from_sql = {row[0] for row in db.get_due_habits(0, to_timestamp(now) + 1e-6)}
+        sql_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        from_heap = {habit_id for _due_at, habit_id in db.due_index.due_between(0, to_timestamp(now))}
+        heap_ms = (time.perf_counter() - start) * 1000
+        assert expected == from_sql == from_heap
+        print(f"к выполнению сейчас: {len(expected)}; is_habit_due {legacy_ms:.1f} ms, "
+              f"SQL {sql_ms:.1f} ms, куча {heap_ms:.1f} ms")
+
+        # Отметки сдвигают сроки: индекс в памяти меняется вместе с базой
+        for habit_id in rng.sample(habit_ids, 2000):
+            db.mark_habit(habit_id, rng.choice(("done", "skipped")))
+        assert legacy_due(conn, now) == {habit_id for _due_at, habit_id in db.due_index.due_between(0, to_timestamp(now))}
+
+        # Часовые окна на трое суток вперёд: раньше — два обхода всех привычек
+        # (должна ли к концу окна и не была ли уже к началу), теперь — запрос по индексу
+        windows = [now + timedelta(hours=hour) for hour in range(72)]
+        start = time.perf_counter()
+        legacy_found = len(legacy_due(conn, windows[30] + timedelta(hours=1)) - legacy_due(conn, windows[30]))
+        legacy_window_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        found = 0
+        for window_start in windows:
+            window = (to_timestamp(window_start), to_timestamp(window_start + timedelta(hours=1)))
+            rows = db.get_due_habits(*window)
+            assert {row[0] for row in rows} == {h for _d, h in db.due_index.due_between(window[0], window[1] - 1e-6)}
+            found += len(rows)
+        sql_window_ms = (time.perf_counter() - start) / len(windows) * 1000
+        print(f"окно в час: is_habit_due {legacy_window_ms:.1f} ms, SQL + куча {sql_window_ms:.2f} ms "
+              f"(найдено за 72 окна: {found}, в 31-м окне раньше: {legacy_found})")
+
+        # pop_due забирает ровно просроченные, по возрастанию срока
+        popped = db.due_index.pop_due(to_timestamp(now))
+        assert [due_at for due_at, _habit_id in popped] == sorted(due_at for due_at, _habit_id in popped)
+        assert {habit_id for _due_at, habit_id in popped} == legacy_due(conn, now)
+        assert not db.due_index.due_between(0, to_timestamp(now))
+        close_all_connections()
+    print("индекс совпадает с is_habit_due")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Бенчмарк SQLiteStorage против MemoryStorage aiogram
+
+Случайная последовательность операций FSM (set_state, set_data,
+update_data, очистка диалога) выполняется на обоих хранилищах, и после
+каждой результаты чтения сравниваются. У SQLiteStorage маленький кэш,
+поэтому часть чтений идёт в базу. После «перезапуска» (новый экземпляр на
+той же базе) все диалоги должны совпасть с MemoryStorage. Проверяется
+истечение брошенных диалогов по ttl на SimulatedClock. Время — операции
+get/set в секунду при тёплом кэше и с промахами.
+
+Запуск: python -m benchmarks.bench_fsm_storage
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import database.async_db as adb
+import database.database as db
+from database.connection import close_all_connections
+from database.fsm_storage import SQLiteStorage
+from utils.clock import SimulatedClock
+
+USERS = 5000
+OPERATIONS = 50_000
+STATES = [None, "AddHabit:name", "AddHabit:description", "EditHabit:name", "HabitFSM:waiting_for_name"]
+
+
+def make_key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+async def apply(storage, rng: random.Random, key: StorageKey):
+    roll = rng.random()
+    if roll < 0.3:
+        await storage.set_state(key, rng.choice(STATES))
+    elif roll < 0.55:
+        await storage.update_data(key, {rng.choice("abc"): rng.randint(0, 99)})
+    elif roll < 0.7:
+        await storage.set_data(key, {"name": f"Привычка {rng.randint(0, 9)}"})
+    else:
+        # Конец диалога: state.clear()
+        await storage.set_state(key, None)
+        await storage.set_data(key, {})
+
+
+async def check_parity():
+    memory = MemoryStorage()
+    storage = SQLiteStorage(cache_size=200, flush_interval=0.01, max_batch=100)
+    seed = 22
+    rng_memory, rng_sqlite, rng_keys = random.Random(seed), random.Random(seed), random.Random(seed + 1)
+    for _ in range(OPERATIONS // 5):
+        key = make_key(rng_keys.randrange(USERS // 5))
+        await apply(memory, rng_memory, key)
+        await apply(storage, rng_sqlite, key)
+        assert await storage.get_state(key) == await memory.get_state(key)
+        assert await storage.get_data(key) == await memory.get_data(key)
+    stats = storage.stats()
+    await storage.close()
+
+    restarted = SQLiteStorage(cache_size=200)
+    for user_id in range(USERS // 5):
+        key = make_key(user_id)
+        assert await restarted.get_state(key) == await memory.get_state(key), user_id
+        assert await restarted.get_data(key) == await memory.get_data(key), user_id
+    await restarted.close()
+    rows = db.get_connection().execute("SELECT count(*) FROM fsm_states").fetchone()[0]
+    print(f"совпадает с MemoryStorage, в том числе после перезапуска; строк в базе {rows}, "
+          f"записей пачками: {stats['flushes']}, hit rate {stats['hit_rate']:.1%}")
+
+
+async def check_ttl():
+    clock = SimulatedClock(time.time())
+    storage = SQLiteStorage(ttl=3600, clock=clock)
+    abandoned, active = make_key(-1), make_key(-2)
+    await storage.set_state(abandoned, "AddHabit:name")
+    await storage.update_data(abandoned, {"name": "Бег"})
+    await storage.set_state(active, "AddHabit:name")
+    await storage.flush()
+    await clock.advance(1800)
+    await storage.update_data(active, {"name": "Вода"})
+    await clock.advance(1801)
+    assert await storage.get_state(abandoned) is None and await storage.get_data(abandoned) == {}
+    assert await storage.get_state(active) == "AddHabit:name"
+    await storage.flush()
+    # В базе не осталось брошенного диалога, активный на месте
+    conn = db.get_connection()
+    keys = {row[0] for row in conn.execute("SELECT key FROM fsm_states WHERE key LIKE '1:-%'")}
+    assert keys == {"1:-2:-2::default"}, keys
+    # Чистка базы без чтения: диалог, о котором кэш не знает
+    await storage.set_state(abandoned, "AddHabit:name")
+    await storage.close()
+    await clock.advance(3601)
+    assert await SQLiteStorage(ttl=3600, clock=clock).purge() >= 1
+    print("брошенные диалоги истекают по ttl: ok")
+
+
+async def throughput(name: str, storage, keys):
+    start = time.perf_counter()
+    for index, key in enumerate(keys):
+        await storage.set_state(key, STATES[index % len(STATES)] or "AddHabit:name")
+        await storage.update_data(key, {"name": "Привычка"})
+    write_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in keys:
+        await storage.get_state(key)
+        await storage.get_data(key)
+    read_time = time.perf_counter() - start
+    await storage.close()
+    operations = 2 * len(keys)
+    print(f"{name:<34} запись {operations / write_time:>10,.0f} оп/с   чтение {operations / read_time:>10,.0f} оп/с")
+
+
+async def main():
+    await check_parity()
+    await check_ttl()
+
+    rng = random.Random(7)
+    hot_keys = [make_key(10_000 + rng.randrange(1000)) for _ in range(OPERATIONS)]
+    cold_keys = [make_key(100_000 + rng.randrange(50_000)) for _ in range(OPERATIONS)]
+    await throughput("MemoryStorage", MemoryStorage(), hot_keys)
+    await throughput("SQLiteStorage, тёплый кэш", SQLiteStorage(), hot_keys)
+    await throughput("SQLiteStorage, кэш 1000 из 50 000", SQLiteStorage(cache_size=1000), cold_keys)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        asyncio.run(main())
+        adb.shutdown()
+        close_all_connections()
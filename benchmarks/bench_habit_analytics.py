@@ -0,0 +1,134 @@
+"""
+Бенчмарк векторной статистики HabitAnalytics
+
+Прежний способ — CalendarIntegration.get_habit_stats для каждой привычки
+по списку datetime. HabitAnalytics считает статистику всех привычек сразу
+по массивам NumPy; результаты должны совпасть для каждой привычки.
+Дополнительно проверяются загрузка из habit_actions, скользящая доля
+выполнений и распределение по дням недели.
+
+Запуск: python -m benchmarks.bench_habit_analytics
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+import database.database as db
+from database.connection import close_all_connections
+from utils.calendar_integration import calendar_integration
+from utils.habit_analytics import HabitAnalytics
+from utils.clock import clock
+
+HABITS = 5000
+HISTORY_DAYS = 400
+FREQUENCIES = [
+    None,
+    {'type': 'daily', 'interval': 1},
+    {'type': 'daily', 'interval': 3},
+    {'type': 'weekly', 'interval': 2},
+    {'type': 'monthly', 'interval': 1},
+]
+
+
+def generate(rng: random.Random, today: date):
+    """Выполнения в полночь (как action_date из базы), иногда в будущем; часть привычек пустая"""
+    completions, frequencies = {}, {}
+    for habit_id in range(1, HABITS + 1):
+        density = rng.choice((0.0, 0.1, 0.5, 0.9, 1.0))
+        days = [
+            today - timedelta(days=offset)
+            for offset in range(-3, rng.randint(1, HISTORY_DAYS))
+            if rng.random() < density
+        ]
+        rng.shuffle(days)
+        completions[habit_id] = [datetime.combine(day, datetime.min.time()) for day in days]
+        frequencies[habit_id] = rng.choice(FREQUENCIES)
+    return completions, frequencies
+
+
+def legacy(completions, frequencies):
+    return {
+        habit_id: calendar_integration.get_habit_stats({
+            'completions': dates, 'frequency': frequencies[habit_id]
+        })
+        for habit_id, dates in completions.items()
+    }
+
+
+def timed(name: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{name:<36} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+    return result
+
+
+def check_database(rng: random.Random, today: date):
+    """from_connection на временной базе совпадает с from_completions"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        user_id = db.add_user_if_not_exists(1, "bench", "Bench", "")
+        conn = db.get_connection()
+        completions = {}
+        with conn:
+            for number in range(50):
+                db.add_habit(user_id, f"Привычка {number}")
+            for habit_id in [row[0] for row in db.get_habits(user_id)]:
+                completions[habit_id] = []
+                for offset in range(60):
+                    roll = rng.random()
+                    if roll < 0.3:
+                        continue
+                    day = today - timedelta(days=offset)
+                    status = "done" if roll < 0.85 else "skipped"
+                    db._mark_habit(conn, habit_id, day, status)
+                    if status == "done":
+                        completions[habit_id].append(datetime.combine(day, datetime.min.time()))
+
+        from_db = HabitAnalytics.from_connection(conn).get_habit_stats(today=today)
+        assert from_db == HabitAnalytics.from_completions(completions).get_habit_stats(today=today)
+        for habit_id, stats in from_db.items():
+            stored = db.get_habit_stats(habit_id)
+            assert (stats['streak'], stats['longest_streak']) == (stored['streak'], stored['longest_streak'])
+        close_all_connections()
+
+
+def main():
+    rng = random.Random(15)
+    today = clock.today()
+    completions, frequencies = generate(rng, today)
+    print(f"{HABITS} привычек, {sum(map(len, completions.values()))} выполнений")
+
+    expected = timed("CalendarIntegration по привычкам", lambda: legacy(completions, frequencies))
+    analytics = timed("HabitAnalytics: загрузка", lambda: HabitAnalytics.from_completions(completions))
+    stats = timed("HabitAnalytics: get_habit_stats", lambda: analytics.get_habit_stats(frequencies, today=today))
+    assert stats == expected
+
+    _habits, rates = timed("скользящая доля за 7 дней, 90 дней", lambda: analytics.rolling_completion_rates(
+        7, today - timedelta(days=89), today
+    ))
+    histograms = timed("распределение по дням недели", analytics.weekday_histograms)
+
+    # Выборочная проверка с прямым подсчётом по датам
+    for habit_id in rng.sample(sorted(completions), 200):
+        index = int(np.searchsorted(analytics.habit_ids, habit_id))
+        days = {completion.date() for completion in completions[habit_id]}
+        for column in (0, 45, 89):
+            end = today - timedelta(days=89 - column)
+            done = sum(end - timedelta(days=offset) in days for offset in range(7))
+            assert rates[index, column] == done / 7
+        weekdays = [0] * 7
+        for day in days:
+            weekdays[day.weekday()] += 1
+        assert histograms[index].tolist() == weekdays
+
+    check_database(rng, today)
+    print("результаты совпадают с CalendarIntegration и habit_stats")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Бенчмарк битовых карт отметок против строк habit_actions
+
+Прежний способ — выбрать все отметки привычки (get_habit_actions) и
+отфильтровать нужные дни в Python. Битовая карта читается одной строкой,
+а окно считается через bit_count. Проверяется, что отметки и счётчики
+совпадают с habit_actions, что инкрементальные карты совпадают с
+пересборкой и что HabitAnalytics.from_bitmaps совпадает с from_connection.
+
+Запуск: python -m benchmarks.bench_habit_bitmaps
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import database.database as db
+from database.connection import close_all_connections
+from database.habit_bitmaps import DayBitmap
+from utils.habit_analytics import HabitAnalytics
+from utils.clock import clock
+
+HISTORY_DAYS = (30, 365, 1000, 3650)
+READS = 2000
+ANALYTICS_HABITS = 2000
+
+
+def legacy_days(habit_id: int, start: date, end: date) -> dict:
+    marks = {}
+    for _id, _habit_id, action_date, status in db.get_habit_actions(habit_id):
+        day = date.fromisoformat(action_date)
+        if start <= day <= end:
+            marks[day] = status
+    return marks
+
+
+def legacy_count(habit_id: int, start: date, end: date) -> int:
+    return sum(status == "done" for status in legacy_days(habit_id, start, end).values())
+
+
+def fill_history(conn, habit_id: int, days: int, rng: random.Random):
+    """История за days дней прямыми вставками (быстрее, чем отмечать по дню)"""
+    today = clock.today()
+    rows = []
+    for offset in range(days):
+        roll = rng.random()
+        if roll < 0.2:
+            continue
+        rows.append((habit_id, today - timedelta(days=offset), "done" if roll < 0.85 else "skipped"))
+    with conn:
+        conn.executemany(db.MARK_HABIT_SQL, rows)
+
+
+def check_model(rng: random.Random):
+    """DayBitmap против словаря день -> статус на случайных отметках и окнах"""
+    base = date(2024, 1, 1)
+    for _ in range(200):
+        bitmap, model = DayBitmap(), {}
+        for _ in range(rng.randint(1, 60)):
+            day = base + timedelta(days=rng.randint(-300, 300))
+            status = rng.choice(("done", "skipped", None))
+            bitmap.set(day, status)
+            if status:
+                model[day] = status
+            else:
+                model.pop(day, None)
+        for _ in range(20):
+            start = base + timedelta(days=rng.randint(-400, 400))
+            end = start + timedelta(days=rng.randint(-5, 200))
+            expected = {day: status for day, status in model.items() if start <= day <= end}
+            assert bitmap.marks(start, end) == expected
+            assert bitmap.count(start, end) == sum(status == "done" for status in expected.values())
+            assert bitmap.days(start, end, "skipped") == sorted(
+                day for day, status in expected.items() if status == "skipped"
+            )
+        for day, status in model.items():
+            assert bitmap.get(day) == status
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(READS):
+        func(*args)
+    return (time.perf_counter() - start) / READS * 1e6
+
+
+def main():
+    rng = random.Random(16)
+    check_model(rng)
+
+    today = clock.today()
+    month_start = today - timedelta(days=29)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        conn = db.get_connection()
+        user_id = db.add_user_if_not_exists(1, "bench", "Bench", "")
+
+        print(f"{'дней истории':>14} {'30 дней, строки':>17} {'30 дней, карта':>16} {'BLOB, байт':>11}")
+        for days in HISTORY_DAYS:
+            habit_id = db.add_habit(user_id, f"Привычка {days}")
+            fill_history(conn, habit_id, days, rng)
+            db.rebuild_habit_bitmaps(habit_id)
+            # Несколько отметок через обычный путь: сегодня и задним числом
+            with conn:
+                for offset in (0, 3, 0, days + 10):
+                    db._mark_habit(conn, habit_id, today - timedelta(days=offset), rng.choice(("done", "skipped")))
+            incremental = db.get_habit_days(habit_id, date.min, date.max)
+            db.rebuild_habit_bitmaps(habit_id)
+            assert db.get_habit_days(habit_id, date.min, date.max) == incremental
+            assert incremental == legacy_days(habit_id, date.min, date.max)
+
+            assert db.get_habit_days(habit_id, month_start, today) == legacy_days(habit_id, month_start, today)
+            assert db.get_habit_stats(habit_id)["period_completions"] == legacy_count(habit_id, month_start, today)
+            size = conn.execute("SELECT length(done) FROM habit_bitmaps WHERE habit_id = ?", (habit_id,)).fetchone()[0]
+            print(f"{days:>14} {timed(legacy_days, habit_id, month_start, today):>15.1f}µs "
+                  f"{timed(db.get_habit_days, habit_id, month_start, today):>14.1f}µs {size:>11}")
+
+        for number in range(ANALYTICS_HABITS):
+            db.add_habit(user_id, f"Привычка {number}")
+        habit_ids = [row[0] for row in db.get_habits(user_id)][len(HISTORY_DAYS):]
+        for habit_id in habit_ids:
+            fill_history(conn, habit_id, 365, rng)
+        db.rebuild_habit_bitmaps()
+
+        start = time.perf_counter()
+        from_rows = HabitAnalytics.from_connection(conn).get_habit_stats(today=today)
+        rows_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        from_bitmaps = HabitAnalytics.from_bitmaps(conn).get_habit_stats(today=today)
+        bitmaps_ms = (time.perf_counter() - start) * 1000
+        assert from_rows == from_bitmaps
+        print(f"HabitAnalytics, {len(from_rows)} привычек: строки {rows_ms:.1f} ms, карты {bitmaps_ms:.1f} ms")
+        close_all_connections()
+    print("карты совпадают с habit_actions и с пересборкой")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Бенчмарк кэша списков привычек (database.habit_cache)
+
+Перерисовка списка после нажатия (handle_habit_done) и /start, /addhabbit,
+/myhabits читают привычки пользователя. Сравнивается async_db.get_habits
+с выключенным кэшем (каждый раз запрос в потоке базы данных) и с кэшем.
+Пользователи выбираются неравномерно: активная часть нажимает чаще.
+
+Корректность: случайная смесь добавлений (через очередь записи),
+изменений, удалений и чтений выполняется конкурентно, и каждое чтение,
+как и весь кэш в конце, сверяется с запросом к базе в обход кэша.
+
+Запуск: python -m benchmarks.bench_habit_cache
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import database.async_db as adb
+import database.database as db
+from database.connection import close_all_connections
+
+USERS = 5000
+HABITS_PER_USER = 5
+READS = 100_000
+MIXED_OPERATIONS = 20_000
+
+
+def from_db(user_id: int):
+    return db.get_connection().execute(db.GET_HABITS_SQL, (user_id,)).fetchall()
+
+
+def pick_user(rng: random.Random) -> int:
+    # Пятая часть пользователей делает 80% нажатий
+    if rng.random() < 0.8:
+        return rng.randint(1, USERS // 5)
+    return rng.randint(1, USERS)
+
+
+async def check_consistency():
+    rng = random.Random(23)
+    habit_ids = [row[0] for row in db.get_connection().execute("SELECT id FROM habits")]
+
+    async def operation():
+        user_id = rng.randint(1, 50)
+        roll = rng.random()
+        if roll < 0.1:
+            await adb.add_habit(user_id, f"Новая {rng.randint(0, 999)}")
+        elif roll < 0.2 and habit_ids:
+            await adb.update_habit(rng.choice(habit_ids), name=f"Переименована {rng.randint(0, 999)}")
+        elif roll < 0.25 and habit_ids:
+            await adb.delete_habit(habit_ids.pop(rng.randrange(len(habit_ids))))
+        else:
+            habits = await adb.get_habits(user_id)
+            expected = await adb.run(from_db, user_id)
+            # Запись, закоммиченная между двумя чтениями, даёт законное расхождение
+            return habits == expected
+        return True
+
+    db.write_queue.start()
+    results = []
+    for _ in range(MIXED_OPERATIONS // 100):
+        results += await asyncio.gather(*(operation() for _ in range(100)))
+    db.write_queue.stop()
+    for user_id in range(1, 51):
+        cached = db.habit_cache.get(user_id)
+        assert cached is None or list(cached) == from_db(user_id), user_id
+        assert await adb.get_habits(user_id) == from_db(user_id), user_id
+    mismatches = results.count(False)
+    assert mismatches < len(results) * 0.05, mismatches
+    print(f"согласованность после {MIXED_OPERATIONS} операций: ok "
+          f"(расхождений из-за гонки чтений: {mismatches}), {db.habit_cache.stats()}")
+
+
+async def rerender(seed: int) -> float:
+    rng = random.Random(seed)
+    users = [pick_user(rng) for _ in range(READS)]
+    start = time.perf_counter()
+    for user_id in users:
+        await adb.get_habits(user_id)
+    return time.perf_counter() - start
+
+
+async def main():
+    await check_consistency()
+
+    db.habit_cache.maxsize = 0
+    db.habit_cache.clear()
+    uncached = await rerender(1)
+    db.habit_cache.maxsize = 2000
+    db.habit_cache.hits = db.habit_cache.misses = 0
+    cached = await rerender(1)
+    stats = db.habit_cache.stats()
+    print(f"без кэша      {READS / uncached:>10,.0f} списков/с")
+    print(f"кэш на 2000   {READS / cached:>10,.0f} списков/с  (x{uncached / cached:.1f}, "
+          f"hit rate {stats['hit_rate']:.1%}, вытеснений {stats['evictions']})")
+    assert stats['size'] <= 2000
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        conn = db.get_connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO users (telegram_id, username) VALUES (?, ?)",
+                ((100_000 + u, f"user{u}") for u in range(1, USERS + 1)),
+            )
+            conn.executemany(
+                "INSERT INTO habits (user_id, name, description) VALUES (?, ?, '')",
+                ((u, f"Привычка {h}") for u in range(1, USERS + 1) for h in range(HABITS_PER_USER)),
+            )
+        asyncio.run(main())
+        adb.shutdown()
+        close_all_connections()
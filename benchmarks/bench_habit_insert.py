@@ -0,0 +1,90 @@
+"""
+Бенчмарк добавления привычки: прежний путь add_habit_description
+(get_user, add_habit, затем get_habits и habits[-1][0]) против
+add_habit_for_user, который одной транзакцией создаёт пользователя при
+необходимости и сразу возвращает id привычки.
+
+Пользователь с сотнями привычек показывает цену O(привычек) повторного
+чтения. Конкурентные добавления одному пользователю показывают гонку:
+прежний путь может вернуть id чужой (добавленной следом) привычки.
+Обе версии идут через очередь пакетной записи, как в боте.
+
+Запуск: python -m benchmarks.bench_habit_insert
+"""
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import database.async_db as adb
+import database.database as db
+from database.connection import close_all_connections
+
+HABITS = 300
+CONCURRENT = 200
+
+
+def make_user(telegram_id: int):
+    return SimpleNamespace(id=telegram_id, username="bench", first_name="Bench", last_name=None)
+
+
+async def legacy_add(telegram_user, name: str) -> int:
+    user = await adb.get_user(telegram_user.id)
+    await adb.add_habit(user[0], name)
+    habits = await adb.get_habits(user[0])
+    return habits[-1][0]
+
+
+async def new_add(telegram_user, name: str) -> int:
+    return await adb.add_habit_for_user(telegram_user, name)
+
+
+def habit_name(habit_id: int) -> str:
+    return db.get_habit_by_id(habit_id)[2]
+
+
+async def measure(title: str, add, telegram_user):
+    start = time.perf_counter()
+    for number in range(HABITS):
+        habit_id = await add(telegram_user, f"{title} {number}")
+        assert habit_name(habit_id) == f"{title} {number}"
+    sequential = (time.perf_counter() - start) / HABITS
+
+    names = [f"{title} параллельно {number}" for number in range(CONCURRENT)]
+    ids = await asyncio.gather(*(add(telegram_user, name) for name in names))
+    wrong = sum(habit_name(habit_id) != name for habit_id, name in zip(ids, names))
+    print(f"{title:<20} {sequential * 1000:>7.2f} ms на привычку, "
+          f"неверных id при {CONCURRENT} одновременных: {wrong}")
+    return wrong
+
+
+async def main():
+    legacy_user, new_user = make_user(1), make_user(2)
+    db.add_user_if_not_exists(legacy_user.id, "bench", "Bench", "")
+    db.write_queue.start()
+    await measure("прежний путь", legacy_add, legacy_user)
+    wrong = await measure("add_habit_for_user", new_add, new_user)
+    assert wrong == 0
+
+    # Новый пользователь: создаётся вместе с первой привычкой
+    habit_id = await new_add(make_user(3), "Первая")
+    user = db.get_user(3)
+    habits = db.get_habits(user[0])
+    assert [(h[0], h[2]) for h in habits] == [(habit_id, "Первая")]
+
+    # Частота из текста сохраняется в той же транзакции, срок сразу в индексе
+    habit_id = await adb.add_habit_for_user(make_user(4), "Зарядка", frequency={'type': 'daily', 'interval': 1})
+    next_due = db.get_connection().execute("SELECT next_due_at FROM habits WHERE id = ?", (habit_id,)).fetchone()[0]
+    assert next_due is not None and db.due_index.get(habit_id) == next_due
+    db.write_queue.stop()
+    print("пользователь, привычка и её срок в одной транзакции: ok")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        asyncio.run(main())
+        adb.shutdown()
+        close_all_connections()
@@ -0,0 +1,90 @@
+"""
+Бенчмарк статистики привычек: habit_stats против пересчёта по истории
+
+Прежний способ — выбрать все отметки привычки и посчитать серии
+CalendarIntegration.get_habit_stats (две сортировки на каждый запрос).
+Теперь серии и счётчики обновляются при отметке, а чтение — одна строка
+из habit_stats. Заодно проверяется, что инкрементальная статистика
+совпадает с пересчётом (rebuild) и с CalendarIntegration.
+
+Запуск: python -m benchmarks.bench_habit_stats
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import database.database as db
+from database.connection import close_all_connections
+from utils.calendar_integration import calendar_integration
+from utils.clock import clock
+
+HISTORY_DAYS = (10, 100, 1000, 5000)
+READS = 2000
+
+
+def legacy_stats(habit_id: int):
+    completions = [
+        datetime.fromisoformat(action_date)
+        for _id, _habit_id, action_date, status in db.get_habit_actions(habit_id)
+        if status == "done"
+    ]
+    return calendar_integration.get_habit_stats({'completions': completions})
+
+
+def fill_history(habit_id: int, days: int, rng: random.Random):
+    """Отметки за последние days дней: в основном выполнено, иногда пропуск или исправление"""
+    conn = db.get_connection()
+    today = clock.today()
+    with conn:
+        for offset in range(days, -1, -1):
+            day = today - timedelta(days=offset)
+            roll = rng.random()
+            if roll < 0.15:
+                continue
+            db._mark_habit(conn, habit_id, day, "done" if roll < 0.85 else "skipped")
+            if rng.random() < 0.02:
+                # Передумал: выполнение отменено и снова отмечено
+                db._mark_habit(conn, habit_id, day, "skipped")
+                db._mark_habit(conn, habit_id, day, "done")
+
+
+def timed(func, habit_id: int) -> float:
+    start = time.perf_counter()
+    for _ in range(READS):
+        func(habit_id)
+    return (time.perf_counter() - start) / READS * 1e6
+
+
+def main():
+    rng = random.Random(14)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        user_id = db.add_user_if_not_exists(1, "bench", "Bench", "")
+
+        incremental_by_habit = {}
+        print(f"{'дней истории':>14} {'пересчёт':>12} {'habit_stats':>12}")
+        for days in HISTORY_DAYS:
+            habit_id = db.add_habit(user_id, f"Привычка {days}")
+            fill_history(habit_id, days, rng)
+
+            incremental = incremental_by_habit[habit_id] = db.get_habit_stats(habit_id)
+            db.rebuild_habit_stats(habit_id)
+            assert db.get_habit_stats(habit_id) == incremental
+            legacy = legacy_stats(habit_id)
+            assert (incremental['streak'], incremental['longest_streak']) == \
+                (legacy['streak'], legacy['longest_streak']), (incremental, legacy)
+
+            print(f"{days:>14} {timed(legacy_stats, habit_id):>10.1f}µs "
+                  f"{timed(db.get_habit_stats, habit_id):>10.1f}µs")
+
+        rebuilt = db.rebuild_habit_stats()
+        assert all(db.get_habit_stats(h) == stats for h, stats in incremental_by_habit.items())
+        print(f"rebuild всех привычек: {rebuilt} шт., совпадает с инкрементальной")
+        close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
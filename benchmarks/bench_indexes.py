@@ -0,0 +1,104 @@
+"""
+Проверка планов запросов и скорости выборок после миграции с индексами
+
+Проверяет через EXPLAIN QUERY PLAN, что get_habits и get_habit_actions
+используют индексы, а не полный просмотр таблиц, и замеряет выборки на
+базе с большим числом пользователей. Обновление базы с отметками со
+схемы 4 заполняет статистику и битовые карты так же, как их пересборка.
+
+Запуск: python -m benchmarks.bench_indexes
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+import database.database as db
+from database import habit_bitmaps, habit_stats
+from database.connection import close_all_connections
+from database.migrations import get_schema_version, migrate, MIGRATIONS
+
+USERS = 20000
+HABITS_PER_USER = 3
+DAYS = 30
+
+
+def query_plan(sql: str, params: tuple) -> str:
+    rows = db.get_connection().execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+
+def check_upgrade():
+    """Заполнение таблиц в миграциях 5-6 совпадает с текущей пересборкой"""
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    for _version, _description, apply in MIGRATIONS[:4]:
+        apply(conn)
+    conn.execute("PRAGMA user_version = 4")
+    rng = random.Random(4)
+    conn.executemany("INSERT INTO habits (user_id, name) VALUES (1, ?)", ((f"{i}",) for i in range(300)))
+    days = {(rng.randint(1, 320), date(2024, 1, 1) + timedelta(days=rng.randint(0, 400))) for _ in range(20000)}
+    # Привычки 301-320 удалены, их отметки остались
+    conn.executemany(
+        "INSERT INTO habit_actions (habit_id, action_date, status) VALUES (?, ?, ?)",
+        ((habit_id, day.isoformat(), rng.choice(("done", "done", "skipped"))) for habit_id, day in days),
+    )
+    assert migrate(conn) == MIGRATIONS[-1][0]
+    tables = {table: conn.execute(f"SELECT * FROM {table} ORDER BY habit_id").fetchall()
+              for table in ("habit_stats", "habit_bitmaps")}
+    habit_stats.rebuild(conn)
+    habit_bitmaps.rebuild(conn)
+    for table, rows in tables.items():
+        assert rows == conn.execute(f"SELECT * FROM {table} ORDER BY habit_id").fetchall(), table
+    print(f"обновление со схемы 4: {len(tables['habit_stats'])} привычек, совпадает с пересборкой")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        assert get_schema_version(db.get_connection()) == MIGRATIONS[-1][0]
+
+        conn = db.get_connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO users (telegram_id) VALUES (?)",
+                ((i,) for i in range(USERS)),
+            )
+            conn.executemany(
+                "INSERT INTO habits (user_id, name) VALUES (?, 'Зарядка')",
+                ((u,) for u in range(1, USERS + 1) for _ in range(HABITS_PER_USER)),
+            )
+            conn.executemany(
+                "INSERT INTO habit_actions (habit_id, action_date, status) "
+                "VALUES (?, date('2024-01-01', ?), 'done')",
+                ((h, f"+{d} days") for h in range(1, 2001) for d in range(DAYS)),
+            )
+
+        plans = {
+            "get_habits": query_plan(db.GET_HABITS_SQL, (1,)),
+            "get_habit_actions": query_plan("SELECT * FROM habit_actions WHERE habit_id = ?", (1,)),
+        }
+        for name, plan in plans.items():
+            print(f"{name:<20} {plan}")
+            assert "USING INDEX" in plan, f"{name} выполняет полный просмотр таблицы"
+
+        n = 20000
+        start = time.perf_counter()
+        for i in range(n):
+            # load_habits всегда читает из базы, минуя кэш списков
+            db.load_habits(i % USERS + 1)
+        print(f"get_habits          {n / (time.perf_counter() - start):>12,.0f} ops/sec")
+
+        start = time.perf_counter()
+        for i in range(n):
+            db.get_habit_actions(i % 2000 + 1)
+        print(f"get_habit_actions   {n / (time.perf_counter() - start):>12,.0f} ops/sec")
+
+        close_all_connections()
+
+
+if __name__ == "__main__":
+    check_upgrade()
+    main()
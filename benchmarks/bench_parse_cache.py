@@ -0,0 +1,106 @@
+"""
+Бенчмарк кэша разбора: задержка parse_habit_text и parse_date
+на воспроизведённом журнале сообщений с кэшем и без него
+
+Журнал — поток сообщений, в котором популярные формулировки повторяются
+(распределение Ципфа по набору уникальных фраз), как у живых пользователей.
+В середине журнала на часах парсера (SimulatedClock) наступает полночь:
+кэш должен очиститься.
+
+Запуск: python -m benchmarks.bench_parse_cache
+"""
+import asyncio
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from benchmarks.bench_text_parser import generate_messages
+from utils.clock import SimulatedClock
+from utils.date_parser import DateParser
+from utils.text_parser import TextParser
+from utils.timezones import to_timestamp
+
+LOG_SIZE = 50_000
+UNIQUE_MESSAGES = 3_000
+DATE_PHRASES = [
+    "сегодня", "завтра", "послезавтра", "в пятницу", "пн", "через 3 дня",
+    "через 2 недели", "25.12", "01.02.2026", "Завтра", "вс", "через 1 месяц",
+]
+
+
+def replay_log(items, size: int, seed: int = 3):
+    """Журнал из size сообщений: i-я по популярности фраза встречается с весом 1/i"""
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, len(items) + 1)]
+    return rng.choices(items, weights=weights, k=size)
+
+
+def replay(func, log, on_midnight=None):
+    """Задержки вызовов в микросекундах; на середине журнала — полночь"""
+    latencies = []
+    middle = len(log) // 2
+    for i, text in enumerate(log):
+        if i == middle and on_midnight:
+            on_midnight()
+        start = time.perf_counter()
+        try:
+            func(text)
+        except ValueError:
+            # "в 8 часов" падает и без кэша — так было и раньше
+            pass
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def report(name: str, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f"{name:<24} mean {statistics.fmean(latencies):7.2f}µs  "
+          f"p50 {latencies[len(latencies) // 2]:7.2f}µs  p99 {p99:7.2f}µs")
+
+
+def bench(title: str, uncached, parser_class, method: str, log):
+    clock = SimulatedClock(time.time())
+    cached = parser_class(cache_size=1024, clock=clock)
+
+    def midnight():
+        size_before = cached.cache.stats()['size']
+        asyncio.run(clock.run_until(to_timestamp(clock.midnight() + timedelta(days=1))))
+        print(f"  полночь: в кэше было {size_before} записей")
+
+    print(title)
+    report("  без кэша", replay(uncached, log))
+    report("  с кэшем", replay(getattr(cached, method), log, on_midnight=midnight))
+    stats = cached.cache.stats()
+    print(f"  попаданий {stats['hits']}, промахов {stats['misses']}, "
+          f"hit rate {stats['hit_rate']:.1%}, размер {stats['size']}/{stats['maxsize']}")
+
+
+def main():
+    messages = list(dict.fromkeys(generate_messages(UNIQUE_MESSAGES * 2, seed=21)))[:UNIQUE_MESSAGES]
+    log = replay_log(messages, LOG_SIZE)
+    bench(
+        f"parse_habit_text: {LOG_SIZE} сообщений, {len(set(log))} уникальных",
+        TextParser(cache_size=0).parse_habit_text, TextParser, 'parse_habit_text', log,
+    )
+
+    date_log = replay_log(DATE_PHRASES, LOG_SIZE)
+    bench(
+        f"parse_date: {LOG_SIZE} фраз, {len(set(date_log))} уникальных",
+        DateParser(cache_size=0).parse_date, DateParser, 'parse_date', date_log,
+    )
+
+    # Кэш не должен менять результат разбора
+    parser, uncached = TextParser(), TextParser(cache_size=0)
+    for text in messages[:500]:
+        try:
+            assert parser.parse_habit_text(text) == uncached.parse_habit_text(text), text
+            assert parser.parse_habit_text(text) == uncached.parse_habit_text(text), text
+        except ValueError:
+            pass
+    print("результаты с кэшем и без совпадают")
+
+
+if __name__ == "__main__":
+    main()
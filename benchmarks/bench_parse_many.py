@@ -0,0 +1,54 @@
+"""
+Бенчмарк пакетного разбора TextParser.parse_many
+
+Сравнивает разбор списка привычек по одному тексту с parse_many в текущем
+процессе и пулом процессов при разном размере пачки; результаты должны
+совпадать с поштучным разбором и идти в том же порядке.
+На машине с одним ядром пул только добавляет пересылку между процессами —
+ускорение видно, когда ядер несколько.
+
+Запуск: python -m benchmarks.bench_parse_many
+"""
+import os
+import time
+
+from benchmarks.bench_text_parser import generate_messages
+from utils.text_parser import TextParser
+
+LINES = 40_000
+
+
+def timed(name: str, func):
+    start = time.perf_counter()
+    results = func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {len(results) / elapsed:>10,.0f} lines/sec")
+    return results
+
+
+def main():
+    # Без кэша: в экспорте почти все строки разные, а сравниваем сам разбор
+    parser = TextParser(cache_size=0)
+    lines = generate_messages(LINES, seed=5)
+    workers = os.cpu_count() or 1
+    print(f"{LINES} строк, процессов: {workers}")
+
+    expected = timed("по одному", lambda: [parser._parse_or_error(text) for text in lines])
+    inline = timed("parse_many, в процессе", lambda: list(
+        parser.parse_many(lines, parallel_threshold=LINES + 1)
+    ))
+    assert inline == expected
+
+    for chunk_size in (50, 500, 5000):
+        pooled = timed(f"parse_many, пул, пачка {chunk_size}", lambda: list(
+            # Ленивый поток строк, как при чтении файла
+            parser.parse_many(iter(lines), workers=workers, chunk_size=chunk_size)
+        ))
+        assert pooled == expected
+
+    failed = sum(1 for result in expected if not result['parsed_successfully'])
+    print(f"результаты совпадают, порядок сохранён; не разобрано строк: {failed}")
+
+
+if __name__ == "__main__":
+    main()
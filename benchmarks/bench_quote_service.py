@@ -0,0 +1,176 @@
+"""
+Бенчмарк /quotes: скачивание и разбор страницы на каждую команду
+против QuoteService с цитатами в памяти
+
+Страницу цитат отдаёт локальный aiohttp-сервер с задержкой ответа, как у
+настоящего сайта. Прежний обработчик (requests.get + BeautifulSoup прямо в
+event loop) воспроизведён как эталон: цитаты сервиса должны совпасть с
+его разбором. Проверяются также холодный старт с копии на диске (без
+обращения к сети), фоновое обновление по ttl и сохранение цитат, когда
+сайт отвечает ошибкой. Одновременные /quotes без цитат ждут одну загрузку,
+а после её неудачи какое-то время не ждут сайт совсем.
+
+Запуск: python -m benchmarks.bench_quote_service
+"""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import requests
+from aiohttp import web
+from bs4 import BeautifulSoup
+
+from utils.quote_service import QuoteService
+
+QUOTES = 400
+SERVER_DELAY = 0.2
+LEGACY_CALLS = 10
+SERVICE_CALLS = 100_000
+
+
+def make_page(version: int) -> str:
+    rng = random.Random(version)
+    blocks = []
+    for number in range(QUOTES):
+        words = " ".join(rng.choice(("делай", "сегодня", "привычка", "шаг", "каждый", "день")) for _ in range(8))
+        blocks.append(
+            f'<div class="node"><div class="field-name-body"><p>Цитата {version}-{number}: {words}</p>'
+            f'<p>коротко</p></div><div class="meta">{number}</div></div>'
+        )
+    return f"<html><body>{''.join(blocks)}</body></html>"
+
+
+class QuoteSite:
+    """Локальная замена сайта цитат: считает запросы, умеет отвечать ошибкой"""
+
+    def __init__(self):
+        self.version = 1
+        self.requests = 0
+        self.failing = False
+
+    async def handle(self, request):
+        self.requests += 1
+        await asyncio.sleep(SERVER_DELAY)
+        if self.failing:
+            return web.Response(status=500)
+        return web.Response(text=make_page(self.version), content_type='text/html')
+
+
+def legacy_quote(url: str) -> str:
+    """cmd_quote до QuoteService"""
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.content, 'html.parser')
+    quote_texts = []
+    for quote in soup.find_all('div', class_='field-name-body'):
+        for p in quote.find_all('p'):
+            text = p.get_text(strip=True)
+            if len(text) > 10:
+                quote_texts.append(text)
+    return random.choice(quote_texts)
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "не дождались"
+        await asyncio.sleep(0.01)
+
+
+async def main():
+    site = QuoteSite()
+    app = web.Application()
+    app.router.add_get('/quotes', site.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    server = web.TCPSite(runner, '127.0.0.1', 0)
+    await server.start()
+    port = server._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/quotes"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "quotes.json")
+        loop = asyncio.get_running_loop()
+
+        # Прежний способ: каждая команда ждёт сайт и разбирает страницу.
+        # Здесь — в потоке, иначе локальный сервер в том же loop не ответит;
+        # в боте же requests.get блокировал весь event loop
+        legacy_latencies = []
+        legacy_quotes = set()
+        for _ in range(LEGACY_CALLS):
+            start = time.perf_counter()
+            legacy_quotes.add(await loop.run_in_executor(None, legacy_quote, url))
+            legacy_latencies.append(time.perf_counter() - start)
+
+        service = QuoteService(url, cache_path=cache_path)
+        start = time.perf_counter()
+        await service.start()
+        first = await service.get_quote()
+        first_time = time.perf_counter() - start
+        expected = [p for p in BeautifulSoup(make_page(1), 'html.parser').find_all('p')]
+        expected = [p.get_text(strip=True) for p in expected if len(p.get_text(strip=True)) > 10]
+        assert service.quotes == expected and first in expected and legacy_quotes <= set(expected)
+
+        latencies = []
+        for _ in range(SERVICE_CALLS):
+            start = time.perf_counter()
+            await service.get_quote()
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        await service.stop()
+        print(f"прежний /quotes: p50 {statistics.median(legacy_latencies) * 1000:.0f} ms "
+              f"(сайт отвечает за {SERVER_DELAY * 1000:.0f} ms)")
+        print(f"QuoteService: первая цитата через {first_time * 1000:.0f} ms, далее p50 "
+              f"{latencies[len(latencies) // 2] * 1e6:.1f} µs, p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} µs")
+
+        # Холодный старт: цитаты с диска, сайт не трогается, пока не истёк ttl
+        requests_before = site.requests
+        restarted = QuoteService(url, cache_path=cache_path)
+        start = time.perf_counter()
+        await restarted.start()
+        assert await restarted.get_quote() in expected
+        cold_time = time.perf_counter() - start
+        await asyncio.sleep(SERVER_DELAY * 2)
+        assert site.requests == requests_before and restarted.quotes == expected
+        await restarted.stop()
+        print(f"холодный старт с диска: {cold_time * 1000:.1f} ms, запросов к сайту: 0")
+
+        # Фоновое обновление по ttl; пока сайт отвечает ошибкой, цитаты остаются прежними
+        site.failing = True
+        refreshing = QuoteService(url, cache_path=cache_path, ttl=0.5, retry_delay=0.1)
+        await refreshing.start()
+        await wait_for(lambda: site.requests >= requests_before + 2)
+        assert refreshing.quotes == expected
+        site.failing = False
+        site.version = 2
+        await wait_for(lambda: refreshing.quotes and refreshing.quotes[0].startswith("Цитата 2-"))
+        await refreshing.stop()
+        assert QuoteService(url, cache_path=cache_path).load_cache() == len(refreshing.quotes)
+        print("фоновое обновление, повтор после ошибки и копия на диске: ok")
+
+        # Сайт лежит, копии на диске нет: 50 одновременных /quotes — один запрос
+        site.failing = True
+        requests_before = site.requests
+        cold = QuoteService(url, cache_path=None, failure_backoff=0.5)
+        start = time.perf_counter()
+        assert await asyncio.gather(*(cold.get_quote() for _ in range(50))) == [None] * 50
+        waited = time.perf_counter() - start
+        assert site.requests == requests_before + 1 and waited < SERVER_DELAY * 2, (site.requests, waited)
+        start = time.perf_counter()
+        assert await cold.get_quote() is None
+        assert site.requests == requests_before + 1 and time.perf_counter() - start < SERVER_DELAY / 2
+        await asyncio.sleep(0.5)
+        site.failing = False
+        assert await cold.get_quote() in refreshing.quotes and site.requests == requests_before + 2
+        await cold.stop()
+        print(f"50 одновременных /quotes при недоступном сайте: 1 запрос, {waited * 1000:.0f} ms; "
+              f"повтор после паузы: ok")
+
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
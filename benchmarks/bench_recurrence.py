@@ -0,0 +1,180 @@
+"""
+Бенчмарк ленивых повторений Recurrence и сверка с прежним расписанием
+
+Прежний get_month_schedule (списки с жёсткими горизонтами 30 дней /
+4 недели / 12 месяцев; ежемесячные вхождения после декабря молча
+пропадали) воспроизведён здесь как эталон. Вхождения Recurrence
+сверяются с перебором по дням, а расписания — с прежними там, где те
+были верны. Время — расписания на месяц и «следующее вхождение после t»
+для 100 000 привычек.
+
+Запуск: python -m benchmarks.bench_recurrence
+"""
+import calendar
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from utils.calendar_integration import calendar_integration
+from utils.recurrence import Recurrence
+
+HABITS = 100_000
+CHECKS = 2000
+
+
+def legacy_month_schedule(start_date: datetime, frequency: dict) -> list:
+    """CalendarIntegration.get_month_schedule до перехода на Recurrence"""
+    schedule = []
+    current_date = start_date
+    if frequency['type'] == 'daily':
+        for i in range(30):
+            if i % frequency['interval'] == 0:
+                schedule.append(current_date)
+            current_date += timedelta(days=1)
+    elif frequency['type'] == 'weekly':
+        days_ahead = 0 - start_date.weekday()
+        if days_ahead <= 0:
+            days_ahead += 7
+        first_occurrence = start_date + timedelta(days=days_ahead)
+        for week in range(4):
+            occurrence = first_occurrence + timedelta(weeks=week)
+            if occurrence.month == start_date.month:
+                schedule.append(occurrence)
+    elif frequency['type'] == 'monthly':
+        for month in range(12):
+            try:
+                schedule.append(start_date.replace(month=start_date.month + month))
+            except ValueError:
+                pass
+    return schedule
+
+
+def naive_between(recurrence: Recurrence, start: date, end: date) -> list:
+    """Вхождения перебором дней по определению повторения"""
+    first = recurrence.start
+    result = []
+    day = max(start, first)
+    while day <= end:
+        if recurrence.frequency_type == 'daily':
+            due = (day - first).days % recurrence.interval == 0
+        elif recurrence.frequency_type == 'weekly':
+            weeks = (day.toordinal() - 1) // 7 - (first.toordinal() - 1) // 7
+            due = day.weekday() in recurrence.weekdays and weeks % recurrence.interval == 0
+        else:
+            months = (day.year - first.year) * 12 + day.month - first.month
+            last_day = calendar.monthrange(day.year, day.month)[1]
+            due = months % recurrence.interval == 0 and day.day == min(first.day, last_day)
+        if due:
+            result.append(day)
+        day += timedelta(days=1)
+    return result
+
+
+def random_frequency(rng: random.Random) -> dict:
+    frequency = {
+        'type': rng.choice(('daily', 'weekly', 'monthly')),
+        'interval': rng.choice((1, 1, 2, 3, 5)),
+    }
+    if frequency['type'] == 'weekly' and rng.random() < 0.5:
+        frequency['weekdays'] = rng.sample(range(7), rng.randint(1, 4))
+    return frequency
+
+
+def random_start(rng: random.Random) -> datetime:
+    return datetime(2020, 1, 1, rng.randint(0, 23), rng.choice((0, 30))) + timedelta(days=rng.randint(0, 3000))
+
+
+def check_against_naive(rng: random.Random):
+    for _ in range(CHECKS):
+        frequency = random_frequency(rng)
+        recurrence = Recurrence.from_frequency(frequency, random_start(rng).date())
+        window_start = recurrence.start + timedelta(days=rng.randint(-60, 400))
+        window_end = window_start + timedelta(days=rng.randint(0, 200))
+        expected = naive_between(recurrence, window_start, window_end)
+        assert list(recurrence.between(window_start, window_end)) == expected, (recurrence, window_start)
+        if expected:
+            assert recurrence.next_after(window_start - timedelta(days=1)) == expected[0]
+            assert recurrence.next_after(expected[0]) == (
+                expected[1] if len(expected) > 1 else recurrence.take(2, after=expected[0])[1]
+            )
+
+    # Вхождения-datetime: следующее строго после момента, с учётом времени
+    recurrence = Recurrence('daily', 1, datetime(2025, 12, 30, 9, 0))
+    assert recurrence.next_after(datetime(2025, 12, 31, 8, 59)) == datetime(2025, 12, 31, 9, 0)
+    assert recurrence.next_after(datetime(2025, 12, 31, 9, 0)) == datetime(2026, 1, 1, 9, 0)
+    assert list(recurrence.between(datetime(2025, 12, 30, 10, 0), datetime(2026, 1, 1, 8, 0))) == \
+        [datetime(2025, 12, 31, 9, 0)]
+
+    # Еженедельная привычка без дней недели: через неделю после выполнения, а не в понедельник
+    sunday = datetime(2026, 10, 18)
+    for start_date in (None, datetime(2026, 10, 14), sunday):
+        assert calendar_integration.get_next_occurrence(
+            sunday, {'type': 'weekly', 'interval': 1}, start_date
+        ) == datetime(2026, 10, 25), start_date
+    assert calendar_integration.get_next_occurrence(
+        sunday, {'type': 'weekly', 'interval': 2}, datetime(2026, 10, 14)
+    ) == datetime(2026, 11, 1)
+
+
+def check_against_legacy(rng: random.Random):
+    compared = 0
+    for _ in range(CHECKS):
+        frequency = random_frequency(rng)
+        frequency.pop('weekdays', None)
+        start = random_start(rng)
+        legacy = legacy_month_schedule(start, frequency)
+        current = calendar_integration.get_month_schedule(start, frequency)
+        if frequency['type'] == 'daily':
+            assert current == legacy
+        elif frequency['type'] == 'weekly' and frequency['interval'] == 1:
+            # Прежний вариант обрывался на четырёх неделях
+            assert current[:len(legacy)] == legacy
+        elif frequency['type'] == 'monthly' and frequency['interval'] == 1:
+            # Прежний вариант был верен только в пределах года начальной даты
+            assert current[:len(legacy)] == legacy or start.day > 28
+            assert len(current) == 12
+            assert [(d.year * 12 + d.month) for d in current] == \
+                list(range(start.year * 12 + start.month, start.year * 12 + start.month + 12))
+        else:
+            continue
+        compared += 1
+    return compared
+
+
+def main():
+    rng = random.Random(17)
+    check_against_naive(rng)
+    compared = check_against_legacy(rng)
+    print(f"вхождения совпадают с перебором, расписания — с прежними ({compared} шт.)")
+
+    habits = [(random_start(rng), random_frequency(rng)) for _ in range(HABITS)]
+
+    start = time.perf_counter()
+    for start_date, frequency in habits:
+        legacy_month_schedule(start_date, frequency)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for start_date, frequency in habits:
+        calendar_integration.get_month_schedule(start_date, frequency)
+    current_time = time.perf_counter() - start
+    print(f"{HABITS} расписаний на месяц: прежнее {legacy_time:.2f} с, Recurrence {current_time:.2f} с")
+
+    recurrences = [calendar_integration.get_recurrence(start_date, frequency) for start_date, frequency in habits]
+    moment = datetime(2031, 6, 15, 12, 0)
+    start = time.perf_counter()
+    for recurrence in recurrences:
+        recurrence.next_after(moment)
+    next_time = time.perf_counter() - start
+    print(f"{HABITS} × next_after на 2031 год: {next_time:.2f} с ({next_time / HABITS * 1e6:.1f} µs)")
+
+    start = time.perf_counter()
+    total = sum(
+        sum(1 for _ in recurrence.between(moment, moment + timedelta(days=30)))
+        for recurrence in recurrences
+    )
+    print(f"{HABITS} диапазонов по 30 дней: {total} вхождений за {time.perf_counter() - start:.2f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Проверка очереди отправки напоминаний на локальном боте-заглушке
+
+Отправляет пачку напоминаний, назначенных на одно и то же время, и
+проверяет глобальный лимит, лимит на чат, порядок по опозданию и
+обработку retry_after. Печатает метрики очереди. Отменённое ожидание
+отправки не роняет задачу отправки, даже если сообщение упёрлось в
+flood control.
+
+Запуск: python -m benchmarks.bench_reminder_dispatch
+"""
+import asyncio
+import time
+from collections import defaultdict
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from utils.reminder_dispatcher import ReminderDispatcher
+
+CHATS = 100
+PER_CHAT = 2
+GLOBAL_RATE = 30
+
+
+class FakeBot:
+    """Бот-заглушка: один раз отвечает flood control, остальное "отправляет" """
+
+    def __init__(self, flood_at: int, retry_after: int = 1):
+        self.sent = []
+        self.flood_at = flood_at
+        self.retry_after = retry_after
+        self.calls = 0
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.calls += 1
+        if self.calls == self.flood_at:
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Too Many Requests", self.retry_after)
+        await asyncio.sleep(0.005)
+        self.sent.append((time.monotonic(), chat_id, text))
+
+
+async def main():
+    bot = FakeBot(flood_at=40)
+    dispatcher = ReminderDispatcher(bot, global_rate=GLOBAL_RATE)
+    now = time.time()
+
+    futures = []
+    start = time.monotonic()
+    for i in range(PER_CHAT):
+        for chat_id in range(CHATS):
+            # Второе напоминание каждого чата опоздало сильнее первого
+            futures.append(dispatcher.send(chat_id, f"{i}", due_at=now - 10 * i))
+    await asyncio.gather(*futures)
+    elapsed = time.monotonic() - start
+
+    total = CHATS * PER_CHAT
+    assert len(bot.sent) == total
+
+    # Глобальный лимит: не больше 2*rate за любую секунду (rate + стартовый запас)
+    times = [t for t, _, _ in bot.sent]
+    for i, t in enumerate(times):
+        in_window = sum(1 for other in times[i:] if other - t < 1.0)
+        assert in_window <= 2 * GLOBAL_RATE, in_window
+
+    # Лимит на чат: между сообщениями в один чат не меньше секунды
+    by_chat = defaultdict(list)
+    for t, chat_id, text in bot.sent:
+        by_chat[chat_id].append((t, text))
+    for chat_times in by_chat.values():
+        assert chat_times[1][0] - chat_times[0][0] >= 0.99
+        # Более запоздавшее напоминание ушло первым
+        assert chat_times[0][1] == "1"
+
+    metrics = dispatcher.get_metrics()
+    print(f"sent {total} messages in {elapsed:.2f} s ({total / elapsed:.1f} msg/s, limit {GLOBAL_RATE})")
+    print(f"metrics: {metrics}")
+    assert metrics['retried'] == 1
+    await dispatcher.stop()
+
+
+async def check_cancelled_flood():
+    """Ожидание отменено, а отправка исчерпала повторы на retry_after"""
+    errors = []
+    dispatcher = ReminderDispatcher(FakeBot(flood_at=1, retry_after=0), max_retries=0)
+    send = dispatcher._send
+
+    async def recorded_send(message):
+        # Ошибка задачи отправки иначе теряется вместе с задачей
+        try:
+            await send(message)
+        except Exception as e:
+            errors.append(e)
+
+    dispatcher._send = recorded_send
+    future = dispatcher.send(1, "отменено")
+    future.cancel()
+    await asyncio.sleep(0.05)
+    assert dispatcher.get_metrics()['failed'] == 1
+    await dispatcher.stop()
+    assert not errors, errors
+    print("cancelled send under flood control: ok")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    asyncio.run(check_cancelled_flood())
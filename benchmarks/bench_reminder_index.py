@@ -0,0 +1,76 @@
+"""
+Регрессионный бенчмарк поиска и отмены напоминаний при 1М загруженных
+напоминаний: операции должны зависеть от числа напоминаний пользователя,
+а не от общего количества.
+
+Запуск: python -m benchmarks.bench_reminder_index
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from utils.reminder_service import ReminderService
+
+USERS = 100_000
+HABITS_PER_USER = 10
+OPERATIONS = 10_000
+
+
+class FakeBot:
+    async def send_message(self, chat_id, text, reply_markup=None):
+        pass
+
+
+async def check_exact_match():
+    """Пользователь 1 не должен задевать напоминания пользователя 12"""
+    service = ReminderService(FakeBot(), persistent=False)
+    base = datetime.now(timezone.utc) + timedelta(days=1)
+    await service.schedule_reminder(1, "Зарядка", base, 2)
+    await service.schedule_reminder(12, "Зарядка", base, 2)
+    await service.schedule_reminder(1, "Вода", base, 23)
+    assert await service.cancel_reminder(1, 2)
+    assert not await service.cancel_reminder(1, 2)
+    assert [r['habit_id'] for r in await service.get_user_reminders(1)] == [23]
+    assert await service.cancel_all_user_reminders(1) == 1
+    assert len(await service.get_user_reminders(12)) == 1
+    await service.stop()
+
+
+def timed(name: str, n: int, start: float):
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {n / elapsed:>12,.0f} ops/sec")
+
+
+async def main():
+    await check_exact_match()
+
+    service = ReminderService(FakeBot(), persistent=False)
+    base = datetime.now(timezone.utc) + timedelta(days=1)
+    start = time.perf_counter()
+    for user_id in range(USERS):
+        for habit_id in range(HABITS_PER_USER):
+            await service.schedule_reminder(
+                user_id, "Зарядка", base + timedelta(seconds=habit_id * 60), habit_id
+            )
+    timed("schedule_reminder", USERS * HABITS_PER_USER, start)
+
+    start = time.perf_counter()
+    for i in range(OPERATIONS):
+        await service.get_user_reminders(i * 7 % USERS)
+    timed("get_user_reminders", OPERATIONS, start)
+
+    start = time.perf_counter()
+    for i in range(OPERATIONS):
+        await service.cancel_reminder(i, i % HABITS_PER_USER)
+    timed("cancel_reminder", OPERATIONS, start)
+
+    start = time.perf_counter()
+    for i in range(OPERATIONS, 2 * OPERATIONS):
+        await service.cancel_all_user_reminders(i)
+    timed("cancel_all_user_reminders", OPERATIONS, start)
+
+    await service.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+"""
+Проверка и бенчмарк восстановления напоминаний после перезапуска
+
+Сохраняет много напоминаний в базе, "перезапускает" сервис и проверяет,
+что при старте в память загружается только ближайшее окно, а
+напоминания доставляются ровно один раз, в том числе просроченные
+за время простоя. Напоминание о наступившем сроке привычки тоже не
+повторяется, сколько бы раз сервис ни перезапускался.
+
+Запуск: python -m benchmarks.bench_reminder_restart
+"""
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import database.async_db as adb
+import database.database as db
+from database.connection import close_all_connections
+from database.due_index import DEFAULT_REMINDER_HOUR
+import utils.reminder_service as reminder_service
+from utils.reminder_service import SCHEDULER_RETRY_DELAY, ReminderService
+from utils.timezones import from_timestamp, to_timestamp
+
+STORED = 200_000
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.sent.append(chat_id)
+
+
+async def main():
+    now = time.time()
+    conn = db.get_connection()
+    with conn:
+        # Напоминания на ближайшие двое суток
+        conn.executemany(
+            db.ADD_REMINDER_SQL,
+            ((i, "1", "Зарядка", now + 120 + i * 172800 / STORED) for i in range(STORED)),
+        )
+
+    # Первый запуск: одно напоминание "в полёте" и одно в ближайшую секунду
+    service = ReminderService(FakeBot())
+    await service.start()
+    await service.schedule_reminder(-1, "Вода", datetime.now(timezone.utc) + timedelta(seconds=0.3), 7)
+    await service.schedule_reminder(-2, "Сон", datetime.now(timezone.utc) + timedelta(seconds=0.6), 8)
+    await service.stop()
+    # Имитируем падение: напоминание -2 успели забрать на отправку
+    reminder_id = next(r['reminder_id'] for r in await service.get_user_reminders(-2))
+    with conn:
+        conn.execute("UPDATE reminders SET status = 'sending' WHERE user_id = -2")
+
+    await asyncio.sleep(0.4)
+
+    # Перезапуск
+    bot = FakeBot()
+    service = ReminderService(bot)
+    start = time.perf_counter()
+    await service.start()
+    elapsed = time.perf_counter() - start
+    loaded = service._active_count
+    print(f"start(): {elapsed * 1000:.1f} ms, loaded {loaded:,} of {STORED + 1:,} stored reminders")
+    assert loaded < STORED // 10
+
+    await asyncio.sleep(0.2)
+    await service.stop()
+    # Просроченное напоминание -1 доставлено один раз, прерванное -2 не повторяется
+    assert bot.sent == [-1], bot.sent
+    assert await service.get_user_reminders(-1) == []
+    assert await service.get_user_reminders(-2) == [], reminder_id
+    print("restart delivery: ok")
+
+
+async def check_due_restarts():
+    """Срок привычки напоминает о себе один раз при любом числе перезапусков"""
+    conn = db.get_connection()
+    user_id = db.add_user_if_not_exists(-3, "", "", "")
+    habit_id = db.add_habit(user_id, "Зарядка")
+    # Без выполнений срок — момент создания, то есть уже наступил
+    db.set_habit_frequency(habit_id, {'type': 'daily', 'interval': 1})
+    bot = FakeBot()
+    for _ in range(3):
+        db.load_due_index()
+        service = ReminderService(bot)
+        await service.start()
+        await service.stop()
+        pending = conn.execute(
+            "SELECT COUNT(*) FROM reminders WHERE user_id = -3 AND status = 'pending'"
+        ).fetchone()[0]
+        assert pending == 1, pending
+    service = ReminderService(bot)
+    await service.start()
+    await asyncio.sleep(1.2)
+    await service.stop()
+    db.load_due_index()
+    service = ReminderService(bot)
+    await service.start()
+    await service.stop()
+    assert bot.sent == [-3], bot.sent
+    print("due reminder after restarts: ok")
+
+
+async def check_due_while_running():
+    """
+    Привычка, созданная при работающем планировщике, напоминает о себе
+    без ожидания следующего окна, а срок после напоминания переносится на
+    час напоминаний следующего дня, а не сбрасывается
+    """
+    conn = db.get_connection()
+    user_id = db.add_user_if_not_exists(-4, "", "", "")
+    bot = FakeBot()
+    db.load_due_index()
+    service = ReminderService(bot)
+    await service.start()
+    habit_id = db.add_habit(user_id, "Прогулка")
+    db.set_habit_frequency(habit_id, {'type': 'daily', 'interval': 1})
+    await asyncio.sleep(1.2)
+    await service.stop()
+    assert bot.sent == [-4], bot.sent
+    next_due = conn.execute("SELECT next_due_at FROM habits WHERE id = ?", (habit_id,)).fetchone()[0]
+    tomorrow = from_timestamp(time.time()).date() + timedelta(days=1)
+    assert next_due == to_timestamp(datetime(tomorrow.year, tomorrow.month, tomorrow.day, DEFAULT_REMINDER_HOUR))
+    assert db.due_index.get(habit_id) == next_due
+    print("due reminder while running, rearmed: ok")
+
+
+async def check_scheduler_errors():
+    """Ошибка базы на шаге планировщика не останавливает его: срок забирается повторно"""
+    user_id = db.add_user_if_not_exists(-5, "", "", "")
+    bot = FakeBot()
+    db.load_due_index()
+    claim = adb.claim_due_habits
+    failures = []
+
+    async def failing_claim(*args):
+        if not failures:
+            failures.append(args)
+            raise RuntimeError("database is locked")
+        return await claim(*args)
+
+    adb.claim_due_habits = failing_claim
+    reminder_service.SCHEDULER_RETRY_DELAY = 0.2
+    try:
+        service = ReminderService(bot)
+        await service.start()
+        habit_id = db.add_habit(user_id, "Чтение")
+        db.set_habit_frequency(habit_id, {'type': 'daily', 'interval': 1})
+        await asyncio.sleep(1.5)
+        assert not service._scheduler_task.done()
+        await service.stop()
+    finally:
+        adb.claim_due_habits = claim
+        reminder_service.SCHEDULER_RETRY_DELAY = SCHEDULER_RETRY_DELAY
+    assert failures and bot.sent == [-5], bot.sent
+    print("scheduler survives errors: ok")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        asyncio.run(main())
+        asyncio.run(check_due_restarts())
+        asyncio.run(check_due_while_running())
+        asyncio.run(check_scheduler_errors())
+        adb.shutdown()
+        close_all_connections()
@@ -0,0 +1,95 @@
+"""
+Бенчмарк планировщика напоминаний: одна asyncio-задача на напоминание
+(как было раньше) против единой кучи в ReminderService.
+
+Планирует напоминания на завтра и печатает время постановки и прирост
+памяти. Для старого подхода используется меньшее количество, иначе
+бенчмарк не помещается в память.
+
+Запуск: python -m benchmarks.bench_reminder_scheduler
+"""
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from utils.reminder_service import ReminderService
+
+HEAP_REMINDERS = 1_000_000
+TASK_REMINDERS = 100_000
+
+
+class FakeBot:
+    """Бот-заглушка: запоминает отправленные сообщения"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.sent.append((chat_id, time.time()))
+
+
+async def legacy_schedule(n: int, base: datetime) -> list:
+    async def sleeper(delay):
+        await asyncio.sleep(delay)
+
+    now = datetime.now(timezone.utc)
+    tasks = []
+    for i in range(n):
+        reminder_time = base + timedelta(seconds=i % 86400)
+        tasks.append(asyncio.create_task(sleeper((reminder_time - now).total_seconds())))
+    await asyncio.sleep(0)
+    return tasks
+
+
+async def heap_schedule(n: int, base: datetime) -> ReminderService:
+    service = ReminderService(FakeBot(), persistent=False)
+    for i in range(n):
+        await service.schedule_reminder(
+            user_id=i, habit_name="Зарядка",
+            reminder_time=base + timedelta(seconds=i % 86400), habit_id=i
+        )
+    await asyncio.sleep(0)
+    return service
+
+
+async def measure(name: str, coro_factory, n: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = await coro_factory(n, datetime.now(timezone.utc) + timedelta(days=1))
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{name:<22} {n:>9,} reminders  {elapsed:6.2f} s  "
+          f"{n / elapsed:>10,.0f} /sec  {memory / n:6.0f} bytes/reminder")
+    return result
+
+
+async def check_delivery():
+    """Проверяет, что напоминания приходят в порядке времени срабатывания"""
+    bot = FakeBot()
+    service = ReminderService(bot, persistent=False)
+    now = datetime.now(timezone.utc)
+    for i, offset in enumerate([0.3, 0.1, 0.2, 0.05]):
+        await service.schedule_reminder(i, "Зарядка", now + timedelta(seconds=offset), i)
+    await service.cancel_reminder(2, 2)
+    await asyncio.sleep(0.5)
+    assert [chat_id for chat_id, _ in bot.sent] == [3, 1, 0], bot.sent
+    await service.stop()
+
+
+async def main():
+    await check_delivery()
+
+    tasks = await measure("task per reminder", legacy_schedule, TASK_REMINDERS)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    del tasks
+
+    service = await measure("heap scheduler", heap_schedule, HEAP_REMINDERS)
+    await service.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
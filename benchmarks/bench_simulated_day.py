@@ -0,0 +1,116 @@
+"""
+Бенчмарк: сутки напоминаний на SimulatedClock
+
+Планировщик ReminderService и очередь отправки берут время и таймеры из
+часов. С SimulatedClock время идёт только по команде, поэтому сутки
+с 1 000 000 напоминаний (около 12 в секунду) прокручиваются целиком за
+секунды реального времени. Проверяется, что каждое напоминание отправлено
+ровно один раз, не раньше своего времени и без заметного опоздания по
+симулированным часам, а отменённые не отправлены.
+
+Там же — «сегодня» из часов (кэш до полуночи пояса) против datetime.now(zone).
+
+Запуск: python -m benchmarks.bench_simulated_day
+"""
+import asyncio
+import time
+from datetime import date, datetime, timezone
+
+from utils.clock import SimulatedClock, SystemClock
+from utils.reminder_service import ReminderService
+from utils.timezones import get_zone
+
+REMINDERS = 1_000_000
+USERS = 100_000
+DAY = 86400
+CANCELLED = 1000
+
+
+class FakeBot:
+    """Запоминает, кому и когда (по симулированным часам) ушло сообщение"""
+
+    def __init__(self, clock: SimulatedClock):
+        self.clock = clock
+        self.sent = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.sent.append((chat_id, self.clock.time()))
+
+
+async def check_today():
+    """«Сегодня» меняется ровно в полночь пояса, в том числе в день перехода на летнее время"""
+    # 2025-03-29 22:59:59 UTC = 23:59:59 в Берлине, до перехода на летнее время
+    clock = SimulatedClock(datetime(2025, 3, 29, 22, 59, 59, tzinfo=timezone.utc).timestamp())
+    assert clock.today("Europe/Berlin") == date(2025, 3, 29)
+    assert clock.today("Asia/Vladivostok") == date(2025, 3, 30)
+    await clock.advance(1)
+    assert clock.today("Europe/Berlin") == date(2025, 3, 30)
+    # Следующая полночь в Берлине — через 23 часа: сутки перехода короче
+    await clock.advance(23 * 3600 - 1)
+    assert clock.today("Europe/Berlin") == date(2025, 3, 30)
+    await clock.advance(1)
+    assert clock.today("Europe/Berlin") == date(2025, 3, 31)
+
+    calls = 1_000_000
+    zone = get_zone("Europe/Moscow")
+    started = time.perf_counter()
+    for _ in range(calls):
+        datetime.now(zone).date()
+    now_time = time.perf_counter() - started
+    system_clock = SystemClock()
+    started = time.perf_counter()
+    for _ in range(calls):
+        system_clock.today("Europe/Moscow")
+    cached_time = time.perf_counter() - started
+    print(f"«сегодня» ×{calls:,}: datetime.now(zone) {now_time:.2f} с, SystemClock.today {cached_time:.2f} с")
+
+
+async def main():
+    await check_today()
+    start_at = datetime(2025, 3, 30, tzinfo=timezone.utc).timestamp()
+    clock = SimulatedClock(start_at)
+    bot = FakeBot(clock)
+    service = ReminderService(bot, persistent=False, clock=clock)
+
+    # Напоминания на каждую целую секунду суток, по ~12 в секунду
+    fire_times = [start_at + 1 + i * DAY // REMINDERS for i in range(REMINDERS)]
+    started = time.perf_counter()
+    for i, fire_at in enumerate(fire_times):
+        await service.schedule_reminder(
+            i % USERS, "Зарядка", datetime.fromtimestamp(fire_at, timezone.utc), habit_id=i
+        )
+    schedule_time = time.perf_counter() - started
+    for user_id in range(CANCELLED):
+        assert await service.cancel_reminder(user_id, user_id)
+
+    started = time.perf_counter()
+    timers = await clock.run_until(start_at + DAY + 60)
+    run_time = time.perf_counter() - started
+    await service.stop()
+
+    expected = {
+        (i % USERS, fire_at) for i, fire_at in enumerate(fire_times)
+        if not (i < CANCELLED)
+    }
+    assert len(bot.sent) == REMINDERS - CANCELLED, len(bot.sent)
+    lateness = []
+    by_user = {}
+    for chat_id, sent_at in bot.sent:
+        by_user.setdefault(chat_id, []).append(sent_at)
+    for (chat_id, fire_at) in sorted(expected):
+        sent_at = by_user[chat_id].pop(0)
+        assert sent_at >= fire_at, (chat_id, fire_at, sent_at)
+        lateness.append(sent_at - fire_at)
+    lateness.sort()
+    metrics = service.dispatcher.get_metrics()
+    assert metrics['sent'] == REMINDERS - CANCELLED and metrics['failed'] == 0
+
+    print(f"запланировано {REMINDERS:,} напоминаний за {schedule_time:.1f} с")
+    print(f"сутки прокручены за {run_time:.1f} с ({DAY / run_time:,.0f}x), таймеров: {timers:,}")
+    print(f"опоздание по симулированным часам: p50 {lateness[len(lateness) // 2]:.2f} с, "
+          f"p99 {lateness[int(len(lateness) * 0.99)]:.2f} с, max {lateness[-1]:.2f} с")
+    print("все напоминания отправлены по одному разу и не раньше срока")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
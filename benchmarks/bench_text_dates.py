@@ -0,0 +1,62 @@
+"""
+Бенчмарк извлечения дат из сообщений: перебор всех фраз до 4 слов
+(прежний TextParser._extract_dates) против однопроходного поиска.
+
+Запуск: python -m benchmarks.bench_text_dates
+"""
+import time
+
+from utils.date_parser import DateParser
+from utils.text_parser import TextParser
+
+# Без кэша: прежний код разбирал каждую фразу заново
+date_parser = DateParser(cache_size=0)
+
+MESSAGES = [
+    "Читать книгу 30 минут каждый день в 21:00, начиная с завтра и до 31.12, напомни мне",
+    "Бегать по утрам в 7:30 каждый понедельник, среду и пятницу",
+    "Пить 8 стаканов воды ежедневно",
+    "Медитация 10 минут утром. Начать сегодня, через 2 недели увеличить до 20 минут, "
+    "а через 3 месяца — до 30. Напомнить в 8 утра, в воскресенье отдыхаем",
+    "Английский каждые 2 дня по 1 часу, первое занятие 15.11.2025 в 19:00, "
+    "повторение во вторник и четверг, уведомление за час",
+    "Зарядка",
+]
+
+
+def legacy_extract_dates(text: str):
+    dates = []
+    words = text.split()
+    for i in range(len(words)):
+        for j in range(i + 1, min(i + 5, len(words) + 1)):
+            date = date_parser.parse_date(' '.join(words[i:j]))
+            if date:
+                is_valid, _error = date_parser.validate_date(date)
+                if is_valid:
+                    dates.append(date)
+    return dates
+
+
+def measure(name: str, func, rounds: int = 300):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in MESSAGES:
+            func(text)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {rounds * len(MESSAGES) / elapsed:>10,.0f} messages/sec")
+
+
+def main():
+    parser = TextParser()
+    for text in MESSAGES:
+        spans = parser.extract_date_spans(text)
+        # Каждая найденная дата есть и среди результатов перебора фраз
+        assert set(d for d, _ in spans) <= set(legacy_extract_dates(text)), text
+        print(f"{len(text):>4} chars: " + ", ".join(f"{text[a:b]!r}" for _, (a, b) in spans))
+
+    measure("legacy", legacy_extract_dates)
+    measure("single-pass", parser._extract_dates)
+
+
+if __name__ == "__main__":
+    main()
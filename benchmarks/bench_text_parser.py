@@ -0,0 +1,209 @@
+"""
+Бенчмарк TextParser.parse_habit_text и сверка с прежней реализацией
+
+Прежний разбор (все паттерны через кэш модуля re, последовательные re.sub
+без учёта регистра при очистке названия, даты общей альтернацией
+с именованными группами) воспроизведён здесь как эталон: на корпусе
+сообщений результаты должны совпадать полностью, включая названия.
+Обязательные куски из таблицы паттернов проверяются на каждом совпадении
+в корпусе: паттерн без своего куска в тексте не пропускается.
+
+Запуск: python -m benchmarks.bench_text_parser
+"""
+import random
+import re
+import timeit
+
+from utils.date_parser import date_parser
+from utils.text_parser import TextParser
+from utils.clock import clock
+
+CORPUS = [
+    "Читать книгу 30 минут каждый день в 21:00, начиная с завтра и до 31.12, напомни мне",
+    "Бегать по утрам в 7:30 каждый понедельник, среду и пятницу",
+    "Пить 8 стаканов воды ежедневно",
+    "Медитация 10 минут утром. Начать сегодня, через 2 недели увеличить до 20 минут, "
+    "а через 3 месяца — до 30. Напомнить в 8 утра, в воскресенье отдыхаем",
+    "Английский каждые 2 дня по 1 часу, первое занятие 15.11.2025 в 19:00, "
+    "повторение во вторник и четверг, уведомление за час",
+    "Зарядка", "", "   ", "утром", "напомни мне", "ПРОБЕЖКА В 7 УТРА ЕЖЕДНЕВНО",
+    "Йога каждые 3 недели в 10 часов", "Отчёт раз в 2 месяца, 2 ч. работы",
+    "Уборка раз в неделю 45 м. вечером", "Созвон в 9 вечера через 5 дней",
+    "Спать ночью 8 часов", "Растяжка днем 15 минуты, уведомить", "Планирование каждый 2 дня",
+    # Пересекающиеся и склеивающиеся маркеры: очистка должна дать то же, что re.sub по очереди
+    "в 10:30 минут", "5 минутром", "вечутромером", "в 2 часа", "в 123 часа",
+    "напомнинапомни мне мне", "2 часов 3 минут в 4 часа", "в 1в 2 часа",
+    # Символы, у которых нижний регистр другой длины или сопоставление без учёта регистра особое
+    "İstanbul в 9 утра", "ſunday в 8:00", "Встреча в ᲀоскресенье",
+]
+
+FRAGMENTS = [
+    "читать", "бегать", "Пить воду", "каждый день", "ежедневно", "раз в день",
+    "каждые 2 дня", "раз в 3 недели", "каждую неделю", "раз в месяц", "каждые 4 месяца",
+    "в 7:30", "в 8 часов", "в 6 утра", "в 9 вечера", "утром", "днем", "вечером", "ночью",
+    "20 минут", "1 час", "2 ч.", "5 м.", "напомни мне", "напомнить", "уведомление",
+    "сегодня", "завтра", "через 3 дня", "через 2 недели", "в пятницу", "пн", "25.12",
+    "01.02.2026", "2026-03-04", "31.02", "—", ",", "и", "по", "Вс", "СЕГОДНЯ", "12",
+]
+
+
+class LegacyTextParser(TextParser):
+    def __init__(self):
+        super().__init__()
+        self._legacy_dates = re.compile(
+            r'\b(?:' + '|'.join(
+                f'(?P<p{i}>{pattern[2:]})' for i, pattern in enumerate(date_parser.date_patterns)
+            ) + ')',
+            re.IGNORECASE
+        )
+
+    def parse_habit_text(self, text):
+        result = {
+            'name': text.strip(), 'frequency': None, 'time': None, 'duration': None,
+            'reminder': False, 'dates': [], 'parsed_successfully': True, 'errors': []
+        }
+        result['dates'] = self._legacy_extract_dates(text)
+        result['frequency'] = self._legacy_frequency(text)
+        result['time'] = self._legacy_time(text)
+        result['duration'] = self._legacy_duration(text)
+        text_lower = text.lower()
+        result['reminder'] = any(re.search(p, text_lower) for p in self.patterns['reminder'])
+        result['name'] = self._legacy_clean_habit_name(text)
+        return result
+
+    def _legacy_extract_dates(self, text):
+        dates, seen = [], set()
+        today = clock.midnight()
+        for match in self._legacy_dates.finditer(text):
+            pattern, parser_func = date_parser._compiled[int(match.lastgroup[1:])]
+            try:
+                date = parser_func(pattern.match(text, match.start()), today)
+            except (ValueError, TypeError):
+                continue
+            if date not in seen and date_parser.validate_date(date)[0]:
+                seen.add(date)
+                dates.append(date)
+        return dates
+
+    def _legacy_frequency(self, text):
+        text_lower = text.lower()
+        for pattern in self.patterns['frequency']:
+            match = re.search(pattern, text_lower)
+            if match:
+                if 'каждый день' in pattern or 'ежедневно' in pattern or 'раз в день' in pattern:
+                    return {'type': 'daily', 'interval': 1}
+                elif 'каждую неделю' in pattern or 'раз в неделю' in pattern:
+                    return {'type': 'weekly', 'interval': 1}
+                elif 'каждый месяц' in pattern or 'раз в месяц' in pattern:
+                    return {'type': 'monthly', 'interval': 1}
+                elif match.groups():
+                    number = int(match.group(1))
+                    if 'дн' in pattern:
+                        return {'type': 'daily', 'interval': number}
+                    elif 'нед' in pattern:
+                        return {'type': 'weekly', 'interval': number}
+                    elif 'мес' in pattern:
+                        return {'type': 'monthly', 'interval': number}
+        return None
+
+    def _legacy_time(self, text):
+        text_lower = text.lower()
+        for pattern in self.patterns['time']:
+            match = re.search(pattern, text_lower)
+            if match:
+                if ':' in pattern:
+                    hour, minute = map(int, match.groups())
+                    return {'hour': hour, 'minute': minute, 'type': 'exact'}
+                elif 'час' in pattern:
+                    return {'hour': int(match.group(1)), 'minute': 0, 'type': 'exact'}
+                elif 'утра' in pattern:
+                    return {'hour': int(match.group(1)), 'minute': 0, 'type': 'morning'}
+                elif 'вечера' in pattern:
+                    return {'hour': int(match.group(1)) + 12, 'minute': 0, 'type': 'evening'}
+                elif 'утром' in pattern:
+                    return {'hour': 9, 'minute': 0, 'type': 'morning'}
+                elif 'днем' in pattern:
+                    return {'hour': 14, 'minute': 0, 'type': 'afternoon'}
+                elif 'вечером' in pattern:
+                    return {'hour': 19, 'minute': 0, 'type': 'evening'}
+                elif 'ночью' in pattern:
+                    return {'hour': 23, 'minute': 0, 'type': 'night'}
+        return None
+
+    def _legacy_duration(self, text):
+        text_lower = text.lower()
+        for pattern in self.patterns['duration']:
+            match = re.search(pattern, text_lower)
+            if match:
+                value = int(match.group(1))
+                if 'мин' in pattern:
+                    return {'value': value, 'unit': 'minutes'}
+                elif 'час' in pattern or 'ч.' in pattern:
+                    return {'value': value, 'unit': 'hours'}
+        return None
+
+    def _legacy_clean_habit_name(self, text):
+        cleaned = text
+        for category in ('time', 'duration', 'reminder'):
+            for pattern in self.patterns[category]:
+                cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+        return cleaned if cleaned else text
+
+
+def generate_messages(count: int, seed: int = 7):
+    """Случайные сообщения из фрагментов, в том числе без пробелов между ними"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        parts = rng.sample(FRAGMENTS, rng.randint(1, 8))
+        separator = rng.choice([" ", " ", " ", "", ", ", "  "])
+        text = separator.join(parts)
+        messages.append(text.upper() if rng.random() < 0.1 else text)
+    return messages
+
+
+def outcome(parser, text):
+    """Результат разбора или тип исключения: эталон падает на тех же сообщениях"""
+    try:
+        return parser.parse_habit_text(text)
+    except Exception as e:
+        return type(e)
+
+
+def measure(parser, texts, repeat: int = 7, number: int = 20) -> float:
+    """Лучшее из нескольких повторений, микросекунд на сообщение"""
+    def run():
+        for text in texts:
+            outcome(parser, text)
+    return min(timeit.repeat(run, number=number, repeat=repeat)) / number / len(texts) * 1e6
+
+
+def main():
+    parser, legacy = TextParser(cache_size=0), LegacyTextParser()
+
+    golden = CORPUS + generate_messages(5000)
+    for text in golden:
+        assert outcome(parser, text) == outcome(legacy, text), text
+    failing = sum(1 for text in golden if isinstance(outcome(legacy, text), type))
+    for category, compiled in parser._compiled.items():
+        for pattern, _compiled, ignorecase, literal in compiled:
+            for text in golden:
+                for match in ignorecase.finditer(text):
+                    assert literal in match.group().lower(), (category, pattern, literal, match.group())
+    print(f"golden corpus: {len(golden)} messages identical ({failing} raise in both)")
+
+    groups = {
+        "short": [text for text in CORPUS[5:] if len(text) < 40],
+        "long": CORPUS[:5],
+        "generated": generate_messages(200, seed=11),
+    }
+    print(f"{'':<10} {'legacy':>10} {'new':>10}")
+    for name, texts in groups.items():
+        old = measure(legacy, texts)
+        new = measure(parser, texts)
+        print(f"{name:<10} {old:>8.1f}µs {new:>8.1f}µs {old / new:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Бенчмарк и проверка часовых поясов пользователей
+
+Часы зафиксированы: все проверки идут от заданных моментов UTC, а не от
+текущего времени, поэтому переходы на летнее время (Нью-Йорк, Берлин)
+проверяются в одни и те же дни при любом запуске:
+- несуществующее время весеннего перехода и неоднозначное осеннего;
+- «каждый день в 9:00» через переход остаётся в 9:00 по часам пользователя;
+- «сегодня» у пользователей разных поясов в один и тот же момент;
+- срок привычки — полночь в поясе её владельца;
+- пояс читается из кэша, а смена пояса сразу видна обработчикам;
+- напоминания «в 9:00» из разных поясов расходятся по часам UTC.
+
+Запуск: python -m benchmarks.bench_timezones
+"""
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import database.async_db as adb
+import database.database as db
+from database.connection import close_all_connections
+from database.due_index import DEFAULT_REMINDER_HOUR
+from utils.reminder_service import ReminderService
+from utils.timezones import from_timestamp, get_zone, is_valid_timezone, to_timestamp
+
+ZONES = ["Europe/Moscow", "Europe/Berlin", "America/New_York", "Asia/Yekaterinburg",
+         "Asia/Vladivostok", "Pacific/Auckland", "UTC"]
+USERS = 70_000
+
+
+def utc(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def check_transitions():
+    # Весенний переход в Нью-Йорке 9 марта 2025: 02:00 -> 03:00 EDT.
+    # Несуществующее 02:30 сдвигается вперёд на час — 03:30 EDT
+    assert to_timestamp(datetime(2025, 3, 9, 2, 30), "America/New_York") == utc(2025, 3, 9, 7, 30)
+    assert from_timestamp(utc(2025, 3, 9, 7, 30), "America/New_York") == datetime(2025, 3, 9, 3, 30)
+    # Осенний переход 2 ноября 2025: 01:30 бывает дважды, берётся первое (EDT)
+    assert to_timestamp(datetime(2025, 11, 2, 1, 30), "America/New_York") == utc(2025, 11, 2, 5, 30)
+    # Aware datetime переводится как есть, пояс пользователя не важен
+    moment = datetime(2025, 3, 30, 1, 0, tzinfo=timezone.utc)
+    assert to_timestamp(moment, "Asia/Vladivostok") == moment.timestamp()
+
+    # Ежедневное напоминание в 9:00 через переход в Берлине (30 марта и 26 октября 2025):
+    # по часам пользователя сутки, по UTC — 23 и 25 часов
+    service = ReminderService(bot=None, persistent=False)
+    for before, hours in ((datetime(2025, 3, 29, 10, 0), 23), (datetime(2025, 10, 25, 10, 0), 25)):
+        habit = {'reminder_time': before.replace(hour=9)}
+        next_time = service._get_reminder_time(habit, before)
+        assert next_time == before.replace(hour=9) + timedelta(days=1)
+        gap = to_timestamp(next_time, "Europe/Berlin") - to_timestamp(habit['reminder_time'], "Europe/Berlin")
+        assert gap == hours * 3600, (next_time, gap)
+
+    # Один момент — разные «сегодня»: 2025-06-30 13:30 UTC
+    moment = utc(2025, 6, 30, 13, 30)
+    days = {zone: from_timestamp(moment, zone).date() for zone in ("Pacific/Auckland", "UTC", "America/New_York")}
+    assert days == {"Pacific/Auckland": date(2025, 7, 1), "UTC": date(2025, 6, 30),
+                    "America/New_York": date(2025, 6, 30)}
+
+    assert is_valid_timezone("Asia/Yekaterinburg") and not is_valid_timezone("Mars/Olympus")
+    # Неизвестное имя — пояс по умолчанию
+    assert get_zone("Mars/Olympus") is get_zone(None)
+
+
+def check_due_in_user_zone():
+    """Срок ежедневной привычки — час напоминаний следующего дня в поясе владельца"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        conn = db.get_connection()
+        habit_ids = {}
+        for telegram_id, zone in enumerate(ZONES, start=1):
+            user_id = db.add_user_if_not_exists(telegram_id, zone, zone, "")
+            assert db.set_user_timezone(telegram_id, zone)
+            db.add_habit(user_id, "Зарядка", "")
+            habit_id = conn.execute("SELECT max(id) FROM habits").fetchone()[0]
+            db.set_habit_frequency(habit_id, {'type': 'daily', 'interval': 1})
+            db.mark_habit(habit_id, "done", date(2025, 3, 29))
+            habit_ids[habit_id] = zone
+        assert not db.set_user_timezone(1, "Mars/Olympus")
+        assert db.get_user_timezone(1) == ZONES[0]
+
+        for habit_id, zone in habit_ids.items():
+            due_at = db.due_index.get(habit_id)
+            assert from_timestamp(due_at, zone) == datetime(2025, 3, 30, DEFAULT_REMINDER_HOUR), (zone, due_at)
+        # Смена пояса пересчитывает сроки привычек пользователя
+        db.set_user_timezone(1, "Asia/Vladivostok")
+        assert from_timestamp(db.due_index.get(1), "Asia/Vladivostok") == datetime(2025, 3, 30, DEFAULT_REMINDER_HOUR)
+        asyncio.run(check_cached_zone())
+        close_all_connections()
+
+
+async def check_cached_zone():
+    """Пояс из кэша без потока базы; set_user_timezone заменяет его в кэше"""
+    n = 20_000
+    start = time.perf_counter()
+    for i in range(n):
+        await adb.run(db.load_user_timezone, i % len(ZONES) + 1)
+    uncached = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(n):
+        await adb.get_user_timezone(i % len(ZONES) + 1)
+    cached = time.perf_counter() - start
+    conn = db.get_connection()
+    with conn:
+        # Запись в обход set_user_timezone кэш не видит — значит, база не читается
+        conn.execute("UPDATE users SET timezone = 'UTC' WHERE telegram_id = 2")
+    assert await adb.get_user_timezone(2) == ZONES[1]
+    assert await adb.set_user_timezone(2, "Asia/Yekaterinburg")
+    assert await adb.get_user_timezone(2) == "Asia/Yekaterinburg"
+    assert await adb.set_user_timezone(2, None)
+    assert await adb.get_user_timezone(2) is None
+    print(f"{n} чтений пояса: из базы {uncached * 1000:.0f} ms, из кэша {cached * 1000:.0f} ms")
+    assert cached < uncached
+
+
+async def check_spread():
+    """Напоминания «в 9:00» пользователей из разных поясов — по разным часам UTC"""
+    service = ReminderService(bot=None, persistent=False)
+    reminder_time = datetime.now() + timedelta(days=2)
+    reminder_time = reminder_time.replace(hour=9, minute=0, second=0, microsecond=0)
+    start = time.perf_counter()
+    for user_id in range(USERS):
+        await service.schedule_reminder(user_id, "Зарядка", reminder_time, user_id, tz=ZONES[user_id % len(ZONES)])
+    elapsed = time.perf_counter() - start
+    hours = Counter(int(reminder.fire_at // 3600) for reminder in service._heap)
+    assert len(hours) == len(ZONES), hours
+    assert max(hours.values()) == USERS // len(ZONES)
+    naive = {to_timestamp(reminder_time, "UTC")}
+    print(f"{USERS} напоминаний «в 9:00»: {len(hours)} разных часов UTC вместо {len(naive)}, "
+          f"по {max(hours.values())} в часе; {USERS / elapsed:,.0f} /sec")
+    await service.stop()
+
+
+def bench_conversion():
+    moments = [datetime(2025, 1, 1) + timedelta(minutes=17 * i) for i in range(200_000)]
+    start = time.perf_counter()
+    for moment in moments:
+        moment.timestamp()
+    naive_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for index, moment in enumerate(moments):
+        to_timestamp(moment, ZONES[index % len(ZONES)])
+    zoned_time = time.perf_counter() - start
+    print(f"{len(moments)} переводов в UTC: по часам сервера {naive_time * 1000:.0f} ms, "
+          f"в поясе пользователя {zoned_time * 1000:.0f} ms")
+
+
+def main():
+    check_transitions()
+    check_due_in_user_zone()
+    print("переходы на летнее время и сроки в поясе пользователя: ok")
+    asyncio.run(check_spread())
+    bench_conversion()
+    adb.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Бенчмарк кэша telegram_id -> users.id (database.user_ids)
+
+/start и /addhabbit вызывают add_user_if_not_exists: раньше это был
+INSERT OR IGNORE + SELECT + коммит на каждую команду, теперь известный
+пользователь находится в памяти. Сравниваются прежний путь (воспроизведён
+как есть), поиск без предзагрузки (словарь наполняется по мере обращений)
+и после загрузки всех пользователей в массивы. Печатается также
+память под соответствие: массивы против словаря.
+
+Проверяется, что кэш совпадает с таблицей users, забывает удалённого
+пользователя и запоминает созданного вместе с привычкой через очередь.
+Словарь недавних пользователей не растёт больше max_recent: при
+заполнении он переносится в массивы, и читатели в других потоках всё это
+время получают верные id.
+
+Запуск: python -m benchmarks.bench_user_ids
+"""
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import database.async_db as adb
+import database.database as db
+from database.connection import close_all_connections
+from database.user_ids import UserIdCache
+
+USERS = 200_000
+CALLS = 20_000
+
+
+async def measure(title: str, telegram_ids, resolve) -> float:
+    start = time.perf_counter()
+    for telegram_id in telegram_ids:
+        await resolve(telegram_id)
+    elapsed = time.perf_counter() - start
+    print(f"{title:<36} {len(telegram_ids) / elapsed:>12,.0f} вызовов/с")
+    return elapsed
+
+
+def memory_of(build) -> int:
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    return size
+
+
+async def main():
+    rng = random.Random(25)
+    # Активная двадцатая часть пользователей присылает 80% команд
+    telegram_ids = [
+        rng.randrange(USERS // 20 if rng.random() < 0.8 else USERS) * 7 + 1_000_000 for _ in range(CALLS)
+    ]
+    expected = dict(db.get_connection().execute("SELECT telegram_id, id FROM users"))
+
+    async def legacy(telegram_id):
+        return await adb.run(legacy_add_user, telegram_id, "", "", "")
+
+    async def cached(telegram_id):
+        return await adb.add_user_if_not_exists(telegram_id, "", "", "")
+
+    legacy_time = await measure("прежний /start (запись и коммит)", telegram_ids[:CALLS // 10], legacy)
+    legacy_time *= 10
+    db.user_ids = UserIdCache()
+    lazy_time = await measure("кэш по мере обращений", telegram_ids, cached)
+    db.user_ids = UserIdCache()
+    assert await adb.load_user_ids() == USERS
+    preloaded_time = await measure("кэш после предзагрузки", telegram_ids, cached)
+    print(f"ускорение: x{legacy_time / lazy_time:.0f} без предзагрузки, x{legacy_time / preloaded_time:.0f} с ней; "
+          f"{db.user_ids.stats()}")
+
+    for telegram_id in rng.sample(sorted(expected), 1000):
+        assert db.get_user_id(telegram_id) == expected[telegram_id]
+    assert db.get_user_id(42) is None
+
+    rows = list(expected.items())
+    arrays = memory_of(lambda: _loaded(rows))
+    mapping = memory_of(lambda: {telegram_id: user_id for telegram_id, user_id in rows})
+    print(f"память на {USERS:,} пользователей: массивы {arrays / 2**20:.1f} МБ, словарь {mapping / 2**20:.1f} МБ")
+
+    # Удалённый пользователь забыт, созданный вместе с привычкой — запомнен после коммита
+    gone = telegram_ids[0]
+    await adb.delete_user(gone)
+    assert await adb.get_user_id(gone) is None
+    db.write_queue.start()
+    habit_id = await adb.add_habit_for_user(SimpleNamespace(id=gone, username=None, first_name="Снова", last_name=None), "Бег")
+    db.write_queue.stop()
+    user_id = db.get_connection().execute("SELECT id FROM users WHERE telegram_id = ?", (gone,)).fetchone()[0]
+    assert user_id != expected[gone] and db.user_ids.get(gone) == user_id
+    assert db.get_habit_by_id(habit_id)[1] == user_id
+    print("удаление и повторное создание пользователя: ok")
+
+
+def check_merge():
+    """Случайные put/discard при маленьком max_recent и чтение из другого потока"""
+    rng = random.Random(3)
+    cache = UserIdCache(max_recent=100)
+    cache.load((telegram_id, telegram_id * 2) for telegram_id in range(0, 20_000, 2))
+    expected = {telegram_id: telegram_id * 2 for telegram_id in range(0, 20_000, 2)}
+    stable = range(0, 1000, 2)
+    wrong = []
+    stop = threading.Event()
+
+    def reader():
+        # Эти пользователи не меняются: их id верен при любом переносе
+        reader_rng = random.Random(4)
+        while not stop.is_set():
+            telegram_id = reader_rng.choice(stable)
+            if cache.get(telegram_id) != telegram_id * 2:
+                wrong.append(telegram_id)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for _ in range(50_000):
+        telegram_id = rng.randrange(1000, 30_000)
+        if rng.random() < 0.2:
+            cache.discard(telegram_id)
+            expected.pop(telegram_id, None)
+        else:
+            cache.put(telegram_id, telegram_id * 3)
+            expected[telegram_id] = telegram_id * 3
+        assert cache.stats()['recent'] < 100
+    stop.set()
+    thread.join()
+    assert not wrong, wrong[:10]
+    assert all(cache.get(telegram_id) == expected.get(telegram_id) for telegram_id in range(30_000))
+    print(f"перенос словаря в массивы: ok, {cache.stats()}")
+
+
+def legacy_add_user(telegram_id: int, username: str, first_name: str, last_name: str) -> int:
+    """add_user_if_not_exists до кэша"""
+    conn = db.get_connection()
+    with conn:
+        conn.execute("""
+            INSERT OR IGNORE INTO users (telegram_id, username, first_name, last_name)
+            VALUES (?, ?, ?, ?)
+        """, (telegram_id, username, first_name, last_name))
+        user_id = conn.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()[0]
+    return user_id
+
+
+def _loaded(rows) -> UserIdCache:
+    cache = UserIdCache()
+    cache.load(rows)
+    return cache
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        conn = db.get_connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO users (telegram_id, username) VALUES (?, ?)",
+                ((user * 7 + 1_000_000, f"user{user}") for user in range(USERS)),
+            )
+        asyncio.run(main())
+        check_merge()
+        adb.shutdown()
+        close_all_connections()
@@ -0,0 +1,98 @@
+"""
+Бенчмарк пропускной способности записи отметок: коммит на каждое нажатие
+против очереди пакетной записи (database.write_queue).
+
+Оба варианта работают с synchronous=FULL, то есть каждое подтверждённое
+нажатие действительно записано на диск. Отдельно проверяется, что
+обработчики, отменённые во время ожидания записи, не останавливают поток
+записи и не оставляют остальных ждать вечно.
+
+Запуск: python -m benchmarks.bench_write_queue
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import database.async_db as adb
+import database.database as db
+from database.connection import close_all_connections
+
+HABITS = 5000
+TAPS = 5000
+CONCURRENCY = 500
+
+
+async def tap_storm(habit_ids) -> float:
+    """Моделирует утренний пик: CONCURRENCY пользователей одновременно жмут "Выполнено" """
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def tap(habit_id):
+        async with semaphore:
+            await adb.mark_habit(habit_id, "done")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(tap(habit_ids[i % len(habit_ids)]) for i in range(TAPS)))
+    return time.perf_counter() - start
+
+
+async def cancel_storm(habit_ids):
+    """Половина обработчиков отменяется, пока их запись в очереди или в пакете"""
+    tasks = [asyncio.create_task(adb.mark_habit(habit_id, "skipped")) for habit_id in habit_ids]
+    await asyncio.sleep(0)
+    for task in tasks[::2]:
+        task.cancel()
+    await asyncio.sleep(db.write_queue.flush_interval / 2)
+    for task in tasks[1::2]:
+        task.cancel()
+    await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 10)
+    assert db.write_queue.running
+    # Поток записи жив: следующая запись подтверждается
+    await asyncio.wait_for(adb.mark_habit(habit_ids[0], "done"), 10)
+
+
+def main():
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        conn = db.get_connection()
+        with conn:
+            conn.execute("INSERT INTO users (telegram_id) VALUES (1)")
+            conn.executemany("INSERT INTO habits (user_id, name) VALUES (1, ?)",
+                             ((f"h{i}",) for i in range(HABITS)))
+        habit_ids = [h[0] for h in db.get_habits(1)]
+
+        # Коммит на каждое нажатие (через поток базы данных)
+        asyncio.run(adb.run(lambda: db.get_connection().execute("PRAGMA synchronous=FULL")))
+        elapsed = asyncio.run(tap_storm(habit_ids))
+        print(f"commit per tap        {TAPS / elapsed:>10,.0f} taps/sec")
+
+        with conn:
+            conn.execute("DELETE FROM habit_actions")
+
+        db.write_queue.start()
+        elapsed = asyncio.run(tap_storm(habit_ids))
+        asyncio.run(cancel_storm(habit_ids[:1000]))
+        db.write_queue.stop()
+        print(f"write queue           {TAPS / elapsed:>10,.0f} taps/sec  "
+              f"({db.write_queue.batches_flushed} transactions)")
+
+        count = conn.execute("SELECT COUNT(*) FROM habit_actions").fetchone()[0]
+        assert count == min(TAPS, HABITS), count
+        print("отменённые обработчики не останавливают запись: ok")
+
+        # Не успевший дописать очередь поток не теряется: stop можно повторить
+        db.write_queue.start()
+        slow = db.write_queue.submit(lambda conn: time.sleep(0.5))
+        assert not db.write_queue.stop(timeout=0.05)
+        assert not db.write_queue.running and not slow.done()
+        assert db.write_queue.stop()
+        assert slow.done() and not db.write_queue.running
+        print("остановка по таймауту: ok")
+
+        adb.shutdown()
+        close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
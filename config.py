@@ -10,10 +10,18 @@ load_dotenv()
 # Константы
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 QUOTES_URL = os.getenv('QUOTES_URL')
+# Копия загруженных цитат на диске (пустое значение — без копии)
+QUOTES_CACHE_PATH = os.getenv('QUOTES_CACHE_PATH', 'quotes_cache.json')
 
 # Настройки бота
 BOT_NAME = os.getenv('BOT_NAME', 'HabitTracker')
 BOT_DESCRIPTION = os.getenv('BOT_DESCRIPTION', 'Бот для отслеживания привычек')
+# Часовой пояс пользователей, которые не задали свой (/timezone)
+DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', 'Europe/Moscow')
+# Час (на часах пользователя), в который приходят напоминания о привычках
+REMINDER_HOUR = int(os.getenv('REMINDER_HOUR', '9'))
+# Загружать ли id всех пользователей в память при старте (иначе — по мере обращений)
+PRELOAD_USER_IDS = os.getenv('PRELOAD_USER_IDS', 'true').lower() in ('1', 'true', 'yes')
 
 # Проверяем наличие токена
 if not BOT_TOKEN:
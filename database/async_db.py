@@ -0,0 +1,149 @@
+"""
+Асинхронный доступ к базе данных
+
+Повторяет функции database.database, но выполняет их в отдельном потоке
+базы данных, поэтому обработчики aiogram не блокируют event loop на время
+запросов и fsync. У потока своё долгоживущее соединение (см. database.connection).
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import database.database as _db
+from database.user_ids import UNKNOWN_TIMEZONE
+
+# Один поток: SQLite всё равно допускает только одного писателя,
+# а так запросы не конкурируют за блокировку файла
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="habit-db")
+
+
+async def run(func: Callable, *args, **kwargs) -> Any:
+    """Выполняет синхронную функцию в потоке базы данных"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def _wrap(func: Callable) -> Callable:
+    """Делает асинхронную обёртку над функцией database.database"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+
+def shutdown():
+    """Дожидается выполнения поставленных запросов и останавливает поток"""
+    _executor.shutdown(wait=True)
+
+
+# ---------------------------
+# Инициализация базы данных
+# ---------------------------
+init_db = _wrap(_db.init_db)
+
+# ---------------------------
+# Работа с пользователями
+# ---------------------------
+async def add_user_if_not_exists(telegram_id: int, username: str, first_name: str, last_name: str) -> int:
+    # Известного пользователя не нужно ни записывать, ни искать в базе
+    user_id = _db.user_ids.get(telegram_id)
+    if user_id is not None:
+        return user_id
+    return await run(_db.register_user, telegram_id, username, first_name, last_name)
+
+async def get_user_id(telegram_id: int):
+    user_id = _db.user_ids.get(telegram_id)
+    if user_id is not None:
+        return user_id
+    return await run(_db.lookup_user_id, telegram_id)
+
+get_user = _wrap(_db.get_user)
+load_user_ids = _wrap(_db.load_user_ids)
+delete_user = _wrap(_db.delete_user)
+
+async def get_user_timezone(telegram_id: int):
+    # Пояс читает каждое нажатие и сообщение, поэтому известный — без потока базы
+    timezone_name = _db.user_ids.get_timezone(telegram_id)
+    if timezone_name is not UNKNOWN_TIMEZONE:
+        return timezone_name
+    return await run(_db.load_user_timezone, telegram_id)
+
+set_user_timezone = _wrap(_db.set_user_timezone)
+
+# ---------------------------
+# Работа с привычками
+# ---------------------------
+async def add_habit_for_user(telegram_user, habit_name: str, description: str = "",
+                             frequency: dict = None) -> int:
+    # При запущенной очереди запись попадает в ближайший пакет
+    if _db.write_queue.running:
+        _user_id, habit_id, _next_due = await asyncio.wrap_future(
+            _db.queue_add_habit_for_user(telegram_user, habit_name, description, frequency)
+        )
+        return habit_id
+    return await run(_db.add_habit_for_user, telegram_user, habit_name, description, frequency)
+
+async def add_habit(user_id: int, name: str, description: str = "") -> int:
+    # При запущенной очереди запись попадает в ближайший пакет
+    if _db.write_queue.running:
+        return await asyncio.wrap_future(_db.queue_add_habit(user_id, name, description))
+    return await run(_db.add_habit, user_id, name, description)
+
+async def get_habits(user_id: int):
+    # Список из кэша отдаётся сразу, без похода в поток базы данных
+    habits = _db.habit_cache.get(user_id)
+    if habits is not None:
+        return list(habits)
+    return await run(_db.load_habits, user_id)
+
+delete_habit = _wrap(_db.delete_habit)
+update_habit = _wrap(_db.update_habit)
+get_habit_by_id = _wrap(_db.get_habit_by_id)
+
+# ---------------------------
+# Работа с действиями привычек
+# ---------------------------
+async def mark_habit(habit_id: int, status: str, day=None):
+    # При запущенной очереди запись попадает в ближайший пакет
+    if _db.write_queue.running:
+        await asyncio.wrap_future(_db.queue_mark_habit(habit_id, status, day))
+    else:
+        await run(_db.mark_habit, habit_id, status, day)
+
+get_habit_actions = _wrap(_db.get_habit_actions)
+set_habit_frequency = _wrap(_db.set_habit_frequency)
+get_due_habits = _wrap(_db.get_due_habits)
+claim_due_habits = _wrap(_db.claim_due_habits)
+load_due_index = _wrap(_db.load_due_index)
+get_habit_days = _wrap(_db.get_habit_days)
+get_habit_stats = _wrap(_db.get_habit_stats)
+rebuild_habit_stats = _wrap(_db.rebuild_habit_stats)
+rebuild_habit_bitmaps = _wrap(_db.rebuild_habit_bitmaps)
+
+# ---------------------------
+# Работа с напоминаниями
+# ---------------------------
+async def add_reminder(user_id: int, habit_id, habit_name: str, fire_at: float) -> int:
+    # При запущенной очереди запись попадает в ближайший пакет
+    if _db.write_queue.running:
+        return await asyncio.wrap_future(_db.queue_add_reminder(user_id, habit_id, habit_name, fire_at))
+    return await run(_db.add_reminder, user_id, habit_id, habit_name, fire_at)
+
+get_pending_reminders = _wrap(_db.get_pending_reminders)
+claim_reminder = _wrap(_db.claim_reminder)
+release_reminder = _wrap(_db.release_reminder)
+finish_reminder = _wrap(_db.finish_reminder)
+drop_stale_reminders = _wrap(_db.drop_stale_reminders)
+cancel_reminders = _wrap(_db.cancel_reminders)
+cancel_next_reminder = _wrap(_db.cancel_next_reminder)
+cancel_user_reminders = _wrap(_db.cancel_user_reminders)
+get_user_reminders = _wrap(_db.get_user_reminders)
+count_pending_reminders = _wrap(_db.count_pending_reminders)
+
+# ---------------------------
+# Состояния диалогов (FSM)
+# ---------------------------
+get_fsm_record = _wrap(_db.get_fsm_record)
+save_fsm_records = _wrap(_db.save_fsm_records)
+purge_fsm_records = _wrap(_db.purge_fsm_records)
@@ -0,0 +1,89 @@
+"""
+Управление подключениями к SQLite
+
+Каждый поток получает одно долгоживущее соединение на файл базы данных,
+поэтому функции из database.database работают с "тёплым" соединением:
+без повторного открытия файла, с сохранённым кэшем страниц и кэшем
+подготовленных выражений.
+"""
+import sqlite3
+import threading
+from typing import Dict, List
+
+# Настройки, применяемые к каждому новому соединению
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",        # читатели не блокируют писателя
+    "PRAGMA synchronous=NORMAL",      # в WAL-режиме fsync только на checkpoint
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",       # ~16 МБ кэша страниц
+    "PRAGMA mmap_size=134217728",     # 128 МБ memory-mapped I/O
+    "PRAGMA busy_timeout=5000",
+)
+
+# Размер кэша подготовленных выражений на соединение
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_all_connections: List[sqlite3.Connection] = []
+# Увеличивается при close_all_connections, чтобы потоки забыли закрытые соединения
+_generation = 0
+
+
+def _open_connection(db_path: str) -> sqlite3.Connection:
+    """Открывает новое соединение и применяет PRAGMA"""
+    conn = sqlite3.connect(
+        db_path,
+        check_same_thread=False,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    with _registry_lock:
+        _all_connections.append(conn)
+    return conn
+
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """
+    Возвращает соединение текущего потока для указанной базы данных.
+    Соединение создаётся при первом обращении и дальше переиспользуется.
+    """
+    connections: Dict[str, sqlite3.Connection] = getattr(_local, "connections", None)
+    if connections is None or _local.generation != _generation:
+        connections = _local.connections = {}
+        _local.generation = _generation
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = _open_connection(db_path)
+    return conn
+
+
+def close_thread_connections():
+    """Закрывает соединения текущего потока"""
+    connections = getattr(_local, "connections", None)
+    if not connections:
+        return
+    with _registry_lock:
+        for conn in connections.values():
+            if conn in _all_connections:
+                _all_connections.remove(conn)
+            conn.close()
+    connections.clear()
+
+
+def close_all_connections():
+    """
+    Закрывает все открытые соединения (вызывается при остановке бота).
+    Потоки, обратившиеся к базе после этого, откроют новые соединения.
+    """
+    global _generation
+    with _registry_lock:
+        for conn in _all_connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _all_connections.clear()
+        _generation += 1
@@ -1,155 +1,513 @@
 import sqlite3
-from datetime import date
+from concurrent.futures import Future
+from datetime import date, timedelta
 from aiogram import types
 
+from database import due_index as due, fsm_states, habit_bitmaps, habit_stats
+from database.connection import get_connection as _get_thread_connection
+from database.habit_cache import HabitCache
+from database.user_ids import UNKNOWN_TIMEZONE, UserIdCache
+from database.migrations import migrate
+from database.write_queue import WriteQueue
+from utils.clock import clock
+from utils.timezones import is_valid_timezone
+
 DB_PATH = "habit_tracker.db"
 
+ADD_HABIT_SQL = "INSERT INTO habits (user_id, name, description) VALUES (?, ?, ?)"
+# Столбцы списка привычек: частота и срок меняются при отметках, поэтому их в кэше нет
+GET_HABITS_SQL = "SELECT id, user_id, name, description, created_at FROM habits WHERE user_id = ?"
+# Одна отметка на привычку в день: повторное нажатие меняет статус
+MARK_HABIT_SQL = """
+    INSERT INTO habit_actions (habit_id, action_date, status) VALUES (?, ?, ?)
+    ON CONFLICT (habit_id, action_date) DO UPDATE SET status = excluded.status
+"""
+
+# Период для числа выполнений в статистике привычки, дней
+STATS_PERIOD_DAYS = 30
+
+ADD_REMINDER_SQL = "INSERT INTO reminders (user_id, habit_id, habit_name, fire_at) VALUES (?, ?, ?, ?)"
+
+
+def get_connection() -> sqlite3.Connection:
+    """Возвращает долгоживущее соединение текущего потока"""
+    return _get_thread_connection(DB_PATH)
+
+
+# Очередь пакетной записи; запускается в main.py
+write_queue = WriteQueue(get_connection)
+
+# Сроки привычек в памяти для планировщика; заполняется load_due_index
+due_index = due.DueIndex()
+
+# Списки привычек пользователей в памяти; сбрасываются при записи
+habit_cache = HabitCache()
+
+# telegram_id -> users.id и часовой пояс; заполняется load_user_ids и по мере обращений
+user_ids = UserIdCache()
+
 # ---------------------------
 # Инициализация базы данных
 # ---------------------------
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        telegram_id INTEGER UNIQUE NOT NULL,
-        username TEXT,
-        first_name TEXT,
-        last_name TEXT
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS habits (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        name TEXT NOT NULL,
-        description TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-    )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS habit_actions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        habit_id INTEGER NOT NULL,
-        action_date DATE NOT NULL,
-        status TEXT NOT NULL,
-        FOREIGN KEY (habit_id) REFERENCES habits(id) ON DELETE CASCADE
-    )
-    """)
-
-    conn.commit()
-    conn.close()
+    """Создаёт таблицы и применяет недостающие миграции схемы"""
+    migrate(get_connection())
 
 # ---------------------------
 # Работа с пользователями
 # ---------------------------
-def add_user_if_not_exists(telegram_id: int, username: str, first_name: str, last_name: str) -> int:
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+def _ensure_user(conn: sqlite3.Connection, telegram_id: int, username: str, first_name: str, last_name: str) -> int:
+    """id пользователя; создаёт его, если такого ещё нет (в транзакции вызывающего)"""
+    # Сначала чтение: существующий пользователь не открывает транзакцию записи
+    row = conn.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+    if row is not None:
+        return row[0]
+    conn.execute("""
         INSERT OR IGNORE INTO users (telegram_id, username, first_name, last_name)
         VALUES (?, ?, ?, ?)
     """, (telegram_id, username, first_name, last_name))
-    cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
-    user_id = cursor.fetchone()[0]
-    conn.commit()
-    conn.close()
+    return conn.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()[0]
+
+def add_user_if_not_exists(telegram_id: int, username: str, first_name: str, last_name: str) -> int:
+    # Известный пользователь уже в базе: ни записи, ни коммита
+    user_id = user_ids.get(telegram_id)
+    if user_id is None:
+        return register_user(telegram_id, username, first_name, last_name)
+    return user_id
+
+def register_user(telegram_id: int, username: str, first_name: str, last_name: str) -> int:
+    """Создаёт пользователя, если его ещё нет в базе, и запоминает его id"""
+    conn = get_connection()
+    with conn:
+        user_id = _ensure_user(conn, telegram_id, username, first_name, last_name)
+    user_ids.put(telegram_id, user_id)
     return user_id
 
 def get_user(telegram_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    conn = get_connection()
+    return conn.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+
+def get_user_id(telegram_id: int):
+    """users.id по telegram_id (None — пользователя нет)"""
+    user_id = user_ids.get(telegram_id)
+    if user_id is None:
+        return lookup_user_id(telegram_id)
+    return user_id
+
+def lookup_user_id(telegram_id: int):
+    """Ищет users.id в базе и запоминает его"""
+    row = get_connection().execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+    if row is None:
+        return None
+    user_ids.put(telegram_id, row[0])
+    return row[0]
+
+def load_user_ids() -> int:
+    """Загружает соответствие telegram_id -> users.id всех пользователей; возвращает их число"""
+    return user_ids.load(get_connection().execute("SELECT telegram_id, id FROM users"))
 
 def delete_user(telegram_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM users WHERE telegram_id = ?", (telegram_id,))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        row = conn.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+        conn.execute("DELETE FROM users WHERE telegram_id = ?", (telegram_id,))
+    user_ids.discard(telegram_id)
+    if row:
+        habit_cache.invalidate(row[0])
+
+def get_user_timezone(telegram_id: int):
+    """Часовой пояс пользователя (None — пояс по умолчанию)"""
+    timezone_name = user_ids.get_timezone(telegram_id)
+    if timezone_name is UNKNOWN_TIMEZONE:
+        return load_user_timezone(telegram_id)
+    return timezone_name
+
+def load_user_timezone(telegram_id: int):
+    """Читает часовой пояс пользователя из базы и запоминает его"""
+    conn = get_connection()
+    row = conn.execute("SELECT timezone FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+    if row is None:
+        return None
+    user_ids.put_timezone(telegram_id, row[0])
+    return row[0]
+
+def set_user_timezone(telegram_id: int, timezone_name: str = None) -> bool:
+    """
+    Сохраняет часовой пояс пользователя (None — пояс по умолчанию) и пересчитывает
+    сроки его привычек. False — неизвестный пояс или пользователь
+    """
+    if timezone_name is not None and not is_valid_timezone(timezone_name):
+        return False
+    conn = get_connection()
+    with conn:
+        updated = conn.execute(
+            "UPDATE users SET timezone = ? WHERE telegram_id = ?", (timezone_name, telegram_id)
+        ).rowcount
+        habit_ids = [row[0] for row in conn.execute("""
+            SELECT h.id FROM habits h JOIN users u ON u.id = h.user_id
+            WHERE u.telegram_id = ? AND h.next_due_at IS NOT NULL
+        """, (telegram_id,))]
+        next_due = {habit_id: due.refresh(conn, habit_id) for habit_id in habit_ids}
+    if updated:
+        user_ids.put_timezone(telegram_id, timezone_name)
+    for habit_id, due_at in next_due.items():
+        due_index.update(habit_id, due_at)
+    return bool(updated)
 
 # ---------------------------
 # Работа с привычками
 # ---------------------------
-def add_habit_for_user(telegram_user: types.User, habit_name: str, description: str = ""):
-    user_id = add_user_if_not_exists(
+def _user_fields(telegram_user: types.User) -> tuple:
+    return (
         telegram_user.id,
         telegram_user.username or "",
         telegram_user.first_name or "",
         telegram_user.last_name or ""
     )
-    add_habit(user_id, habit_name, description)
 
-def add_habit(user_id: int, name: str, description: str = ""):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO habits (user_id, name, description) VALUES (?, ?, ?)",
-                   (user_id, name, description))
-    conn.commit()
-    conn.close()
+def _add_habit_for_user(conn: sqlite3.Connection, telegram_id: int, username: str, first_name: str,
+                        last_name: str, name: str, description: str, frequency: dict = None):
+    """
+    Создаёт пользователя при необходимости и добавляет ему привычку с частотой
+    frequency (None — без частоты): (user_id, habit_id, срок привычки)
+    """
+    user_id = user_ids.get(telegram_id)
+    if user_id is None:
+        user_id = _ensure_user(conn, telegram_id, username, first_name, last_name)
+    habit_id = conn.execute(ADD_HABIT_SQL, (user_id, name, description)).lastrowid
+    next_due = _set_habit_frequency(conn, habit_id, frequency) if frequency else None
+    return user_id, habit_id, next_due
+
+def add_habit_for_user(telegram_user: types.User, habit_name: str, description: str = "",
+                       frequency: dict = None) -> int:
+    """
+    Добавляет привычку пользователю Telegram одной транзакцией, создавая
+    пользователя при необходимости. frequency — частота из TextParser
+    ({'type': ..., 'interval': ...}), по ней привычка попадает в индекс сроков.
+    Возвращает id новой привычки
+    """
+    conn = get_connection()
+    with conn:
+        result = _add_habit_for_user(conn, *_user_fields(telegram_user), habit_name, description, frequency)
+    _remember_added_habit(telegram_user.id, result)
+    return result[1]
+
+def queue_add_habit_for_user(telegram_user: types.User, habit_name: str, description: str = "",
+                             frequency: dict = None) -> Future:
+    """add_habit_for_user через очередь пакетной записи; Future с (user_id, habit_id, срок)"""
+    future = write_queue.submit(
+        _add_habit_for_user, (*_user_fields(telegram_user), habit_name, description, frequency)
+    )
+    telegram_id = telegram_user.id
+    future.add_done_callback(lambda done: _queued_habit_added(telegram_id, done))
+    return future
+
+def _queued_habit_added(telegram_id: int, future: Future):
+    if not future.cancelled() and future.exception() is None:
+        _remember_added_habit(telegram_id, future.result())
+
+def _remember_added_habit(telegram_id: int, result):
+    """После коммита: запоминает пользователя, сбрасывает его список привычек и ставит срок в индекс"""
+    user_id, habit_id, next_due = result
+    user_ids.put(telegram_id, user_id)
+    habit_cache.invalidate(user_id)
+    if next_due is not None:
+        due_index.update(habit_id, next_due)
+
+def add_habit(user_id: int, name: str, description: str = "") -> int:
+    """Добавляет привычку; возвращает её id"""
+    conn = get_connection()
+    with conn:
+        habit_id = conn.execute(ADD_HABIT_SQL, (user_id, name, description)).lastrowid
+    habit_cache.invalidate(user_id)
+    return habit_id
+
+def queue_add_habit(user_id: int, name: str, description: str = "") -> Future:
+    """Добавляет привычку через очередь пакетной записи; Future с id привычки"""
+    future = write_queue.submit(ADD_HABIT_SQL, (user_id, name, description))
+    future.add_done_callback(lambda done: habit_cache.invalidate(user_id))
+    return future
 
 def get_habits(user_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM habits WHERE user_id = ?", (user_id,))
-    habits = cursor.fetchall()
-    conn.close()
-    return habits
+    """Привычки пользователя: [(id, user_id, name, description, created_at)]"""
+    habits = habit_cache.get(user_id)
+    if habits is None:
+        return load_habits(user_id)
+    return list(habits)
+
+def load_habits(user_id: int):
+    """Читает привычки пользователя из базы и кладёт их в кэш"""
+    version = habit_cache.version
+    rows = get_connection().execute(GET_HABITS_SQL, (user_id,)).fetchall()
+    habit_cache.put(user_id, rows, version)
+    return rows
 
 def delete_habit(habit_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM habits WHERE id = ?", (habit_id,))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM habits WHERE id = ?", (habit_id,))
+        conn.execute("DELETE FROM habit_stats WHERE habit_id = ?", (habit_id,))
+        conn.execute("DELETE FROM habit_bitmaps WHERE habit_id = ?", (habit_id,))
+    due_index.discard(habit_id)
+    habit_cache.invalidate_habit(habit_id)
 
 def update_habit(habit_id: int, name: str = None, description: str = None):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    if name:
-        cursor.execute("UPDATE habits SET name = ? WHERE id = ?", (name, habit_id))
-    if description:
-        cursor.execute("UPDATE habits SET description = ? WHERE id = ?", (description, habit_id))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        if name:
+            conn.execute("UPDATE habits SET name = ? WHERE id = ?", (name, habit_id))
+        if description:
+            conn.execute("UPDATE habits SET description = ? WHERE id = ?", (description, habit_id))
+    habit_cache.invalidate_habit(habit_id)
 
 # ---------------------------
 # Работа с действиями привычек
 # ---------------------------
-def mark_habit(habit_id: int, status: str):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO habit_actions (habit_id, action_date, status) VALUES (?, ?, ?)",
-                   (habit_id, date.today(), status))
-    conn.commit()
-    conn.close()
+def _mark_habit(conn: sqlite3.Connection, habit_id: int, day: date, status: str):
+    """
+    Записывает отметку и обновляет статистику и срок привычки (внутри транзакции)
+    Возвращает новый срок привычки (None — у привычки нет частоты)
+    """
+    row = conn.execute(
+        "SELECT status FROM habit_actions WHERE habit_id = ? AND action_date = ?",
+        (habit_id, day.isoformat())
+    ).fetchone()
+    conn.execute(MARK_HABIT_SQL, (habit_id, day, status))
+    habit_stats.record_mark(conn, habit_id, day, status, row[0] if row else None)
+    habit_bitmaps.record_mark(conn, habit_id, day, status)
+    return due.refresh(conn, habit_id)
+
+def mark_habit(habit_id: int, status: str, day: date = None):
+    """Отмечает привычку за день day (по умолчанию — сегодня в поясе по умолчанию)"""
+    conn = get_connection()
+    with conn:
+        next_due = _mark_habit(conn, habit_id, day or clock.today(), status)
+    # Индекс в памяти меняется только после фиксации транзакции
+    due_index.update(habit_id, next_due)
+
+def queue_mark_habit(habit_id: int, status: str, day: date = None) -> Future:
+    """Отмечает привычку через очередь пакетной записи"""
+    future = write_queue.submit(_mark_habit, (habit_id, day or clock.today(), status))
+    future.add_done_callback(lambda done: _update_due_index(habit_id, done))
+    return future
+
+def _update_due_index(habit_id: int, future: Future):
+    """Переносит срок из записанной очередью отметки в индекс в памяти"""
+    if not future.cancelled() and future.exception() is None:
+        due_index.update(habit_id, future.result())
+
+def set_habit_frequency(habit_id: int, frequency: dict = None):
+    """
+    Сохраняет частоту привычки ({'type': ..., 'interval': ...} из TextParser,
+    None — без частоты) и пересчитывает её срок
+    """
+    conn = get_connection()
+    with conn:
+        next_due = _set_habit_frequency(conn, habit_id, frequency)
+    due_index.update(habit_id, next_due)
+    return next_due
+
+def _set_habit_frequency(conn: sqlite3.Connection, habit_id: int, frequency: dict = None):
+    conn.execute(
+        "UPDATE habits SET frequency_type = ?, frequency_interval = ?, next_due_at = NULL WHERE id = ?",
+        (frequency['type'] if frequency else None, frequency['interval'] if frequency else None, habit_id)
+    )
+    return due.refresh(conn, habit_id)
+
+def get_due_habits(from_ts: float, to_ts: float):
+    """Привычки со сроком в [from_ts, to_ts): (habit_id, telegram_id, name, next_due_at)"""
+    return due.between(get_connection(), from_ts, to_ts)
+
+def claim_due_habits(due_habits, now: float):
+    """
+    Превращает наступившие сроки [(срок, habit_id)] из индекса в напоминания.
+    Для привычки, срок которой с тех пор не изменился, в одной транзакции
+    добавляет напоминание (просроченное — через секунду) и переносит
+    next_due_at на следующее вхождение расписания: после перезапуска тот же
+    срок не превратится во второе напоминание, а невыполненной привычке
+    напомнят снова в её следующий срок.
+    Возвращает [(reminder_id, telegram_id, habit_id, habit_name, fire_at)]
+    """
+    conn = get_connection()
+    claimed = []
+    rearmed = []
+    with conn:
+        for due_at, habit_id in due_habits:
+            row = conn.execute("""
+                SELECT u.telegram_id, h.name FROM habits h JOIN users u ON u.id = h.user_id
+                WHERE h.id = ? AND h.next_due_at = ?
+            """, (habit_id, due_at)).fetchone()
+            if row is None:
+                continue
+            telegram_id, habit_name = row
+            fire_at = max(due_at, now + 1)
+            reminder_id = conn.execute(ADD_REMINDER_SQL, (telegram_id, str(habit_id), habit_name, fire_at)).lastrowid
+            rearmed.append((habit_id, due.rearm(conn, habit_id, due_at, now)))
+            claimed.append((reminder_id, telegram_id, habit_id, habit_name, fire_at))
+    for habit_id, next_due in rearmed:
+        due_index.update(habit_id, next_due)
+    return claimed
+
+def load_due_index() -> int:
+    """Заполняет индекс сроков в памяти из habits; возвращает число привычек в нём"""
+    conn = get_connection()
+    due_index.load(conn.execute("SELECT id, next_due_at FROM habits WHERE next_due_at IS NOT NULL"))
+    return len(due_index)
 
 def get_habit_actions(habit_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM habit_actions WHERE habit_id = ?", (habit_id,))
-    actions = cursor.fetchall()
-    conn.close()
-    return actions
+    conn = get_connection()
+    return conn.execute("SELECT * FROM habit_actions WHERE habit_id = ?", (habit_id,)).fetchall()
+
+def get_habit_days(habit_id: int, start: date, end: date) -> dict:
+    """Отметки привычки с start по end включительно: день -> статус (из битовой карты)"""
+    return habit_bitmaps.load(get_connection(), habit_id).marks(start, end)
+
+def get_habit_stats(habit_id: int, today: date = None) -> dict:
+    """
+    Серии и счётчики выполнений привычки (см. database.habit_stats)
+    и число выполнений за последние STATS_PERIOD_DAYS дней.
+    today — сегодняшняя дата в поясе пользователя
+    """
+    conn = get_connection()
+    today = today or clock.today()
+    stats = habit_stats.read(conn, habit_id, today)
+    stats['period_completions'] = habit_bitmaps.load(conn, habit_id).count(
+        today - timedelta(days=STATS_PERIOD_DAYS - 1), today
+    )
+    return stats
+
+def rebuild_habit_stats(habit_id: int = None) -> int:
+    """Пересчитывает статистику по истории отметок: одной привычки или всех"""
+    conn = get_connection()
+    with conn:
+        return habit_stats.rebuild(conn, habit_id)
+
+def rebuild_habit_bitmaps(habit_id: int = None) -> int:
+    """Пересобирает битовые карты по истории отметок: одной привычки или всех"""
+    conn = get_connection()
+    with conn:
+        return habit_bitmaps.rebuild(conn, habit_id)
 
 
 
 def get_habit_by_id(habit_id: int):
     """Возвращает привычку по её ID"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
+    conn = get_connection()
+    return conn.execute(
         "SELECT id, user_id, name, description FROM habits WHERE id=?",
         (habit_id,)
-    )
-    habit = cursor.fetchone()
-    conn.close()
-    return habit
\ No newline at end of file
+    ).fetchone()
+
+# ---------------------------
+# Работа с напоминаниями
+# ---------------------------
+def add_reminder(user_id: int, habit_id, habit_name: str, fire_at: float) -> int:
+    conn = get_connection()
+    with conn:
+        return conn.execute(ADD_REMINDER_SQL, (user_id, str(habit_id), habit_name, fire_at)).lastrowid
+
+def queue_add_reminder(user_id: int, habit_id, habit_name: str, fire_at: float) -> Future:
+    """Сохраняет напоминание через очередь пакетной записи"""
+    return write_queue.submit(ADD_REMINDER_SQL, (user_id, str(habit_id), habit_name, fire_at))
+
+def get_pending_reminders(from_ts: float, to_ts: float):
+    """Ожидающие напоминания со временем срабатывания в [from_ts, to_ts)"""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT id, user_id, habit_id, habit_name, fire_at FROM reminders
+        WHERE status = 'pending' AND fire_at >= ? AND fire_at < ?
+        ORDER BY fire_at
+    """, (from_ts, to_ts)).fetchall()
+
+def claim_reminder(reminder_id: int) -> bool:
+    """
+    Помечает напоминание как отправляемое
+    Возвращает False, если его уже отменили или забрал кто-то другой
+    """
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute(
+            "UPDATE reminders SET status = 'sending' WHERE id = ? AND status = 'pending'",
+            (reminder_id,)
+        )
+    return cursor.rowcount == 1
+
+def release_reminder(reminder_id: int):
+    """Возвращает неотправленное напоминание в ожидание"""
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE reminders SET status = 'pending' WHERE id = ? AND status = 'sending'", (reminder_id,))
+
+def finish_reminder(reminder_id: int):
+    """Удаляет отправленное напоминание"""
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
+
+def drop_stale_reminders() -> int:
+    """
+    Удаляет напоминания, отправка которых прервалась падением бота.
+    Было ли сообщение доставлено, неизвестно, поэтому повторно их не шлём
+    """
+    conn = get_connection()
+    with conn:
+        return conn.execute("DELETE FROM reminders WHERE status = 'sending'").rowcount
+
+def cancel_reminders(reminder_ids):
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "DELETE FROM reminders WHERE id = ? AND status = 'pending'",
+            [(reminder_id,) for reminder_id in reminder_ids]
+        )
+
+def cancel_next_reminder(user_id: int, habit_id) -> bool:
+    """Отменяет ближайшее напоминание пользователя по привычке"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute("""
+            DELETE FROM reminders WHERE id = (
+                SELECT id FROM reminders
+                WHERE user_id = ? AND habit_id = ? AND status = 'pending'
+                ORDER BY fire_at LIMIT 1
+            )
+        """, (user_id, str(habit_id)))
+    return cursor.rowcount == 1
+
+def cancel_user_reminders(user_id: int) -> int:
+    conn = get_connection()
+    with conn:
+        return conn.execute(
+            "DELETE FROM reminders WHERE user_id = ? AND status = 'pending'", (user_id,)
+        ).rowcount
+
+def get_user_reminders(user_id: int):
+    conn = get_connection()
+    return conn.execute("""
+        SELECT id, user_id, habit_id, habit_name, fire_at FROM reminders
+        WHERE user_id = ? AND status = 'pending'
+        ORDER BY fire_at
+    """, (user_id,)).fetchall()
+
+def count_pending_reminders() -> int:
+    conn = get_connection()
+    return conn.execute("SELECT COUNT(*) FROM reminders WHERE status = 'pending'").fetchone()[0]
+
+# ---------------------------
+# Состояния диалогов (FSM)
+# ---------------------------
+def get_fsm_record(key: str):
+    """(состояние, данные, updated_at) диалога по ключу хранилища или None"""
+    return fsm_states.load(get_connection(), key)
+
+def save_fsm_records(records, deleted=()):
+    """Записывает пачку состояний диалогов одной транзакцией"""
+    conn = get_connection()
+    with conn:
+        fsm_states.save(conn, records, deleted)
+
+def purge_fsm_records(before: float) -> int:
+    """Удаляет диалоги, брошенные до момента before"""
+    conn = get_connection()
+    with conn:
+        return fsm_states.purge(conn, before)
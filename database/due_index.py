@@ -0,0 +1,206 @@
+"""
+Индекс сроков привычек: когда привычку снова пора выполнять
+
+Для привычек с частотой в habits хранится next_due_at — момент (unix time),
+с которого привычка считается «к выполнению», как в
+CalendarIntegration.is_habit_due: сразу после создания, а после
+выполнения — в час напоминаний следующего вхождения по частоте. Столбец
+пересчитывается при каждой отметке в той же транзакции, а частичный индекс
+по нему отвечает на «что пора выполнить с t0 до t1» без обхода всех привычек.
+Когда о наступившем сроке запланировано напоминание, next_due_at
+переносится на следующее вхождение (см. rearm и claim_due_habits).
+
+DueIndex — та же информация в памяти процесса (min-куча по сроку) для
+планировщика напоминаний: ближайшие k сроков достаются за O(k log n).
+"""
+import heapq
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.calendar_integration import calendar_integration
+from utils.timezones import from_timestamp, to_timestamp
+
+DEFAULT_REMINDER_HOUR = 9
+
+# Час дня (на часах пользователя), в который наступает срок привычки
+_reminder_hour = DEFAULT_REMINDER_HOUR
+
+
+def set_reminder_hour(hour: int):
+    """Задаёт час напоминаний (из конфигурации при запуске бота)"""
+    global _reminder_hour
+    if not 0 <= hour <= 23:
+        raise ValueError(f"Час напоминаний вне 0..23: {hour}")
+    _reminder_hour = hour
+
+
+def compute_next_due(frequency_type: Optional[str], interval: Optional[int],
+                     last_completion: Optional[str], created_at: str,
+                     timezone_name: Optional[str] = None) -> Optional[float]:
+    """
+    Срок привычки: без частоты — None, без выполнений — момент создания,
+    иначе следующее после последнего выполнения вхождение расписания от дня
+    создания (час напоминаний дня вхождения в поясе пользователя timezone_name)
+    """
+    if not frequency_type:
+        return None
+    # created_at заполняет SQLite (CURRENT_TIMESTAMP, UTC)
+    created = datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc).timestamp()
+    if not last_completion:
+        return created
+    last_day = date.fromisoformat(last_completion)
+    # Расписание — от дня создания на часах пользователя, как в календаре привычки
+    start_day = from_timestamp(created, timezone_name).date()
+    next_occurrence = calendar_integration.get_next_occurrence(
+        datetime(last_day.year, last_day.month, last_day.day),
+        {'type': frequency_type, 'interval': interval or 1},
+        datetime(start_day.year, start_day.month, start_day.day)
+    )
+    if next_occurrence is None:
+        return None
+    return to_timestamp(next_occurrence + timedelta(hours=_reminder_hour), timezone_name)
+
+
+def refresh(conn: sqlite3.Connection, habit_id: int) -> Optional[float]:
+    """
+    Пересчитывает next_due_at привычки по её частоте и последнему выполнению
+    (из habit_stats). Возвращает новый срок; у привычки без частоты — None
+    """
+    row = conn.execute("""
+        SELECT h.frequency_type, h.frequency_interval, s.last_completion, h.created_at, u.timezone
+        FROM habits h
+        LEFT JOIN habit_stats s ON s.habit_id = h.id
+        LEFT JOIN users u ON u.id = h.user_id
+        WHERE h.id = ?
+    """, (habit_id,)).fetchone()
+    if row is None or row[0] is None:
+        return None
+    next_due = compute_next_due(*row)
+    conn.execute("UPDATE habits SET next_due_at = ? WHERE id = ?", (next_due, habit_id))
+    return next_due
+
+
+def rearm(conn: sqlite3.Connection, habit_id: int, due_at: float, now: float) -> Optional[float]:
+    """
+    Переносит next_due_at привычки, о сроке due_at которой уже напомнили,
+    на следующее вхождение расписания, но не раньше now — как если бы её
+    выполнили в день срока. Пропущенные, пока бот не работал, вхождения не превращаются
+    в череду напоминаний. Возвращает новый срок
+    """
+    row = conn.execute("""
+        SELECT h.frequency_type, h.frequency_interval, h.created_at, u.timezone
+        FROM habits h LEFT JOIN users u ON u.id = h.user_id
+        WHERE h.id = ?
+    """, (habit_id,)).fetchone()
+    if row is None or row[0] is None:
+        return None
+    frequency_type, interval, created_at, timezone_name = row
+    next_due = due_at
+    while True:
+        day = from_timestamp(next_due, timezone_name).date()
+        next_due = compute_next_due(frequency_type, interval, day.isoformat(), created_at, timezone_name)
+        if next_due is None or next_due > now:
+            break
+    conn.execute("UPDATE habits SET next_due_at = ? WHERE id = ?", (next_due, habit_id))
+    return next_due
+
+
+def between(conn: sqlite3.Connection, from_ts: float, to_ts: float) -> List[Tuple]:
+    """Привычки со сроком в [from_ts, to_ts): (habit_id, telegram_id, name, next_due_at)"""
+    return conn.execute("""
+        SELECT h.id, u.telegram_id, h.name, h.next_due_at
+        FROM habits h JOIN users u ON u.id = h.user_id
+        WHERE h.next_due_at >= ? AND h.next_due_at < ?
+        ORDER BY h.next_due_at
+    """, (from_ts, to_ts)).fetchall()
+
+
+class DueIndex:
+    """
+    Сроки привычек в памяти: min-куча (срок, habit_id) и актуальный срок
+    каждой привычки. Изменённые сроки не ищутся в куче — старая запись
+    остаётся и пропускается, когда до неё доходит очередь.
+    Обновляется из потока базы данных, читается из event loop, поэтому под замком.
+    listener вызывается с каждым новым сроком (в потоке, обновившем индекс) —
+    так планировщик напоминаний узнаёт о сроках раньше своего окна
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.listener: Optional[Callable[[float], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def load(self, rows: Iterable[Tuple[int, float]]):
+        """Заполняет индекс парами (habit_id, next_due_at)"""
+        with self._lock:
+            self._due = dict(rows)
+            self._heap = [(due_at, habit_id) for habit_id, due_at in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def update(self, habit_id: int, due_at: Optional[float]):
+        """Новый срок привычки (None — убрать привычку из индекса)"""
+        added = False
+        with self._lock:
+            if due_at is None:
+                self._due.pop(habit_id, None)
+            elif self._due.get(habit_id) != due_at:
+                self._due[habit_id] = due_at
+                heapq.heappush(self._heap, (due_at, habit_id))
+                added = True
+            # Устаревших записей больше половины — перестраиваем кучу
+            if len(self._heap) > 2 * len(self._due) + 64:
+                self._heap = [(due, habit) for habit, due in self._due.items()]
+                heapq.heapify(self._heap)
+        listener = self.listener
+        if added and listener is not None:
+            listener(due_at)
+
+    def discard(self, habit_id: int):
+        self.update(habit_id, None)
+
+    def get(self, habit_id: int) -> Optional[float]:
+        return self._due.get(habit_id)
+
+    def pop_due(self, until: float) -> List[Tuple[float, int]]:
+        """
+        Забирает привычки со сроком не позже until: [(срок, habit_id)] по возрастанию.
+        Привычка вернётся в индекс со следующим сроком (rearm или отметка)
+        """
+        due = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= until:
+                due_at, habit_id = heapq.heappop(heap)
+                if self._due.get(habit_id) == due_at:
+                    del self._due[habit_id]
+                    due.append((due_at, habit_id))
+        return due
+
+    def due_between(self, from_ts: float, to_ts: float) -> List[Tuple[float, int]]:
+        """
+        Привычки со сроком в [from_ts, to_ts] без изменения индекса.
+        Обходятся только узлы кучи со сроком не позже to_ts: их потомки не раньше
+        """
+        found = set()
+        with self._lock:
+            heap = self._heap
+            stack = [0] if heap else []
+            while stack:
+                index = stack.pop()
+                due_at, habit_id = heap[index]
+                if due_at > to_ts:
+                    continue
+                if due_at >= from_ts and self._due.get(habit_id) == due_at:
+                    found.add((due_at, habit_id))
+                child = 2 * index + 1
+                if child < len(heap):
+                    stack.append(child)
+                if child + 1 < len(heap):
+                    stack.append(child + 1)
+        return sorted(found)
@@ -0,0 +1,37 @@
+"""
+Состояния диалогов (FSM aiogram) в базе данных
+
+Одна строка на ключ хранилища: состояние, данные диалога в JSON и момент
+последнего изменения. Пустые записи (ни состояния, ни данных) не хранятся.
+Брошенные диалоги удаляются по updated_at (см. database.fsm_storage).
+"""
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+UPSERT_STATE_SQL = """
+    INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+"""
+
+
+def load(conn: sqlite3.Connection, key: str) -> Optional[Tuple[Optional[str], Dict[str, Any], float]]:
+    """(состояние, данные, updated_at) по ключу или None"""
+    row = conn.execute("SELECT state, data, updated_at FROM fsm_states WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None
+    return row[0], json.loads(row[1]), row[2]
+
+
+def save(conn: sqlite3.Connection, records: Iterable[Tuple[str, Optional[str], str, float]],
+         deleted: Iterable[str] = ()):
+    """Записывает пачку (ключ, состояние, данные в JSON, updated_at) и удаляет ключи deleted"""
+    conn.executemany(UPSERT_STATE_SQL, records)
+    conn.executemany("DELETE FROM fsm_states WHERE key = ?", ((key,) for key in deleted))
+
+
+def purge(conn: sqlite3.Connection, before: float) -> int:
+    """Удаляет записи, не менявшиеся с момента before; возвращает их число"""
+    return conn.execute("DELETE FROM fsm_states WHERE updated_at < ?", (before,)).rowcount
+
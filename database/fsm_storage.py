@@ -0,0 +1,224 @@
+"""
+Хранилище состояний диалогов aiogram в SQLite
+
+MemoryStorage держит состояния всех начатых диалогов в памяти процесса:
+они копятся, пока бот работает, и теряются при перезапуске посреди
+добавления привычки. SQLiteStorage хранит их в таблице fsm_states:
+- чтения обслуживает LRU-кэш последних cache_size ключей (промах — один
+  запрос к базе; отсутствие записи тоже кэшируется);
+- запись сразу попадает в кэш, а в базу уходит пачкой: изменённые ключи
+  копятся и записываются одной транзакцией раз в flush_interval секунд
+  или по накоплении max_batch ключей (повторные изменения ключа
+  схлопываются в одно);
+- диалог, не менявшийся дольше ttl секунд, считается брошенным: он
+  читается как пустой и удаляется из базы при периодической чистке.
+
+Данные диалога хранятся в JSON, поэтому в них кладутся только
+JSON-совместимые значения (строки, числа, списки, словари).
+"""
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+import database.async_db as adb
+from utils.clock import Clock, clock as default_clock
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 10_000
+# Диалог без изменений дольше суток считается брошенным
+DIALOG_TTL = 24 * 3600
+FLUSH_INTERVAL = 0.5
+MAX_BATCH = 500
+PURGE_INTERVAL = 3600
+
+# (состояние, данные, момент изменения); None — записи нет
+Record = Optional[Tuple[Optional[str], Dict[str, Any], float]]
+
+_MISSING = object()
+
+
+def storage_key(key: StorageKey) -> str:
+    """Ключ строки в fsm_states"""
+    thread_id = "" if key.thread_id is None else key.thread_id
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{thread_id}:{key.destiny}"
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище aiogram с кэшем в памяти и пакетной записью в SQLite"""
+
+    def __init__(self, cache_size: int = CACHE_SIZE, ttl: float = DIALOG_TTL,
+                 flush_interval: float = FLUSH_INTERVAL, max_batch: int = MAX_BATCH,
+                 purge_interval: float = PURGE_INTERVAL, clock: Optional[Clock] = None):
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.purge_interval = purge_interval
+        self.clock = clock or default_clock
+        self._cache: "OrderedDict[str, Record]" = OrderedDict()
+        # Изменения, ещё не записанные в базу (None — удалить запись)
+        self._dirty: Dict[str, Record] = {}
+        # Пачка, которая записывается прямо сейчас: её видно при промахе кэша
+        self._flushing: Dict[str, Record] = {}
+        # Создаются в работающем event loop (хранилище создаётся раньше него)
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = self.clock.time()
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+
+    # ---------------------------
+    # Интерфейс BaseStorage
+    # ---------------------------
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = storage_key(key)
+        record = await self._get(k)
+        self._write(k, state.state if isinstance(state, State) else state, record[1] if record else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._get(storage_key(key))
+        return record[0] if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        k = storage_key(key)
+        record = await self._get(k)
+        self._write(k, record[0] if record else None, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._get(storage_key(key))
+        return record[1].copy() if record else {}
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Одно чтение вместо get_data + set_data из BaseStorage
+        k = storage_key(key)
+        record = await self._get(k)
+        current_data = {**record[1], **data} if record else data.copy()
+        self._write(k, record[0] if record else None, current_data)
+        return current_data.copy()
+
+    async def close(self) -> None:
+        """Останавливает фоновую запись и записывает всё, что осталось"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    # ---------------------------
+    # Кэш и запись в базу
+    # ---------------------------
+    async def _get(self, k: str) -> Record:
+        record = self._cache.get(k, _MISSING)
+        if record is not _MISSING:
+            self.hits += 1
+            self._cache.move_to_end(k)
+        else:
+            self.misses += 1
+            if k in self._dirty:
+                record = self._dirty[k]
+            elif k in self._flushing:
+                record = self._flushing[k]
+            else:
+                record = await adb.get_fsm_record(k)
+                # Пока шёл запрос, ключ мог измениться — новое значение важнее
+                newer = self._cache.get(k, _MISSING)
+                if newer is not _MISSING:
+                    record = newer
+            self._remember(k, record)
+
+        if record is not None and record[2] < self.clock.time() - self.ttl:
+            # Брошенный диалог начинается заново
+            self._write(k, None, {})
+            return None
+        return record
+
+    def _remember(self, k: str, record: Record):
+        cache = self._cache
+        cache[k] = record
+        cache.move_to_end(k)
+        if len(cache) > self.cache_size:
+            # Незаписанные изменения остаются в _dirty, так что вытеснять можно любой ключ
+            cache.popitem(last=False)
+
+    def _write(self, k: str, state: Optional[str], data: Dict[str, Any]):
+        # Ни состояния, ни данных — то же, что отсутствие диалога: строку удаляем
+        record = (state, data, self.clock.time()) if state is not None or data else None
+        self._remember(k, record)
+        self._dirty[k] = record
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+        if len(self._dirty) >= self.max_batch:
+            self._wakeup.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                if self.clock.time() - self._last_purge >= self.purge_interval:
+                    await self.purge()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при записи состояний диалогов: {e}")
+
+    async def flush(self) -> int:
+        """Записывает накопленные изменения одной транзакцией; возвращает число ключей"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            batch, self._dirty = self._dirty, {}
+            records, deleted = [], []
+            for k, record in batch.items():
+                if record is None:
+                    deleted.append(k)
+                    continue
+                try:
+                    records.append((k, record[0], json.dumps(record[1], ensure_ascii=False), record[2]))
+                except (TypeError, ValueError) as e:
+                    # Состояние несериализуемых данных останется только в памяти
+                    logger.error(f"Данные диалога {k} не сохранены: {e}")
+            self._flushing = batch
+            try:
+                await adb.save_fsm_records(records, deleted)
+            except BaseException:
+                # Не записалось — вернём в очередь всё, что не успело измениться снова
+                for k, record in batch.items():
+                    self._dirty.setdefault(k, record)
+                raise
+            finally:
+                self._flushing = {}
+            self.flushes += 1
+            return len(batch)
+
+    async def purge(self) -> int:
+        """Удаляет из базы брошенные диалоги; возвращает их число"""
+        self._last_purge = self.clock.time()
+        return await adb.purge_fsm_records(self._last_purge - self.ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики кэша и записи"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'cached': len(self._cache),
+            'pending': len(self._dirty),
+            'flushes': self.flushes,
+        }
@@ -0,0 +1,186 @@
+"""
+Битовые карты отметок привычек по дням
+
+Для каждой привычки в таблице habit_bitmaps хранятся две битовые карты
+(done и skipped) в виде BLOB: бит i соответствует дню start_day + i,
+биты внутри байта идут от младшего к старшему. Год истории — 46 байт на
+карту вместо 365 строк habit_actions, а диапазон дней читается одной
+строкой и считается через int.bit_count.
+Раскладка совпадает с np.unpackbits(..., bitorder='little'), поэтому BLOB
+можно разобрать как буфер без построчного декодирования
+(см. HabitAnalytics.from_bitmaps).
+
+habit_actions остаётся основным источником: карты обновляются в той же
+транзакции, что и отметка, и пересобираются по истории:
+
+    python -m database.habit_bitmaps
+"""
+import sqlite3
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+DONE = "done"
+SKIPPED = "skipped"
+
+UPSERT_BITMAP_SQL = """
+    INSERT INTO habit_bitmaps (habit_id, start_day, done, skipped) VALUES (?, ?, ?, ?)
+    ON CONFLICT (habit_id) DO UPDATE SET
+        start_day = excluded.start_day,
+        done = excluded.done,
+        skipped = excluded.skipped
+"""
+
+
+class DayBitmap:
+    """Отметки одной привычки: по биту на день в картах done и skipped"""
+
+    __slots__ = ("start", "done", "skipped")
+
+    def __init__(self, start: int = 0, done: bytes = b"", skipped: bytes = b""):
+        # start — порядковый номер (date.toordinal) дня бита 0, кратен 8
+        self.start = start
+        self.done = bytearray(done)
+        self.skipped = bytearray(skipped)
+
+    def _plane(self, status: str) -> bytearray:
+        return self.done if status == DONE else self.skipped
+
+    def _index(self, day: date) -> int:
+        """Номер бита дня; при необходимости расширяет карты в прошлое или будущее"""
+        ordinal = day.toordinal()
+        if not self.done:
+            self.start = ordinal - ordinal % 8
+            self.done, self.skipped = bytearray(1), bytearray(1)
+        elif ordinal < self.start:
+            extra = (self.start - ordinal + 7) // 8
+            self.start -= extra * 8
+            self.done[:0] = bytes(extra)
+            self.skipped[:0] = bytes(extra)
+        index = ordinal - self.start
+        if index >= len(self.done) * 8:
+            extra = index // 8 + 1 - len(self.done)
+            self.done.extend(bytes(extra))
+            self.skipped.extend(bytes(extra))
+        return index
+
+    def set(self, day: date, status: Optional[str]):
+        """Отмечает день статусом done или skipped (None — снимает отметку)"""
+        index = self._index(day)
+        byte, bit = index >> 3, 1 << (index & 7)
+        self.done[byte] &= ~bit
+        self.skipped[byte] &= ~bit
+        if status in (DONE, SKIPPED):
+            self._plane(status)[byte] |= bit
+
+    def get(self, day: date) -> Optional[str]:
+        """Статус дня или None"""
+        index = day.toordinal() - self.start
+        if index < 0 or index >= len(self.done) * 8:
+            return None
+        byte, bit = index >> 3, 1 << (index & 7)
+        if self.done[byte] & bit:
+            return DONE
+        if self.skipped[byte] & bit:
+            return SKIPPED
+        return None
+
+    def _window(self, status: str, start: date, end: date) -> int:
+        """Биты дней с start по end включительно; бит 0 — день start"""
+        first = start.toordinal() - self.start
+        last = min(end.toordinal() - self.start, len(self.done) * 8 - 1)
+        if last < 0 or last < first:
+            return 0
+        lower = max(first, 0)
+        # Берём только байты окна, а не всю карту
+        value = int.from_bytes(self._plane(status)[lower >> 3:(last >> 3) + 1], "little")
+        value >>= lower & 7
+        value &= (1 << (last - lower + 1)) - 1
+        return value << (lower - first)
+
+    def count(self, start: date, end: date, status: str = DONE) -> int:
+        """Число дней со статусом status с start по end включительно"""
+        return self._window(status, start, end).bit_count()
+
+    def days(self, start: date, end: date, status: str = DONE) -> List[date]:
+        """Дни со статусом status с start по end включительно, по возрастанию"""
+        value = self._window(status, start, end)
+        result = []
+        while value:
+            low = value & -value
+            result.append(start + timedelta(days=low.bit_length() - 1))
+            value ^= low
+        return result
+
+    def marks(self, start: date, end: date) -> Dict[date, str]:
+        """Все отметки с start по end включительно: день -> статус"""
+        result = {day: SKIPPED for day in self.days(start, end, SKIPPED)}
+        result.update((day, DONE) for day in self.days(start, end, DONE))
+        return result
+
+    def first_day(self) -> Optional[date]:
+        """Первый день карт (None для пустой привычки)"""
+        return date.fromordinal(self.start) if self.done else None
+
+
+def load(conn: sqlite3.Connection, habit_id: int) -> DayBitmap:
+    """Карты привычки (пустые, если отметок нет)"""
+    row = conn.execute(
+        "SELECT start_day, done, skipped FROM habit_bitmaps WHERE habit_id = ?", (habit_id,)
+    ).fetchone()
+    return DayBitmap(*row) if row else DayBitmap()
+
+
+def save(conn: sqlite3.Connection, habit_id: int, bitmap: DayBitmap):
+    conn.execute(UPSERT_BITMAP_SQL, (habit_id, bitmap.start, bytes(bitmap.done), bytes(bitmap.skipped)))
+
+
+def record_mark(conn: sqlite3.Connection, habit_id: int, day: date, status: str):
+    """Обновляет карты после отметки (в той же транзакции, что и отметка)"""
+    bitmap = load(conn, habit_id)
+    bitmap.set(day, status)
+    save(conn, habit_id, bitmap)
+
+
+def rebuild(conn: sqlite3.Connection, habit_id: Optional[int] = None) -> int:
+    """
+    Пересобирает карты по habit_actions: одной привычки или всех
+    Возвращает число привычек с отметками
+    """
+    if habit_id is None:
+        conn.execute("DELETE FROM habit_bitmaps")
+        # Отметки удалённых привычек (внешние ключи в SQLite не включены) пропускаем
+        actions = conn.execute("""
+            SELECT habit_id, action_date, status FROM habit_actions
+            WHERE habit_id IN (SELECT id FROM habits)
+        """)
+    else:
+        conn.execute("DELETE FROM habit_bitmaps WHERE habit_id = ?", (habit_id,))
+        actions = conn.execute(
+            "SELECT habit_id, action_date, status FROM habit_actions WHERE habit_id = ?", (habit_id,)
+        )
+
+    bitmaps: Dict[int, DayBitmap] = {}
+    for action_habit_id, action_date, status in actions:
+        bitmaps.setdefault(action_habit_id, DayBitmap()).set(date.fromisoformat(action_date), status)
+    conn.executemany(UPSERT_BITMAP_SQL, [
+        (bitmap_habit_id, bitmap.start, bytes(bitmap.done), bytes(bitmap.skipped))
+        for bitmap_habit_id, bitmap in bitmaps.items()
+    ])
+    return len(bitmaps)
+
+
+def load_many(conn: sqlite3.Connection, habit_ids: Optional[Iterable[int]] = None) -> Dict[int, DayBitmap]:
+    """Карты нескольких привычек (или всех) одним запросом"""
+    sql = "SELECT habit_id, start_day, done, skipped FROM habit_bitmaps"
+    params = ()
+    if habit_ids is not None:
+        params = tuple(habit_ids)
+        sql += f" WHERE habit_id IN ({','.join('?' * len(params))})"
+    return {row[0]: DayBitmap(*row[1:]) for row in conn.execute(sql, params)}
+
+
+if __name__ == "__main__":
+    import database.database as db
+
+    db.init_db()
+    print(f"Карты пересобраны для {db.rebuild_habit_bitmaps()} привычек")
@@ -0,0 +1,110 @@
+"""
+Кэш списков привычек пользователей
+
+Обработчики перерисовывают список привычек после каждого нажатия
+(handle_habit_done, /start, /addhabbit, /myhabits), а сам список меняется
+редко — при добавлении, изменении и удалении привычки. Поэтому списки
+последних maxsize пользователей хранятся в памяти кортежами строк
+(id, user_id, name, description, created_at).
+
+Запись сбрасывает список владельца после коммита. Чтобы чтение, начатое до
+коммита, не положило в кэш устаревший список, каждое чтение запоминает
+номер версии до запроса: если за это время что-то сбрасывалось, результат
+не кэшируется.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+Habits = Tuple[Tuple, ...]
+
+
+class HabitCache:
+    """
+    LRU-кэш user_id -> привычки. Читается из event loop и потока базы данных,
+    сбрасывается ещё и из потока очереди записи, поэтому под замком
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, Habits]" = OrderedDict()
+        # habit_id -> user_id для привычек из кэша: update/delete знают только id
+        self._owners: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int) -> Optional[Habits]:
+        """Привычки пользователя из кэша (None — их там нет)"""
+        with self._lock:
+            habits = self._entries.get(user_id)
+            if habits is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(user_id)
+            return habits
+
+    def put(self, user_id: int, rows: Iterable[Tuple], version: int) -> Habits:
+        """
+        Запоминает привычки, прочитанные из базы. version — значение self.version
+        до запроса: если с тех пор был сброс, строки могут быть устаревшими
+        """
+        habits = tuple(rows)
+        with self._lock:
+            if self.maxsize <= 0 or version != self.version:
+                return habits
+            self._drop(user_id)
+            self._entries[user_id] = habits
+            for habit in habits:
+                self._owners[habit[0]] = user_id
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return habits
+
+    def invalidate(self, user_id: int):
+        """Сбрасывает список пользователя (после добавления привычки)"""
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+            self._drop(user_id)
+
+    def invalidate_habit(self, habit_id: int):
+        """Сбрасывает список владельца привычки (после изменения или удаления)"""
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+            user_id = self._owners.get(habit_id)
+            if user_id is not None:
+                self._drop(user_id)
+
+    def clear(self):
+        """Очищает кэш (счётчики остаются)"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._owners.clear()
+
+    def _drop(self, user_id: int):
+        for habit in self._entries.pop(user_id, ()):
+            self._owners.pop(habit[0], None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий, промахов, сбросов и вытеснений"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / total if total else 0.0,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,164 @@
+"""
+Статистика привычек, которая обновляется при каждой отметке
+
+Для каждой привычки в таблице habit_stats хранятся текущая и самая длинная
+серии подряд выполненных дней, дата последнего выполнения и счётчики
+отметок. Отметка за сегодня меняет их за O(1), поэтому чтение статистики
+не зависит от длины истории. Редкие случаи, которые так не посчитать
+(выполнение отменено, отметка задним числом), пересчитывают привычку
+по habit_actions целиком; так же работает полная пересборка:
+
+    python -m database.habit_stats
+"""
+import sqlite3
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+DONE = "done"
+
+UPSERT_STATS_SQL = """
+    INSERT INTO habit_stats (habit_id, current_streak, longest_streak, last_completion, total_done, total_actions)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (habit_id) DO UPDATE SET
+        current_streak = excluded.current_streak,
+        longest_streak = excluded.longest_streak,
+        last_completion = excluded.last_completion,
+        total_done = excluded.total_done,
+        total_actions = excluded.total_actions
+"""
+
+
+def record_mark(conn: sqlite3.Connection, habit_id: int, day: date, status: str, previous: Optional[str]):
+    """
+    Обновляет статистику после отметки привычки за день (previous — статус,
+    который был у этого дня до отметки). Вызывается в той же транзакции,
+    что и запись отметки
+    """
+    stats = conn.execute(
+        "SELECT current_streak, longest_streak, last_completion, total_done, total_actions "
+        "FROM habit_stats WHERE habit_id = ?",
+        (habit_id,)
+    ).fetchone()
+    if stats is None:
+        stats = (0, 0, None, 0, 0)
+    current, longest, last_completion, total_done, total_actions = stats
+    last_completion = date.fromisoformat(last_completion) if last_completion else None
+
+    if previous == DONE and status != DONE:
+        # Выполнение отменено: предыдущую серию по счётчикам не восстановить
+        rebuild(conn, habit_id)
+        return
+    if status == DONE and previous != DONE and last_completion is not None and day < last_completion:
+        # Отметка задним числом может склеить две серии
+        rebuild(conn, habit_id)
+        return
+
+    if previous is None:
+        total_actions += 1
+    if status == DONE and previous != DONE:
+        total_done += 1
+        current = current + 1 if last_completion == day - timedelta(days=1) else 1
+        longest = max(longest, current)
+        last_completion = day
+
+    conn.execute(UPSERT_STATS_SQL, (
+        habit_id, current, longest,
+        last_completion.isoformat() if last_completion else None,
+        total_done, total_actions,
+    ))
+
+
+def rebuild(conn: sqlite3.Connection, habit_id: Optional[int] = None) -> int:
+    """
+    Пересчитывает статистику по habit_actions: одной привычки или всех
+    Возвращает число пересчитанных привычек
+    """
+    if habit_id is None:
+        conn.execute("DELETE FROM habit_stats")
+        habit_ids = [row[0] for row in conn.execute("SELECT id FROM habits")]
+        # Отметки удалённых привычек (внешние ключи в SQLite не включены) пропускаем
+        actions = conn.execute("""
+            SELECT habit_id, action_date, status FROM habit_actions
+            WHERE habit_id IN (SELECT id FROM habits)
+            ORDER BY habit_id, action_date
+        """)
+    else:
+        habit_ids = [habit_id]
+        actions = conn.execute(
+            "SELECT habit_id, action_date, status FROM habit_actions WHERE habit_id = ? ORDER BY action_date",
+            (habit_id,)
+        )
+
+    computed: Dict[int, Tuple] = {}
+    for stats_habit_id, rows in _group_by_habit(actions):
+        computed[stats_habit_id] = _compute(rows)
+    for stats_habit_id in habit_ids:
+        computed.setdefault(stats_habit_id, (0, 0, None, 0, 0))
+
+    conn.executemany(UPSERT_STATS_SQL, [
+        (stats_habit_id, *values) for stats_habit_id, values in computed.items()
+    ])
+    return len(computed)
+
+
+def _group_by_habit(actions: Iterable[Tuple]) -> Iterable[Tuple[int, list]]:
+    """Разбивает отсортированные по привычке отметки на группы"""
+    current_id, rows = None, []
+    for habit_id, action_date, status in actions:
+        if habit_id != current_id and rows:
+            yield current_id, rows
+            rows = []
+        current_id = habit_id
+        rows.append((action_date, status))
+    if rows:
+        yield current_id, rows
+
+
+def _compute(rows) -> Tuple[int, int, Optional[str], int, int]:
+    """Статистика по отметкам одной привычки в порядке дат"""
+    current = longest = total_done = 0
+    last_completion = None
+    for action_date, status in rows:
+        if status != DONE:
+            continue
+        day = date.fromisoformat(action_date)
+        total_done += 1
+        current = current + 1 if last_completion == day - timedelta(days=1) else 1
+        longest = max(longest, current)
+        last_completion = day
+    return current, longest, last_completion.isoformat() if last_completion else None, total_done, len(rows)
+
+
+def read(conn: sqlite3.Connection, habit_id: int, today: date) -> Dict:
+    """
+    Статистика привычки. Серия считается текущей, если последнее
+    выполнение было сегодня или вчера (today — сегодня в поясе
+    пользователя, по часам бота), — как в CalendarIntegration
+    """
+    row = conn.execute(
+        "SELECT current_streak, longest_streak, last_completion, total_done, total_actions "
+        "FROM habit_stats WHERE habit_id = ?",
+        (habit_id,)
+    ).fetchone()
+    if row is None:
+        return {'total_completions': 0, 'total_actions': 0, 'streak': 0,
+                'longest_streak': 0, 'last_completion': None}
+
+    current, longest, last_completion, total_done, total_actions = row
+    last_completion = date.fromisoformat(last_completion) if last_completion else None
+    if last_completion is None or last_completion < today - timedelta(days=1):
+        current = 0
+    return {
+        'total_completions': total_done,
+        'total_actions': total_actions,
+        'streak': current,
+        'longest_streak': longest,
+        'last_completion': last_completion,
+    }
+
+
+if __name__ == "__main__":
+    import database.database as db
+
+    db.init_db()
+    print(f"Статистика пересчитана для {db.rebuild_habit_stats()} привычек")
@@ -0,0 +1,246 @@
+"""
+Версионированные миграции схемы базы данных
+
+Текущая версия схемы хранится в PRAGMA user_version. Каждая миграция
+выполняется в отдельной транзакции вместе с повышением версии, поэтому
+прерванная миграция не оставляет базу в промежуточном состоянии.
+Новые изменения схемы добавляются в конец списка MIGRATIONS.
+
+Миграция — снимок схемы на момент её написания: DDL и заполнение данных
+живут прямо в ней, а не вызываются из модулей, которые потом меняются.
+"""
+import sqlite3
+from datetime import date
+from typing import Callable, Dict, List, Tuple
+
+
+def _create_base_tables(conn: sqlite3.Connection):
+    """Таблицы пользователей, привычек и отметок"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        telegram_id INTEGER UNIQUE NOT NULL,
+        username TEXT,
+        first_name TEXT,
+        last_name TEXT
+    )
+    """)
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS habits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """)
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS habit_actions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        habit_id INTEGER NOT NULL,
+        action_date DATE NOT NULL,
+        status TEXT NOT NULL,
+        FOREIGN KEY (habit_id) REFERENCES habits(id) ON DELETE CASCADE
+    )
+    """)
+
+
+def _add_lookup_indexes(conn: sqlite3.Connection):
+    """Индексы для get_habits / get_habit_actions и одна отметка на день"""
+    # До уникального индекса в базе могли накопиться повторные отметки
+    # за один день — оставляем последнюю из них
+    conn.execute("""
+    DELETE FROM habit_actions
+    WHERE id NOT IN (
+        SELECT MAX(id) FROM habit_actions GROUP BY habit_id, action_date
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_habits_user_id ON habits(user_id)")
+    conn.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_habit_actions_habit_date
+    ON habit_actions(habit_id, action_date)
+    """)
+
+
+def _create_reminders(conn: sqlite3.Connection):
+    """Постоянное хранилище напоминаний"""
+    # status: pending — ждёт отправки, sending — отправка начата
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS reminders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        habit_id TEXT,
+        habit_name TEXT NOT NULL,
+        fire_at REAL NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending'
+    )
+    """)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_reminders_pending_fire_at
+    ON reminders(fire_at) WHERE status = 'pending'
+    """)
+
+
+def _add_reminders_user_index(conn: sqlite3.Connection):
+    """Поиск и отмена напоминаний пользователя без просмотра всей таблицы"""
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_reminders_pending_user_habit
+    ON reminders(user_id, habit_id, fire_at) WHERE status = 'pending'
+    """)
+
+
+def _create_habit_stats(conn: sqlite3.Connection):
+    """Статистика привычек, посчитанная по уже накопленным отметкам"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS habit_stats (
+        habit_id INTEGER PRIMARY KEY,
+        current_streak INTEGER NOT NULL DEFAULT 0,
+        longest_streak INTEGER NOT NULL DEFAULT 0,
+        last_completion DATE,
+        total_done INTEGER NOT NULL DEFAULT 0,
+        total_actions INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (habit_id) REFERENCES habits(id) ON DELETE CASCADE
+    )
+    """)
+    # Серия — дни выполнения подряд: у дней одной серии разность даты и
+    # номера выполнения по порядку одинакова. Текущая серия — та, что
+    # заканчивается последним выполнением
+    conn.execute("""
+    WITH done AS (
+        SELECT habit_id, action_date,
+               julianday(action_date) - ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY action_date) AS streak
+        FROM habit_actions
+        WHERE status = 'done'
+    ),
+    streaks AS (
+        SELECT habit_id, COUNT(*) AS length, MAX(action_date) AS last_day
+        FROM done GROUP BY habit_id, streak
+    ),
+    totals AS (
+        SELECT habit_id, COUNT(*) AS total_actions, SUM(status = 'done') AS total_done
+        FROM habit_actions GROUP BY habit_id
+    )
+    INSERT INTO habit_stats (habit_id, current_streak, longest_streak, last_completion, total_done, total_actions)
+    SELECT h.id,
+           COALESCE((SELECT length FROM streaks s WHERE s.habit_id = h.id ORDER BY last_day DESC LIMIT 1), 0),
+           COALESCE((SELECT MAX(length) FROM streaks s WHERE s.habit_id = h.id), 0),
+           (SELECT MAX(last_day) FROM streaks s WHERE s.habit_id = h.id),
+           COALESCE(t.total_done, 0),
+           COALESCE(t.total_actions, 0)
+    FROM habits h
+    LEFT JOIN totals t ON t.habit_id = h.id
+    """)
+
+
+def _create_habit_bitmaps(conn: sqlite3.Connection):
+    """Битовые карты отметок, собранные по уже накопленным отметкам"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS habit_bitmaps (
+        habit_id INTEGER PRIMARY KEY,
+        start_day INTEGER NOT NULL,
+        done BLOB NOT NULL,
+        skipped BLOB NOT NULL,
+        FOREIGN KEY (habit_id) REFERENCES habits(id) ON DELETE CASCADE
+    )
+    """)
+    # Раскладка на момент миграции: бит i — день start_day + i (start_day —
+    # date.toordinal первого дня, округлённый вниз до кратного 8), биты
+    # байта от младшего к старшему. Отметки удалённых привычек пропускаем
+    bitmaps: Dict[int, Tuple[int, bytearray, bytearray]] = {}
+    for habit_id, action_date, status in conn.execute("""
+        SELECT habit_id, action_date, status FROM habit_actions
+        WHERE habit_id IN (SELECT id FROM habits)
+        ORDER BY habit_id, action_date
+    """):
+        ordinal = date.fromisoformat(action_date).toordinal()
+        if habit_id not in bitmaps:
+            bitmaps[habit_id] = (ordinal - ordinal % 8, bytearray(), bytearray())
+        start, done, skipped = bitmaps[habit_id]
+        index = ordinal - start
+        if index >= len(done) * 8:
+            extra = index // 8 + 1 - len(done)
+            done.extend(bytes(extra))
+            skipped.extend(bytes(extra))
+        if status in ('done', 'skipped'):
+            (done if status == 'done' else skipped)[index >> 3] |= 1 << (index & 7)
+    conn.executemany(
+        "INSERT INTO habit_bitmaps (habit_id, start_day, done, skipped) VALUES (?, ?, ?, ?)",
+        [(habit_id, start, bytes(done), bytes(skipped)) for habit_id, (start, done, skipped) in bitmaps.items()]
+    )
+
+
+def _add_habit_due_index(conn: sqlite3.Connection):
+    """Частота привычки и срок следующего выполнения"""
+    # У существующих привычек частоты нет, поэтому и срока тоже
+    conn.execute("ALTER TABLE habits ADD COLUMN frequency_type TEXT")
+    conn.execute("ALTER TABLE habits ADD COLUMN frequency_interval INTEGER")
+    conn.execute("ALTER TABLE habits ADD COLUMN next_due_at REAL")
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_habits_next_due_at
+    ON habits(next_due_at) WHERE next_due_at IS NOT NULL
+    """)
+
+
+def _add_user_timezone(conn: sqlite3.Connection):
+    """Часовой пояс пользователя (NULL — пояс по умолчанию из конфигурации)"""
+    conn.execute("ALTER TABLE users ADD COLUMN timezone TEXT")
+
+
+def _create_fsm_states(conn: sqlite3.Connection):
+    """Состояния диалогов бота (раньше жили только в памяти)"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS fsm_states (
+        key TEXT PRIMARY KEY,
+        state TEXT,
+        data TEXT NOT NULL DEFAULT '{}',
+        updated_at REAL NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_updated_at ON fsm_states(updated_at)")
+
+
+# (версия, описание, функция миграции)
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "Базовые таблицы", _create_base_tables),
+    (2, "Индексы по user_id и (habit_id, action_date)", _add_lookup_indexes),
+    (3, "Таблица напоминаний", _create_reminders),
+    (4, "Индекс напоминаний по пользователю и привычке", _add_reminders_user_index),
+    (5, "Таблица статистики привычек", _create_habit_stats),
+    (6, "Битовые карты отметок по дням", _create_habit_bitmaps),
+    (7, "Частота и срок следующего выполнения привычки", _add_habit_due_index),
+    (8, "Часовой пояс пользователя", _add_user_timezone),
+    (9, "Состояния диалогов", _create_fsm_states),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Возвращает текущую версию схемы"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Применяет все миграции новее текущей версии схемы
+    Возвращает итоговую версию
+    """
+    version = get_schema_version(conn)
+
+    for target_version, _description, apply in MIGRATIONS:
+        if target_version <= version:
+            continue
+
+        conn.execute("BEGIN")
+        try:
+            apply(conn)
+            # PRAGMA не поддерживает параметры, версия — целое число из списка выше
+            conn.execute(f"PRAGMA user_version = {int(target_version)}")
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        version = target_version
+
+    return version
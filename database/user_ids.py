@@ -0,0 +1,138 @@
+"""
+Соответствие telegram_id -> users.id в памяти
+
+Почти каждый обработчик переводит message.from_user.id во внутренний id
+пользователя, а /start и /addhabbit ещё и делают INSERT OR IGNORE с
+коммитом. Пользователи не меняют id и удаляются редко, поэтому
+соответствие запоминается навсегда: известный пользователь — поиск в
+словаре без обращения к базе.
+
+При старте можно загрузить всех пользователей разом (load): они хранятся
+в двух отсортированных массивах array('q') (16 байт на пользователя против
+сотни с лишним в словаре) и ищутся двоичным поиском. Пользователи,
+появившиеся после загрузки, и удалённые (значение None) — в словаре; когда
+в нём набирается max_recent записей, они переносятся в массивы.
+
+Рядом хранятся часовые пояса: их читает каждое нажатие «Выполнено»,
+/stats и разбор дат в тексте. Пояс запоминается при первом чтении из базы
+и заменяется при смене (set_user_timezone).
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+_MISSING = object()
+
+# Пояс пользователя неизвестен кэшу (None — пояс по умолчанию)
+UNKNOWN_TIMEZONE = object()
+
+
+class UserIdCache:
+    """
+    telegram_id -> users.id. Чтение идёт без замка: пара массивов публикуется
+    одним присваиванием кортежа, а словарь меняется отдельными операциями,
+    атомарными под GIL. Запись (put, discard, load и перенос словаря в массивы)
+    идёт из потока базы и потока очереди записи, поэтому под замком
+    """
+
+    def __init__(self, max_recent: int = 50_000):
+        self.max_recent = max_recent
+        # (telegram_id по возрастанию, users.id в том же порядке)
+        self._arrays: Tuple[array, array] = (array('q'), array('q'))
+        self._recent: Dict[int, Optional[int]] = {}
+        # telegram_id -> часовой пояс (None — пояс по умолчанию), не больше max_recent
+        self._timezones: Dict[int, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, rows: Iterable[Tuple[int, int]]) -> int:
+        """Заполняет кэш парами (telegram_id, users.id); возвращает их число"""
+        with self._lock:
+            pairs = sorted(rows)
+            # Словарь не очищается: пользователи, записанные во время загрузки, остаются в нём
+            self._arrays = (
+                array('q', (telegram_id for telegram_id, _ in pairs)),
+                array('q', (user_id for _, user_id in pairs)),
+            )
+        return len(pairs)
+
+    def get(self, telegram_id: int) -> Optional[int]:
+        """users.id или None, если пользователь кэшу неизвестен"""
+        user_id = self._recent.get(telegram_id, _MISSING)
+        if user_id is _MISSING:
+            telegram_ids, user_ids = self._arrays
+            index = bisect_left(telegram_ids, telegram_id)
+            if index < len(telegram_ids) and telegram_ids[index] == telegram_id:
+                user_id = user_ids[index]
+            else:
+                user_id = None
+        if user_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user_id
+
+    def put(self, telegram_id: int, user_id: int):
+        """Запоминает пользователя (только уже закоммиченного)"""
+        with self._lock:
+            self._recent[telegram_id] = user_id
+            self._merge_if_full()
+
+    def discard(self, telegram_id: int):
+        """Забывает удалённого пользователя"""
+        with self._lock:
+            self._recent[telegram_id] = None
+            self._timezones.pop(telegram_id, None)
+            self._merge_if_full()
+
+    def _merge_if_full(self):
+        """Переносит словарь в массивы, если он дорос до max_recent (под замком)"""
+        if len(self._recent) < self.max_recent:
+            return
+        telegram_ids, user_ids = self._arrays
+        merged_telegram_ids, merged_user_ids = array('q'), array('q')
+        pos = 0
+        for telegram_id, user_id in sorted(self._recent.items()):
+            # Куски массивов между записями словаря копируются срезами
+            index = bisect_left(telegram_ids, telegram_id, pos)
+            merged_telegram_ids += telegram_ids[pos:index]
+            merged_user_ids += user_ids[pos:index]
+            pos = index
+            if index < len(telegram_ids) and telegram_ids[index] == telegram_id:
+                pos += 1
+            if user_id is not None:
+                merged_telegram_ids.append(telegram_id)
+                merged_user_ids.append(user_id)
+        merged_telegram_ids += telegram_ids[pos:]
+        merged_user_ids += user_ids[pos:]
+        # Сначала новые массивы, потом пустой словарь: читатель между
+        # присваиваниями находит пользователя в обоих
+        self._arrays = (merged_telegram_ids, merged_user_ids)
+        self._recent = {}
+
+    def get_timezone(self, telegram_id: int) -> Any:
+        """Часовой пояс пользователя или UNKNOWN_TIMEZONE, если кэшу он неизвестен"""
+        return self._timezones.get(telegram_id, UNKNOWN_TIMEZONE)
+
+    def put_timezone(self, telegram_id: int, timezone_name: Optional[str]):
+        """Запоминает пояс пользователя (только уже закоммиченный)"""
+        with self._lock:
+            self._timezones.pop(telegram_id, None)
+            self._timezones[telegram_id] = timezone_name
+            if len(self._timezones) > self.max_recent:
+                # Вытесняется пояс, запомненный раньше всех
+                del self._timezones[next(iter(self._timezones))]
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий и промахов"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'preloaded': len(self._arrays[0]),
+            'recent': len(self._recent),
+            'timezones': len(self._timezones),
+            'hit_rate': self.hits / total if total else 0.0,
+        }
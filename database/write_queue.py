@@ -0,0 +1,187 @@
+"""
+Очередь пакетной записи в базу данных
+
+Частые мелкие записи (отметки привычек, новые привычки) не коммитятся
+по одной: фоновый поток собирает их в пакет и выполняет одной транзакцией
+каждые flush_interval секунд или по накоплении max_batch операций.
+Future каждой операции завершается только после коммита пакета, поэтому
+подтверждение пользователю означает, что запись уже на диске.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Маркер остановки потока записи
+_STOP = object()
+
+# SQL-запрос или функция, выполняющая несколько запросов на соединении
+Operation = Union[str, Callable[..., object]]
+
+
+class WriteQueue:
+    """Фоновая очередь, объединяющая записи в групповые транзакции"""
+
+    def __init__(self, connection_factory: Callable[[], sqlite3.Connection],
+                 flush_interval: float = 0.02, max_batch: int = 500):
+        self.connection_factory = connection_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # Маркер остановки уже в очереди (повторный stop его не дублирует)
+        self._stop_requested = False
+        self.batches_flushed = 0
+        self.operations_flushed = 0
+
+    @property
+    def running(self) -> bool:
+        """Поток принимает записи (после stop он только дописывает очередь)"""
+        return self._thread is not None and self._thread.is_alive() and not self._stop_requested
+
+    def start(self):
+        """Запускает поток записи"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_requested = False
+        self._thread = threading.Thread(target=self._run, name="habit-db-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """
+        Записывает всё, что осталось в очереди, и останавливает поток.
+        Вызывается при завершении бота, чтобы не потерять отметки.
+        Возвращает False, если поток не успел дописать очередь за timeout:
+        он продолжает работу, и stop можно вызвать снова
+        """
+        if self._thread is None:
+            return True
+        if not self._stop_requested and self._thread.is_alive():
+            self._stop_requested = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"Поток записи не дописал очередь за {timeout} с и ещё работает")
+            return False
+        self._thread = None
+        return True
+
+    def submit(self, sql: Operation, params: Tuple = ()) -> Future:
+        """
+        Ставит запись в очередь: SQL-запрос или функцию func(conn, *params),
+        которой нужно несколько запросов в одной транзакции
+        Возвращает Future с lastrowid (или результатом функции),
+        который завершится после коммита
+        """
+        future: Future = Future()
+        if not self.running:
+            future.set_exception(RuntimeError("Очередь записи не запущена"))
+            return future
+        self._queue.put((sql, params, future))
+        return future
+
+    def _run(self):
+        # synchronous=FULL только для соединения писателя: один fsync на пакет
+        conn = self.connection_factory()
+        conn.execute("PRAGMA synchronous=FULL")
+
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = []
+            self._take(batch, item)
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                self._take(batch, item)
+
+            self._safe_flush(conn, batch)
+
+        # Дописываем всё, что успели поставить в очередь до остановки
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                self._take(remaining, item)
+        self._safe_flush(conn, remaining)
+
+    @staticmethod
+    def _take(batch: List[Tuple[Operation, Tuple, Future]], item: Tuple[Operation, Tuple, Future]):
+        """
+        Берёт операцию в пакет. Future, отменённый до этого (asyncio.wrap_future
+        отменяет его вместе с задачей обработчика), пропускается: запись не
+        выполняется. Взятый в работу Future отменить уже нельзя, поэтому
+        результат ему всегда можно выставить
+        """
+        if item[2].set_running_or_notify_cancel():
+            batch.append(item)
+
+    def _safe_flush(self, conn: sqlite3.Connection, batch: List[Tuple[Operation, Tuple, Future]]):
+        """_flush, ошибка которого не останавливает поток записи"""
+        if not batch:
+            return
+        try:
+            self._flush(conn, batch)
+        except Exception as e:
+            logger.exception(f"Ошибка потока записи: {e}")
+            # Никто не должен ждать вечно: незавершённые операции получают ошибку
+            for _sql, _params, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    @staticmethod
+    def _execute(conn: sqlite3.Connection, sql: Operation, params: Tuple):
+        if callable(sql):
+            return sql(conn, *params)
+        return conn.execute(sql, params).lastrowid
+
+    def _flush(self, conn: sqlite3.Connection, batch: List[Tuple[Operation, Tuple, Future]]):
+        """Выполняет пакет одной транзакцией"""
+        results = []
+        try:
+            with conn:
+                for sql, params, _future in batch:
+                    results.append(self._execute(conn, sql, params))
+        except Exception as e:
+            # Одна ошибочная операция не должна отменять весь пакет:
+            # повторяем операции по одной, ошибку получает только виновник
+            logger.warning(f"Ошибка пакетной записи, повтор по одной операции: {e}")
+            self._flush_one_by_one(conn, batch)
+            return
+
+        for (_sql, _params, future), lastrowid in zip(batch, results):
+            future.set_result(lastrowid)
+        self.batches_flushed += 1
+        self.operations_flushed += len(batch)
+
+    def _flush_one_by_one(self, conn: sqlite3.Connection, batch: List[Tuple[Operation, Tuple, Future]]):
+        for sql, params, future in batch:
+            try:
+                with conn:
+                    lastrowid = self._execute(conn, sql, params)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(lastrowid)
+                self.operations_flushed += 1
+            self.batches_flushed += 1
@@ -7,10 +7,15 @@ from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from keyboards.inline import get_habit_actions_keyboard, get_confirmation_keyboard, back
-import database.database as db
+import database.async_db as db
+from utils.clock import clock
+from utils.text_parser import text_parser
 
 callback_router = Router()
 
+# Частота привычки, в названии и описании которой она не указана
+DEFAULT_FREQUENCY = {'type': 'daily', 'interval': 1}
+
 # ==============================
 # FSM для добавления и редактирования привычки
 # ==============================
@@ -58,17 +63,15 @@ async def add_habit_description(message: types.Message, state: FSMContext):
     habit_name = data["name"]
     description = message.text if message.text != "-" else ""
 
-    telegram_id = message.from_user.id
-    user = db.get_user(telegram_id)
-    if not user:
-        await message.answer("❌ Пользователь не найден. Используй /start.")
-        await state.clear()
-        return
+    # Частота («раз в 2 недели») берётся из названия и описания: по ней
+    # приходят напоминания о сроке привычки
+    parsed = text_parser.parse_habit_text(
+        f"{habit_name} {description}", await db.get_user_timezone(message.from_user.id)
+    )
+    frequency = parsed['frequency'] or DEFAULT_FREQUENCY
 
-    user_id = user[0]
-    db.add_habit(user_id, habit_name, description)
-    habits = db.get_habits(user_id)
-    habit_id = habits[-1][0]
+    # Пользователь создаётся при необходимости в той же транзакции, id привычки приходит сразу
+    habit_id = await db.add_habit_for_user(message.from_user, habit_name, description, frequency)
 
     await message.answer(
         f"✅ Привычка '{habit_name}' успешно добавлена!\nТеперь можешь её отслеживать 👇",
@@ -108,7 +111,7 @@ async def edit_habit_description(message: types.Message, state: FSMContext):
     new_name = data['new_name']
     new_description = message.text if message.text != "-" else ""
 
-    db.update_habit(habit_id, new_name, new_description)
+    await db.update_habit(habit_id, new_name, new_description)
     await message.answer(f"✅ Привычка обновлена: {new_name}", reply_markup=back())
     await state.clear()
 
@@ -122,15 +125,15 @@ async def handle_habit_done(callback: CallbackQuery):
         await callback.answer("Ошибка: некорректный ID привычки.", show_alert=True)
         return
 
-    db.mark_habit(habit_id, "done")
+    telegram_id = callback.from_user.id
+    timezone_name = await db.get_user_timezone(telegram_id)
+    await db.mark_habit(habit_id, "done", clock.today(timezone_name))
     await callback.answer("✅ Привычка выполнена!")
 
     # Обновляем список привычек
-    telegram_id = callback.from_user.id
-    user = db.get_user(telegram_id)
-    if user:
-        user_id = user[0]
-        habits = db.get_habits(user_id)
+    user_id = await db.get_user_id(telegram_id)
+    if user_id is not None:
+        habits = await db.get_habits(user_id)
         from keyboards.inline import get_habit_list_keyboard
         if habits:
             await callback.message.edit_text(
@@ -161,7 +164,7 @@ async def confirm_delete(callback: CallbackQuery):
     if habit_id is None:
         await callback.answer("Ошибка: некорректный ID привычки.", show_alert=True)
         return
-    db.delete_habit(habit_id)
+    await db.delete_habit(habit_id)
     await callback.answer("✅ Привычка удалена!")
     await callback.message.edit_text("✅ Привычка успешно удалена.")
 
@@ -180,7 +183,7 @@ async def cancel_delete(callback: CallbackQuery):
 @callback_router.callback_query(F.data.startswith("select_habit_"))
 async def select_habit(callback: CallbackQuery):
     habit_id = int(callback.data.split("_")[-1])  # ID должен быть числом
-    habit = db.get_habit_by_id(habit_id)
+    habit = await db.get_habit_by_id(habit_id)
 
     if not habit:
         await callback.answer("❌ Привычка не найдена", show_alert=True)
@@ -6,12 +6,12 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-import requests
-import random
-from bs4 import BeautifulSoup
+import calendar
 import keyboards.inline as kb
-import database.database as db
-from config import QUOTES_URL
+import database.async_db as db
+from utils.calendar_integration import calendar_integration
+from utils.clock import clock
+from utils.quote_service import get_quote_service
 
 
 commands_router = Router()
@@ -35,9 +35,9 @@ async def cmd_start(message: Message):
     last_name = message.from_user.last_name or ""
 
     # Добавляем пользователя в БД
-    user_id = db.add_user_if_not_exists(telegram_id, username, first_name, last_name)
+    user_id = await db.add_user_if_not_exists(telegram_id, username, first_name, last_name)
 
-    habits = db.get_habits(user_id)
+    habits = await db.get_habits(user_id)
 
     if not habits:
         await message.answer(
@@ -65,8 +65,8 @@ async def cmd_add(message: Message, state: FSMContext):
     username = message.from_user.username or ""
     first_name = message.from_user.first_name or ""
     last_name = message.from_user.last_name or ""
-    user_id = db.add_user_if_not_exists(telegram_id, username, first_name, last_name)
-    habits = db.get_habits(user_id)
+    user_id = await db.add_user_if_not_exists(telegram_id, username, first_name, last_name)
+    habits = await db.get_habits(user_id)
 
     await message.answer("📝 Здесь ты можешь добавить свою привычку:", reply_markup=kb.get_habit_list_keyboard(habits))
 
@@ -77,22 +77,37 @@ async def cmd_add(message: Message, state: FSMContext):
 @commands_router.callback_query(F.data.startswith("mark_done_"))
 async def mark_done(callback: CallbackQuery):
     habit_id = int(callback.data.split("_")[2])
-    db.mark_habit(habit_id, "done")
+    timezone_name = await db.get_user_timezone(callback.from_user.id)
+    await db.mark_habit(habit_id, "done", clock.today(timezone_name))
     await callback.answer("✅ Привычка отмечена как выполненная!")
 
 
 @commands_router.callback_query(F.data.startswith("delete_habit_"))
 async def delete_habit(callback: CallbackQuery):
     habit_id = int(callback.data.split("_")[2])
-    db.delete_habit(habit_id)
+    await db.delete_habit(habit_id)
     await callback.message.edit_text("🗑 Привычка удалена.")
 
 
-@commands_router.callback_query(F.data.startswith("stats_"))
+@commands_router.callback_query(F.data.startswith("habit_stats_"))
 async def stats(callback: CallbackQuery):
-    habit_id = int(callback.data.split("_")[1])
-    count = db.get_habit_stats(habit_id)
-    await callback.answer(f"📊 Выполнено {count} раз!", show_alert=True)
+    habit_id = int(callback.data.split("_")[-1])
+    # «Сегодня» — по часам пользователя, а не сервера
+    today = clock.today(await db.get_user_timezone(callback.from_user.id))
+    habit_stats = await db.get_habit_stats(habit_id, today)
+    await callback.answer(
+        f"📊 Выполнено {habit_stats['total_completions']} раз!\n"
+        f"📅 За 30 дней: {habit_stats['period_completions']}\n"
+        f"🔥 Текущая серия: {habit_stats['streak']} дн.\n"
+        f"🏆 Лучшая серия: {habit_stats['longest_streak']} дн.",
+        show_alert=True
+    )
+
+    # Календарь текущего месяца по битовой карте отметок
+    first_day = today.replace(day=1)
+    last_day = first_day.replace(day=calendar.monthrange(today.year, today.month)[1])
+    marks = await db.get_habit_days(habit_id, first_day, last_day)
+    await callback.message.answer(calendar_integration.render_month(today.year, today.month, marks))
 
 
 # ==============================
@@ -105,11 +120,35 @@ async def cmd_help(message: Message):
         "/start — Начать работу\n"
         "/addhabbit — Добавить новую привычку\n"
         "/help — Список команд\n"
+        "/timezone — Часовой пояс для напоминаний 🕒\n"
         "/quotes — Мотивационные цитаты 💬"
         "/myhabits — Мои привычки"
     )
     
 
+# ==============================
+# /timezone — часовой пояс пользователя
+# ==============================
+@commands_router.message(Command("timezone"))
+async def cmd_timezone(message: Message):
+    telegram_id = message.from_user.id
+    parts = message.text.split(maxsplit=1)
+
+    if len(parts) == 1:
+        timezone_name = await db.get_user_timezone(telegram_id)
+        await message.answer(
+            f"🕒 Твой часовой пояс: {timezone_name or 'по умолчанию'}\n"
+            "Чтобы сменить, отправь, например: /timezone Asia/Yekaterinburg"
+        )
+        return
+
+    timezone_name = parts[1].strip()
+    if await db.set_user_timezone(telegram_id, timezone_name):
+        await message.answer(f"✅ Часовой пояс сохранён: {timezone_name}")
+    else:
+        await message.answer("❌ Неизвестный часовой пояс. Укажи название вида Europe/Moscow.")
+
+
 # ==============================
 # /my_habits — посмотреть все свои привычки
 # ==============================
@@ -117,14 +156,13 @@ async def cmd_help(message: Message):
 async def show_user_habits(message: types.Message):
     """Показывает список всех текущих привычек пользователя"""
     telegram_id = message.from_user.id
-    user = db.get_user(telegram_id)
+    user_id = await db.get_user_id(telegram_id)
     
-    if not user:
+    if user_id is None:
         await message.answer("❌ Пользователь не найден. Используй /start.")
         return
     
-    user_id = user[0]
-    habits = db.get_habits(user_id)  # предполагается, что возвращает [(id, name), ...]
+    habits = await db.get_habits(user_id)  # предполагается, что возвращает [(id, name), ...]
     
     if not habits:
         await message.answer("У тебя пока нет привычек. Добавь новую с помощью /add_habit")
@@ -144,31 +182,12 @@ async def show_user_habits(message: types.Message):
 # ==============================
 @commands_router.message(Command("quotes"))
 async def cmd_quote(message: Message):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-
-    try:
-        response = requests.get(QUOTES_URL, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-        quotes = soup.find_all('div', class_='field-name-body')
-
-        quote_texts = []
-        for quote in quotes:
-            for p in quote.find_all('p'):
-                text = p.get_text(strip=True)
-                if len(text) > 10:
-                    quote_texts.append(text)
-
-        if not quote_texts:
-            await message.answer("Цитаты не найдены 😞")
-            return
-
-        random_quote = random.choice(quote_texts)
-        await message.answer(f"💬 {random_quote}")
-
-    except Exception as e:
-        await message.answer("⚠️ Ошибка при загрузке цитат.")
-        print(e)
\ No newline at end of file
+    # Цитаты уже в памяти сервиса: страница скачивается в фоне, а не на каждую команду
+    quote_service = get_quote_service()
+    random_quote = await quote_service.get_quote() if quote_service else None
+
+    if not random_quote:
+        await message.answer("Цитаты не найдены 😞")
+        return
+
+    await message.answer(f"💬 {random_quote}")
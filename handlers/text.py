@@ -6,6 +6,7 @@ from aiogram.types import Message
 from utils.text_parser import text_parser
 from utils.date_parser import date_parser
 from utils.calendar_integration import calendar_integration
+import database.async_db as db
 
 # Создаем роутер для текстовых сообщений
 text_router = Router()
@@ -76,15 +77,16 @@ async def handle_date_parsing(message: Message):
         await message.answer("❌ Отправьте дату для парсинга")
         return
     
-    # Парсим дату
-    parsed_date = date_parser.parse_date(text)
+    # Парсим дату в часовом поясе пользователя
+    timezone_name = await db.get_user_timezone(message.from_user.id)
+    parsed_date = date_parser.parse_date(text, timezone_name)
     
     if parsed_date:
-        is_valid, error = date_parser.validate_date(parsed_date)
+        is_valid, error = date_parser.validate_date(parsed_date, timezone_name)
         
         if is_valid:
             formatted_date = date_parser.format_date(parsed_date)
-            relative_date = date_parser.get_relative_date(parsed_date)
+            relative_date = date_parser.get_relative_date(parsed_date, timezone_name)
             
             response_text = (
                 f"📅 Дата распознана!\n\n"
@@ -121,7 +123,9 @@ async def handle_habit_text(message: Message):
         return
     
     # Парсим текст привычки
-    parsed_data = text_parser.parse_habit_text(message.text)
+    parsed_data = text_parser.parse_habit_text(
+        message.text, await db.get_user_timezone(message.from_user.id)
+    )
     
     # Формируем ответ с извлеченной информацией
     response_parts = [f"✅ Привычка добавлена!\n\n📝 Название: {parsed_data['name']}"]
@@ -4,10 +4,12 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
 # Загружаем нашу базу данных
-from database.database import init_db
+from database.database import habit_cache, init_db, user_ids, write_queue
+from database.connection import close_all_connections
+from database.fsm_storage import SQLiteStorage
+import database.async_db as async_db
 
 # Импорты роутеров
 from handlers.commands import commands_router
@@ -16,14 +18,24 @@ from handlers.media import media_router
 from handlers.callbacks import callback_router
     
 # Импорты конфигурации
-from config import BOT_TOKEN
+from config import BOT_TOKEN, DEFAULT_TIMEZONE, PRELOAD_USER_IDS, QUOTES_CACHE_PATH, QUOTES_URL, REMINDER_HOUR
+from database.due_index import set_reminder_hour
+from utils.timezones import set_default_timezone
+
+# «Сегодня» и время напоминаний без пояса пользователя считаются в этом поясе
+set_default_timezone(DEFAULT_TIMEZONE)
+set_reminder_hour(REMINDER_HOUR)
 
 # Диспетчер нужен для запуска бота
 bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
+# Состояния диалогов переживают перезапуск бота (таблица fsm_states)
+dp = Dispatcher(storage=SQLiteStorage())
 
 # Импорты утилит
 from utils.reminder_service import init_reminder_service
+from utils.quote_service import init_quote_service
+from utils.text_parser import text_parser
+from utils.date_parser import date_parser
 
 # Настройка логирования
 logging.basicConfig(
@@ -38,9 +50,26 @@ async def main():
     """Основная функция запуска бота"""
     # Создаем экземпляры бота и диспетчера
     
-    # Инициализируем сервис напоминаний
+    # Запускаем пакетную запись отметок и привычек
+    write_queue.start()
+
+    # Сроки привычек для напоминаний о том, что пора выполнить
+    due_habits = await async_db.load_due_index()
+    logger.info(f"Привычек со сроком выполнения: {due_habits}")
+
+    # id пользователей: обработчикам не нужно искать их в базе
+    if PRELOAD_USER_IDS:
+        users = await async_db.load_user_ids()
+        logger.info(f"Загружено пользователей: {users}")
+
+    # Инициализируем сервис напоминаний и восстанавливаем сохранённые напоминания
     reminder_service = init_reminder_service(bot)
+    await reminder_service.start()
     logger.info("Сервис напоминаний инициализирован")
+
+    # Цитаты для /quotes: копия с диска сразу, обновление со страницы в фоне
+    quote_service = init_quote_service(QUOTES_URL, QUOTES_CACHE_PATH)
+    await quote_service.start()
     
     # Регистрируем роутеры
     dp.include_router(commands_router)
@@ -54,7 +83,17 @@ async def main():
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
     finally:
+        await reminder_service.stop()
+        await quote_service.stop()
         await bot.session.close()
+        # Сначала дописываем очередь, чтобы не потерять отметки пользователей
+        write_queue.stop()
+        async_db.shutdown()
+        close_all_connections()
+        logger.info(f"Кэш списков привычек: {habit_cache.stats()}")
+        logger.info(f"Кэш id пользователей: {user_ids.stats()}")
+        logger.info(f"Кэш разбора привычек: {text_parser.cache.stats()}")
+        logger.info(f"Кэш разбора дат: {date_parser.cache.stats()}")
 
 
 if __name__ == "__main__":
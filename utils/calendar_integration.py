@@ -1,15 +1,21 @@
 """
 Модуль для интеграции с календарем
 """
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Mapping, Optional
 import calendar
 
+from .recurrence import Recurrence
+from .clock import Clock, clock as default_clock
+from .timezones import Zone
+
 
 class CalendarIntegration:
     """Класс для работы с календарными функциями"""
     
-    def __init__(self):
+    def __init__(self, clock: Optional[Clock] = None):
+        # Текущее время и «сегодня» берутся из часов (в бенчмарках — SimulatedClock)
+        self.clock = clock or default_clock
         self.weekdays = {
             'понедельник': 0, 'вторник': 1, 'среда': 2, 'четверг': 3,
             'пятница': 4, 'суббота': 5, 'воскресенье': 6
@@ -22,26 +28,8 @@ class CalendarIntegration:
         if not frequency:
             return []
         
-        schedule = []
-        current_date = start_date
-        
-        if frequency['type'] == 'daily':
-            for i in range(7):
-                if i % frequency['interval'] == 0:
-                    schedule.append(current_date)
-                current_date += timedelta(days=1)
-        
-        elif frequency['type'] == 'weekly':
-            # Находим нужный день недели
-            target_weekday = self._get_target_weekday(frequency)
-            days_ahead = target_weekday - start_date.weekday()
-            if days_ahead <= 0:
-                days_ahead += 7
-            
-            first_occurrence = start_date + timedelta(days=days_ahead)
-            schedule.append(first_occurrence)
-        
-        return schedule
+        recurrence = self.get_recurrence(start_date, frequency)
+        return list(recurrence.between(recurrence.start, recurrence.start + timedelta(days=6)))
     
     def get_month_schedule(self, start_date: datetime, frequency: Dict) -> List[datetime]:
         """
@@ -50,75 +38,65 @@ class CalendarIntegration:
         if not frequency:
             return []
         
-        schedule = []
-        current_date = start_date
+        recurrence = self.get_recurrence(start_date, frequency)
         
         if frequency['type'] == 'daily':
-            for i in range(30):  # Примерно месяц
-                if i % frequency['interval'] == 0:
-                    schedule.append(current_date)
-                current_date += timedelta(days=1)
+            # Примерно месяц
+            return list(recurrence.between(start_date, start_date + timedelta(days=29)))
         
         elif frequency['type'] == 'weekly':
-            # Находим нужный день недели
+            # Все вхождения до конца месяца начальной даты
+            last_day = calendar.monthrange(start_date.year, start_date.month)[1]
+            return list(recurrence.between(start_date, start_date.replace(day=last_day)))
+        
+        elif frequency['type'] == 'monthly':
+            # Ежемесячно в тот же день на год вперёд (в коротком месяце — в последний день)
+            return recurrence.take(12)
+        
+        return []
+    
+    def get_recurrence(self, start_date: datetime, frequency: Dict) -> Recurrence:
+        """
+        Повторение привычки от start_date. Для еженедельных привычек без
+        списка дней недели первое вхождение — ближайший целевой день после start_date
+        """
+        if frequency['type'] == 'weekly' and not frequency.get('weekdays'):
             target_weekday = self._get_target_weekday(frequency)
             days_ahead = target_weekday - start_date.weekday()
             if days_ahead <= 0:
                 days_ahead += 7
-            
-            first_occurrence = start_date + timedelta(days=days_ahead)
-            
-            # Добавляем все вхождения в течение месяца
-            for week in range(4):
-                occurrence = first_occurrence + timedelta(weeks=week)
-                if occurrence.month == start_date.month:
-                    schedule.append(occurrence)
-        
-        elif frequency['type'] == 'monthly':
-            # Ежемесячно в тот же день
-            for month in range(12):
-                try:
-                    occurrence = start_date.replace(month=start_date.month + month)
-                    schedule.append(occurrence)
-                except ValueError:
-                    # Обработка случая, когда в месяце нет такого дня
-                    pass
-        
-        return schedule
+            return Recurrence('weekly', frequency['interval'], start_date + timedelta(days=days_ahead))
+        return Recurrence.from_frequency(frequency, start_date)
     
     def _get_target_weekday(self, frequency: Dict) -> int:
         """Получает целевой день недели для еженедельных привычек"""
         # По умолчанию - понедельник
         return 0
     
-    def get_next_occurrence(self, last_date: datetime, frequency: Dict) -> Optional[datetime]:
+    def get_next_occurrence(self, last_date: datetime, frequency: Dict,
+                            start_date: Optional[datetime] = None) -> Optional[datetime]:
         """
-        Получает следующее вхождение привычки
+        Следующее вхождение привычки после last_date — по тому же повторению,
+        что и расписания (get_recurrence). start_date — начало расписания
+        (день создания привычки), None — расписание от last_date. Выполнение,
+        отмеченное задним числом раньше start_date, само начинает расписание.
+        Еженедельная привычка без дней недели повторяется через interval недель
+        после выполнения, в тот же день недели, — без привязки к понедельнику
         """
         if not frequency:
             return None
-        
-        if frequency['type'] == 'daily':
-            return last_date + timedelta(days=frequency['interval'])
-        
-        elif frequency['type'] == 'weekly':
-            return last_date + timedelta(weeks=frequency['interval'])
-        
-        elif frequency['type'] == 'monthly':
-            # Простое добавление месяца
-            year = last_date.year + (last_date.month + frequency['interval'] - 1) // 12
-            month = (last_date.month + frequency['interval'] - 1) % 12 + 1
-            day = min(last_date.day, calendar.monthrange(year, month)[1])
-            return datetime(year, month, day)
-        
-        return None
+        if frequency['type'] == 'weekly' and not frequency.get('weekdays'):
+            return Recurrence.from_frequency(frequency, last_date).next_after(last_date)
+        start = min(start_date, last_date) if start_date else last_date
+        return self.get_recurrence(start, frequency).next_after(last_date)
     
-    def is_habit_due(self, habit_data: Dict, current_time: datetime = None) -> bool:
+    def is_habit_due(self, habit_data: Dict, current_time: datetime = None, tz: Zone = None) -> bool:
         """
         Проверяет, пора ли выполнять привычку
+        (по умолчанию — на текущий момент на часах пользователя в поясе tz)
         """
         if current_time is None:
-            current_time = datetime.now()
+            current_time = self.clock.now(tz)
         
         if not habit_data.get('frequency'):
             return False
@@ -129,15 +107,15 @@ class CalendarIntegration:
         if not last_completion:
             return True
         
-        next_occurrence = self.get_next_occurrence(last_completion, frequency)
+        next_occurrence = self.get_next_occurrence(last_completion, frequency, habit_data.get('start_date'))
         if not next_occurrence:
             return False
         
         return current_time >= next_occurrence
     
-    def get_habit_stats(self, habit_data: Dict, period_days: int = 30) -> Dict:
+    def get_habit_stats(self, habit_data: Dict, period_days: int = 30, tz: Zone = None) -> Dict:
         """
-        Получает статистику привычки за период
+        Получает статистику привычки за период (дни считаются в поясе пользователя tz)
         """
         if not habit_data.get('completions'):
             return {
@@ -148,7 +126,7 @@ class CalendarIntegration:
             }
         
         completions = habit_data['completions']
-        start_date = datetime.now() - timedelta(days=period_days)
+        start_date = self.clock.now(tz) - timedelta(days=period_days)
         
         # Фильтруем завершения за период
         period_completions = [
@@ -168,7 +146,7 @@ class CalendarIntegration:
             completion_rate = 0
         
         # Вычисляем текущую серию
-        streak = self._calculate_current_streak(completions)
+        streak = self._calculate_current_streak(completions, self.clock.today(tz))
         
         # Вычисляем самую длинную серию
         longest_streak = self._calculate_longest_streak(completions)
@@ -190,15 +168,32 @@ class CalendarIntegration:
             return period_days // 30 * frequency['interval']
         return 0
     
-    def _calculate_current_streak(self, completions: List[datetime]) -> int:
-        """Вычисляет текущую серию выполнений"""
+    def render_month(self, year: int, month: int, marks: Mapping[date, str]) -> str:
+        """
+        Текстовый календарь месяца: выполненные дни — ✅, пропущенные — ❌,
+        остальные — число месяца (marks — отметки дня, например из битовой карты)
+        """
+        symbols = {'done': '✅', 'skipped': '❌'}
+        lines = [f"{month:02d}.{year}", "Пн Вт Ср Чт Пт Сб Вс"]
+        for week in calendar.monthcalendar(year, month):
+            cells = []
+            for day in week:
+                if not day:
+                    cells.append("  ")
+                else:
+                    cells.append(symbols.get(marks.get(date(year, month, day)), f"{day:2d}"))
+            lines.append(" ".join(cells).rstrip())
+        return "\n".join(lines)
+
+    def _calculate_current_streak(self, completions: List[datetime], today: date = None) -> int:
+        """Вычисляет текущую серию выполнений (заканчивается сегодня или вчера)"""
         if not completions:
             return 0
         
         # Сортируем по убыванию
         sorted_completions = sorted(completions, reverse=True)
         streak = 0
-        current_date = datetime.now().date()
+        current_date = today or self.clock.today()
         
         for completion in sorted_completions:
             completion_date = completion.date()
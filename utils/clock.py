@@ -0,0 +1,195 @@
+"""
+Часы бота: текущее время, «сегодня» и таймеры
+
+Код, зависящий от времени (парсеры дат, календарь, напоминания), берёт
+время не из datetime.now()/time.time(), а из объекта часов, который можно
+подменить:
+- SystemClock — настоящее время. «Сегодня» в каждом поясе вычисляется один
+  раз и переиспользуется до ближайшей полуночи в этом поясе, а не через
+  datetime.now(zone) при каждом вызове;
+- SimulatedClock — время стоит, пока его не продвинут. Таймеры планировщика
+  и очереди отправки срабатывают по мере продвижения, поэтому сутки
+  напоминаний прокручиваются за секунды.
+
+clock — часы по умолчанию для всего процесса.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .timezones import Zone, get_zone, to_timestamp
+
+
+class Clock(ABC):
+    """Общий интерфейс часов"""
+
+    @abstractmethod
+    def time(self) -> float:
+        """Текущий момент (UTC timestamp)"""
+
+    @abstractmethod
+    def monotonic(self) -> float:
+        """Монотонное время для интервалов и ограничений частоты, в секундах"""
+
+    @abstractmethod
+    def call_later(self, delay: float, callback: Callable[[], None]):
+        """Вызывает callback через delay секунд; возвращает объект с методом cancel()"""
+
+    def now(self, zone: Zone = None) -> datetime:
+        """Текущее время на часах пользователя в поясе zone (naive datetime)"""
+        return datetime.fromtimestamp(self.time(), get_zone(zone)).replace(tzinfo=None)
+
+    def today(self, zone: Zone = None) -> date:
+        """Сегодняшняя дата в поясе zone"""
+        return self.now(zone).date()
+
+    def midnight(self, zone: Zone = None) -> datetime:
+        """Начало сегодняшнего дня на часах пользователя (naive datetime)"""
+        return datetime.combine(self.today(zone), datetime.min.time())
+
+
+class _DayCacheMixin:
+    """«Сегодня» по поясам, действительное до ближайшей полуночи в поясе"""
+
+    def _reset_days(self):
+        # Пояс (как его передали: имя, tzinfo или None) ->
+        # (сегодня, полночь на часах, timestamp полуночи, timestamp следующей полуночи).
+        # Пояс по умолчанию задаётся при запуске, до первого обращения к часам
+        self._days: Dict[Zone, Tuple[date, datetime, float, float]] = {}
+
+    def _day(self, zone: Zone) -> Tuple[date, datetime, float, float]:
+        now = self.time()
+        cached = self._days.get(zone)
+        if cached is not None and cached[2] <= now < cached[3]:
+            return cached
+        tz = get_zone(zone)
+        today = datetime.fromtimestamp(now, tz).date()
+        midnight = datetime.combine(today, datetime.min.time())
+        cached = (
+            today, midnight,
+            to_timestamp(midnight, tz),
+            to_timestamp(midnight + timedelta(days=1), tz),
+        )
+        self._days[zone] = cached
+        return cached
+
+    def today(self, zone: Zone = None) -> date:
+        return self._day(zone)[0]
+
+    def midnight(self, zone: Zone = None) -> datetime:
+        return self._day(zone)[1]
+
+
+class SystemClock(_DayCacheMixin, Clock):
+    """Настоящее время"""
+
+    def __init__(self):
+        self._reset_days()
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def call_later(self, delay: float, callback: Callable[[], None]):
+        return asyncio.get_running_loop().call_later(delay, callback)
+
+
+class _Timer:
+    """Таймер SimulatedClock"""
+
+    __slots__ = ('when', 'seq', 'callback', 'cancelled')
+
+    def __init__(self, when: float, seq: int, callback: Callable[[], None]):
+        self.when = when
+        self.seq = seq
+        self.callback = callback
+        self.cancelled = False
+
+    def __lt__(self, other: "_Timer") -> bool:
+        return (self.when, self.seq) < (other.when, other.seq)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class SimulatedClock(_DayCacheMixin, Clock):
+    """
+    Время, которое идёт только по команде: advance/run_until продвигают его
+    к ближайшему таймеру, вызывают таймер и дают event loop обработать
+    последствия, затем берутся за следующий
+    """
+
+    def __init__(self, start: float = 0.0, settle_steps: int = 256):
+        self._now = float(start)
+        self.settle_steps = settle_steps
+        self._timers: List[_Timer] = []
+        self._seq = itertools.count()
+        self._reset_days()
+
+    def time(self) -> float:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> _Timer:
+        timer = _Timer(self._now + max(delay, 0.0), next(self._seq), callback)
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    def next_timer(self) -> Optional[float]:
+        """Момент ближайшего таймера (None — таймеров нет)"""
+        timers = self._timers
+        while timers and timers[0].cancelled:
+            heapq.heappop(timers)
+        return timers[0].when if timers else None
+
+    async def settle(self):
+        """
+        Даёт задачам event loop отработать при текущем времени: уступает
+        управление, пока в очереди цикла есть готовые к запуску обратные вызовы
+        (не больше settle_steps раз). Если у цикла нет такой очереди
+        (не стандартный asyncio), уступает ровно settle_steps раз
+        """
+        ready = getattr(asyncio.get_running_loop(), '_ready', None)
+        for _ in range(self.settle_steps):
+            await asyncio.sleep(0)
+            if ready is not None and not ready:
+                break
+
+    async def run_until(self, until: float) -> int:
+        """
+        Продвигает время до until, по порядку вызывая все таймеры до него
+        Возвращает число сработавших таймеров
+        """
+        fired = 0
+        await self.settle()
+        while True:
+            when = self.next_timer()
+            if when is None or when > until:
+                break
+            # Все таймеры на один момент срабатывают вместе
+            self._now = max(self._now, when)
+            while self._timers and self._timers[0].when <= self._now:
+                timer = heapq.heappop(self._timers)
+                if not timer.cancelled:
+                    timer.callback()
+                    fired += 1
+            await self.settle()
+        self._now = max(self._now, until)
+        await self.settle()
+        return fired
+
+    async def advance(self, seconds: float) -> int:
+        """Продвигает время на seconds секунд"""
+        return await self.run_until(self._now + seconds)
+
+
+# Часы по умолчанию
+clock = SystemClock()
@@ -3,38 +3,67 @@
 """
 import re
 from datetime import datetime, timedelta
-from typing import Optional, Tuple, List
+from typing import Callable, Dict, Optional, Tuple, List
 import calendar
 
+from .clock import Clock, clock as default_clock
+from .parse_cache import DayCache
+from .timezones import Zone
+
 
 class DateParser:
     """Класс для парсинга и работы с датами"""
     
-    def __init__(self):
-        # Паттерны для распознавания дат
-        self.date_patterns = {
+    def __init__(self, cache_size: int = 1024, clock: Optional[Clock] = None):
+        # Текущее время и «сегодня» берутся из часов (в бенчмарках — SimulatedClock)
+        self.clock = clock or default_clock
+        # Результаты разбора повторяющихся фраз (0 — без кэша)
+        self.cache = DayCache(cache_size, today=self.clock.today)
+        
+        # Паттерны для распознавания дат в порядке приоритета: (паттерн, первые
+        # символы совпадения после \b в нижнем регистре — тело класса символов,
+        # разбор). Меняя паттерн, проверьте его первые символы
+        self._table: List[Tuple[str, str, Callable]] = [
             # Форматы дат
-            r'\b(\d{1,2})[./-](\d{1,2})[./-](\d{4})\b': self._parse_dd_mm_yyyy,
-            r'\b(\d{4})[./-](\d{1,2})[./-](\d{1,2})\b': self._parse_yyyy_mm_dd,
-            r'\b(\d{1,2})[./-](\d{1,2})\b': self._parse_dd_mm,
+            (r'\b(\d{1,2})[./-](\d{1,2})[./-](\d{4})\b', r'\d', self._parse_dd_mm_yyyy),
+            (r'\b(\d{4})[./-](\d{1,2})[./-](\d{1,2})\b', r'\d', self._parse_yyyy_mm_dd),
+            (r'\b(\d{1,2})[./-](\d{1,2})\b', r'\d', self._parse_dd_mm),
             
             # Относительные даты
-            r'\b(сегодня|today)\b': self._parse_today,
-            r'\b(завтра|tomorrow)\b': self._parse_tomorrow,
-            r'\b(вчера|yesterday)\b': self._parse_yesterday,
-            r'\bчерез\s+(\d+)\s+дн(?:я|ей|ь)\b': self._parse_days_from_now,
-            r'\bчерез\s+(\d+)\s+нед(?:елю|ели|ель)\b': self._parse_weeks_from_now,
-            r'\bчерез\s+(\d+)\s+мес(?:яц|яца|яцев)\b': self._parse_months_from_now,
+            (r'\b(сегодня|today)\b', 'сt', self._parse_today),
+            (r'\b(завтра|tomorrow)\b', 'зt', self._parse_tomorrow),
+            (r'\b(вчера|yesterday)\b', 'вy', self._parse_yesterday),
+            (r'\bчерез\s+(\d+)\s+дн(?:я|ей|ь)\b', 'ч', self._parse_days_from_now),
+            (r'\bчерез\s+(\d+)\s+нед(?:елю|ели|ель)\b', 'ч', self._parse_weeks_from_now),
+            (r'\bчерез\s+(\d+)\s+мес(?:яц|яца|яцев)\b', 'ч', self._parse_months_from_now),
             
             # Дни недели
-            r'\b(понедельник|monday|пн)\b': self._parse_weekday,
-            r'\b(вторник|tuesday|вт)\b': self._parse_weekday,
-            r'\b(среда|wednesday|ср)\b': self._parse_weekday,
-            r'\b(четверг|thursday|чт)\b': self._parse_weekday,
-            r'\b(пятница|friday|пт)\b': self._parse_weekday,
-            r'\b(суббота|saturday|сб)\b': self._parse_weekday,
-            r'\b(воскресенье|sunday|вс)\b': self._parse_weekday,
-        }
+            (r'\b(понедельник|monday|пн)\b', 'пm', self._parse_weekday),
+            (r'\b(вторник|tuesday|вт)\b', 'вt', self._parse_weekday),
+            (r'\b(среда|wednesday|ср)\b', 'сw', self._parse_weekday),
+            (r'\b(четверг|thursday|чт)\b', 'чt', self._parse_weekday),
+            (r'\b(пятница|friday|пт)\b', 'пf', self._parse_weekday),
+            (r'\b(суббота|saturday|сб)\b', 'сs', self._parse_weekday),
+            (r'\b(воскресенье|sunday|вс)\b', 'вs', self._parse_weekday),
+        ]
+        self.date_patterns = {pattern: parser_func for pattern, _first_chars, parser_func in self._table}
+        
+        # Паттерны компилируются один раз: список в порядке приоритета
+        # и общая альтернация, которая находит кандидатов за один проход
+        self._compiled = [
+            (re.compile(pattern, re.IGNORECASE), parser_func)
+            for pattern, parser_func in self.date_patterns.items()
+        ]
+        # Первый символ -> номера паттернов, которые могут с него начинаться
+        self._by_first_char: Dict[str, List[int]] = {}
+        for index, (_pattern, first_chars, _parser_func) in enumerate(self._table):
+            for char in ('0123456789' if first_chars == r'\d' else first_chars):
+                self._by_first_char.setdefault(char, []).append(index)
+        # Общий \b вынесен за скобки, а позиции, с которых не начинается
+        # ни один паттерн, отсекает опережающая проверка
+        first_chars = ''.join(dict.fromkeys(first for _pattern, first, _parser_func in self._table))
+        body = '|'.join(pattern[2:] for pattern in self.date_patterns)
+        self._combined = re.compile('(?=[' + first_chars + r'])\b(?:' + body + ')', re.IGNORECASE)
         
         # Словарь дней недели
         self.weekdays = {
@@ -47,72 +76,141 @@ class DateParser:
             'воскресенье': 6, 'sunday': 6, 'вс': 6,
         }
     
-    def parse_date(self, text: str) -> Optional[datetime]:
+    def _pattern_at(self, text: str, pos: int) -> Optional[int]:
+        """Самый приоритетный паттерн, совпадающий в позиции pos"""
+        for index in self._by_first_char.get(text[pos].lower(), ()):
+            if self._compiled[index][0].match(text, pos):
+                return index
+        # Символ, который совпадает с паттерном только без учёта регистра
+        # (или цифра другого алфавита), — проверяем все паттерны
+        for index, (pattern, _parser_func) in enumerate(self._compiled):
+            if pattern.match(text, pos):
+                return index
+        return None
+    
+    def parse_date(self, text: str, tz: Zone = None) -> Optional[datetime]:
         """
         Парсит дату из текста
+        Относительные даты считаются от сегодняшнего дня в поясе tz
         Возвращает datetime объект или None если дата не найдена
         """
         text = text.lower().strip()
+        today = self.clock.midnight(tz)
+        # В разных поясах «завтра» — разные даты, поэтому день входит в ключ
+        return self.cache.get_or_compute((today, text), lambda: self._parse_date(text, today))
+    
+    def _parse_date(self, text: str, today: datetime) -> Optional[datetime]:
+        """Разбор фразы в нижнем регистре без кэша"""
+        best, pos = self._find_best_match(text)
+        if best is None:
+            return None
+        
+        pattern, parser_func = self._compiled[best]
+        try:
+            return parser_func(pattern.match(text, pos), today)
+        except (ValueError, TypeError):
+            pass
         
-        for pattern, parser_func in self.date_patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
+        # Дата не разобралась (например, 31.02) — как и раньше, пробуем
+        # следующие паттерны по порядку
+        for pattern, parser_func in self._compiled[best + 1:]:
+            match = pattern.search(text)
             if match:
                 try:
-                    return parser_func(match)
+                    return parser_func(match, today)
                 except (ValueError, TypeError):
                     continue
         
         return None
     
-    def _parse_dd_mm_yyyy(self, match) -> datetime:
+    def _find_best_match(self, text: str) -> Tuple[Optional[int], int]:
+        """
+        Находит паттерн с наивысшим приоритетом, который совпадает где-либо
+        в тексте, и позицию его первого совпадения.
+        В каждой найденной позиции выбирается самый приоритетный совпавший
+        паттерн, поэтому результат тот же, что при поиске каждым паттерном по очереди
+        """
+        best, best_pos = None, -1
+        combined = self._combined
+        pos = 0
+        while True:
+            match = combined.search(text, pos)
+            if match is None:
+                break
+            index = self._pattern_at(text, match.start())
+            if best is None or index < best:
+                best, best_pos = index, match.start()
+                if best == 0:
+                    break
+            pos = match.start() + 1
+        return best, best_pos
+    
+    def find_dates(self, text: str, today: Optional[datetime] = None) -> List[Tuple[datetime, Tuple[int, int]]]:
+        """
+        Находит все даты в тексте за один проход
+        (относительные — от полуночи today, по умолчанию сегодня в поясе по умолчанию)
+        Возвращает список (дата, (начало, конец)) с непересекающимися позициями
+        """
+        today = today or self.clock.midnight()
+        found = []
+        for match in self._combined.finditer(text):
+            start = match.start()
+            pattern, parser_func = self._compiled[self._pattern_at(text, start)]
+            try:
+                date = parser_func(pattern.match(text, start), today)
+            except (ValueError, TypeError):
+                continue
+            found.append((date, (start, match.end())))
+        return found
+    
+    def _parse_dd_mm_yyyy(self, match, today: datetime) -> datetime:
         """Парсит дату в формате DD.MM.YYYY"""
         day, month, year = map(int, match.groups())
         return datetime(year, month, day)
     
-    def _parse_yyyy_mm_dd(self, match) -> datetime:
+    def _parse_yyyy_mm_dd(self, match, today: datetime) -> datetime:
         """Парсит дату в формате YYYY.MM.DD"""
         year, month, day = map(int, match.groups())
         return datetime(year, month, day)
     
-    def _parse_dd_mm(self, match) -> datetime:
+    def _parse_dd_mm(self, match, today: datetime) -> datetime:
         """Парсит дату в формате DD.MM (текущий год)"""
         day, month = map(int, match.groups())
-        year = datetime.now().year
-        return datetime(year, month, day)
+        return datetime(today.year, month, day)
     
-    def _parse_today(self, match) -> datetime:
+    def _parse_today(self, match, today: datetime) -> datetime:
         """Парсит 'сегодня'"""
-        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return today
     
-    def _parse_tomorrow(self, match) -> datetime:
+    def _parse_tomorrow(self, match, today: datetime) -> datetime:
         """Парсит 'завтра'"""
-        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        return today + timedelta(days=1)
     
-    def _parse_yesterday(self, match) -> datetime:
+    def _parse_yesterday(self, match, today: datetime) -> datetime:
         """Парсит 'вчера'"""
-        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        return today - timedelta(days=1)
     
-    def _parse_days_from_now(self, match) -> datetime:
+    def _parse_days_from_now(self, match, today: datetime) -> datetime:
         """Парсит 'через N дней'"""
         days = int(match.group(1))
-        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=days)
+        return today + timedelta(days=days)
     
-    def _parse_weeks_from_now(self, match) -> datetime:
+    def _parse_weeks_from_now(self, match, today: datetime) -> datetime:
         """Парсит 'через N недель'"""
         weeks = int(match.group(1))
-        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(weeks=weeks)
+        return today + timedelta(weeks=weeks)
     
-    def _parse_months_from_now(self, match) -> datetime:
+    def _parse_months_from_now(self, match, today: datetime) -> datetime:
         """Парсит 'через N месяцев'"""
         months = int(match.group(1))
-        current = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        current = today
         # Простое добавление месяцев
         year = current.year + (current.month + months - 1) // 12
         month = (current.month + months - 1) % 12 + 1
         day = min(current.day, calendar.monthrange(year, month)[1])
         return datetime(year, month, day)
     
-    def _parse_weekday(self, match) -> datetime:
+    def _parse_weekday(self, match, today: datetime) -> datetime:
         """Парсит день недели"""
         weekday_name = match.group(0).lower()
         target_weekday = self.weekdays.get(weekday_name)
@@ -120,20 +218,22 @@ class DateParser:
         if target_weekday is None:
             raise ValueError(f"Неизвестный день недели: {weekday_name}")
         
-        current_weekday = datetime.now().weekday()
+        current_weekday = today.weekday()
         days_ahead = target_weekday - current_weekday
         
         if days_ahead <= 0:  # Если день уже прошел на этой неделе
             days_ahead += 7
         
-        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=days_ahead)
+        return today + timedelta(days=days_ahead)
     
-    def validate_date(self, date: datetime) -> Tuple[bool, str]:
+    def validate_date(self, date: datetime, tz: Zone = None,
+                      now: Optional[datetime] = None) -> Tuple[bool, str]:
         """
-        Валидирует дату
+        Валидирует дату (время на часах пользователя в поясе tz;
+        now — уже известное текущее время, чтобы не запрашивать его на каждую дату)
         Возвращает (is_valid, error_message)
         """
-        now = datetime.now()
+        now = now or self.clock.now(tz)
         
         # Проверяем, что дата не слишком далеко в прошлом
         if date < now - timedelta(days=365):
@@ -153,10 +253,9 @@ class DateParser:
         """Форматирует дату и время для отображения"""
         return date.strftime("%d.%m.%Y %H:%M")
     
-    def get_relative_date(self, date: datetime) -> str:
-        """Возвращает относительное описание даты"""
-        now = datetime.now()
-        diff = date - now.replace(hour=0, minute=0, second=0, microsecond=0)
+    def get_relative_date(self, date: datetime, tz: Zone = None) -> str:
+        """Возвращает относительное описание даты (относительно сегодня в поясе tz)"""
+        diff = date - self.clock.midnight(tz)
         
         if diff.days == 0:
             return "сегодня"
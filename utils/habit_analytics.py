@@ -0,0 +1,193 @@
+"""
+Векторная статистика по отметкам привычек
+
+Выполнения всех привычек загружаются двумя массивами NumPy: номер привычки
+и номер дня (дни от 1970-01-01), отсортированные по привычке и дню. Серии,
+самые длинные серии, доля выполнений в скользящем окне и распределение по
+дням недели считаются сразу для всех привычек, без циклов по datetime —
+для еженедельных сводок по тысячам привычек.
+Результаты get_habit_stats совпадают с CalendarIntegration.get_habit_stats.
+"""
+import sqlite3
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from database import habit_bitmaps
+from utils.clock import clock
+
+
+# date(1970, 1, 1).toordinal()
+EPOCH_ORDINAL = 719163
+
+
+def _day_number(day: date) -> int:
+    """Номер дня от 1970-01-01"""
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+class HabitAnalytics:
+    """Выполнения привычек в виде массивов и статистика по ним"""
+
+    def __init__(self, habit_ids: np.ndarray, days: np.ndarray, all_habit_ids: Iterable[int] = ()):
+        # Одна запись на привычку и день, по возрастанию (привычка, день)
+        order = np.lexsort((days, habit_ids))
+        habit_ids, days = habit_ids[order], days[order]
+        if len(days):
+            keep = np.ones(len(days), dtype=bool)
+            keep[1:] = (habit_ids[1:] != habit_ids[:-1]) | (days[1:] != days[:-1])
+            habit_ids, days = habit_ids[keep], days[keep]
+
+        # Привычки без выполнений тоже попадают в результат (с нулями)
+        self.habit_ids = np.union1d(np.unique(habit_ids), np.fromiter(all_habit_ids, dtype=np.int64))
+        self.habit_index = np.searchsorted(self.habit_ids, habit_ids)
+        self.days = days
+
+        # Серии — отрезки подряд идущих дней одной привычки
+        starts = np.ones(len(days), dtype=bool)
+        if len(days):
+            starts[1:] = (self.habit_index[1:] != self.habit_index[:-1]) | (days[1:] - days[:-1] != 1)
+        self._run_starts = np.flatnonzero(starts)
+        self._run_lengths = np.diff(np.append(self._run_starts, len(days)))
+        self._run_habits = self.habit_index[self._run_starts]
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection, habit_ids: Optional[List[int]] = None) -> "HabitAnalytics":
+        """Загружает выполнения из habit_actions: всех привычек или перечисленных"""
+        sql = "SELECT habit_id, action_date FROM habit_actions WHERE status = 'done'"
+        params: Tuple = ()
+        if habit_ids is not None:
+            sql += f" AND habit_id IN ({','.join('?' * len(habit_ids))})"
+            params = tuple(habit_ids)
+        rows = conn.execute(sql, params).fetchall()
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        days = np.array([row[1] for row in rows], dtype='datetime64[D]').astype(np.int64)
+        if habit_ids is None:
+            all_ids = [row[0] for row in conn.execute("SELECT id FROM habits")]
+        else:
+            all_ids = habit_ids
+        return cls(ids, days, all_ids)
+
+    @classmethod
+    def from_bitmaps(cls, conn: sqlite3.Connection, habit_ids: Optional[List[int]] = None) -> "HabitAnalytics":
+        """Загружает выполнения из битовых карт habit_bitmaps без разбора строк с датами"""
+        ids, days = [], []
+        for habit_id, bitmap in habit_bitmaps.load_many(conn, habit_ids).items():
+            bits = np.unpackbits(np.frombuffer(bytes(bitmap.done), dtype=np.uint8), bitorder='little')
+            done_days = np.flatnonzero(bits) + (bitmap.start - EPOCH_ORDINAL)
+            ids.append(np.full(len(done_days), habit_id, dtype=np.int64))
+            days.append(done_days)
+        if habit_ids is None:
+            all_ids = [row[0] for row in conn.execute("SELECT id FROM habits")]
+        else:
+            all_ids = habit_ids
+        return cls(
+            np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64),
+            np.concatenate(days) if days else np.zeros(0, dtype=np.int64),
+            all_ids
+        )
+
+    @classmethod
+    def from_completions(cls, completions: Mapping[int, List[datetime]]) -> "HabitAnalytics":
+        """Из словаря привычка -> даты выполнений (как habit_data['completions'])"""
+        ids, days = [], []
+        for habit_id, dates in completions.items():
+            ids.extend([habit_id] * len(dates))
+            # toordinal у datetime отбрасывает время
+            days.extend([completion.toordinal() for completion in dates])
+        return cls(
+            np.array(ids, dtype=np.int64),
+            np.array(days, dtype=np.int64) - EPOCH_ORDINAL,
+            completions.keys()
+        )
+
+    def total_completions(self, period_days: int = 30, today: Optional[date] = None) -> np.ndarray:
+        """
+        Число выполнений за последние period_days дней, включая сегодня
+        (как comp >= now - period_days в CalendarIntegration)
+        """
+        today_number = _day_number(today or clock.today())
+        in_period = self.days > today_number - period_days
+        return np.bincount(self.habit_index[in_period], minlength=len(self.habit_ids))
+
+    def current_streaks(self, today: Optional[date] = None) -> np.ndarray:
+        """Длина серии, которая заканчивается сегодня или вчера (иначе 0)"""
+        today_number = _day_number(today or clock.today())
+        streaks = np.zeros(len(self.habit_ids), dtype=np.int64)
+        if not len(self.days):
+            return streaks
+        # Последняя серия каждой привычки
+        last_run = np.flatnonzero(np.append(self._run_habits[1:] != self._run_habits[:-1], True))
+        last_day = self.days[self._run_starts[last_run] + self._run_lengths[last_run] - 1]
+        active = (last_day == today_number) | (last_day == today_number - 1)
+        streaks[self._run_habits[last_run[active]]] = self._run_lengths[last_run[active]]
+        return streaks
+
+    def longest_streaks(self) -> np.ndarray:
+        """Самая длинная серия каждой привычки"""
+        longest = np.zeros(len(self.habit_ids), dtype=np.int64)
+        np.maximum.at(longest, self._run_habits, self._run_lengths)
+        return longest
+
+    def expected_completions(self, frequencies: Mapping[int, Optional[Dict]], period_days: int = 30) -> np.ndarray:
+        """Ожидаемое число выполнений за период по частоте привычки (0 — частоты нет)"""
+        expected = np.zeros(len(self.habit_ids), dtype=np.int64)
+        per_type = {
+            'daily': lambda interval: period_days // interval,
+            'weekly': lambda interval: (period_days // 7) * interval,
+            'monthly': lambda interval: period_days // 30 * interval,
+        }
+        for index, habit_id in enumerate(self.habit_ids.tolist()):
+            frequency = frequencies.get(habit_id)
+            if frequency and frequency['type'] in per_type:
+                expected[index] = per_type[frequency['type']](frequency['interval'])
+        return expected
+
+    def rolling_completion_rates(self, window: int, start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Доля выполненных дней в окне из window дней, которое заканчивается
+        в каждый день от start до end включительно
+        Возвращает (привычки, матрица привычка x день)
+        """
+        first, last = _day_number(start) - window + 1, _day_number(end)
+        width = last - first + 1
+        in_range = (self.days >= first) & (self.days <= last)
+        done = np.zeros((len(self.habit_ids), width + 1), dtype=np.int32)
+        done[self.habit_index[in_range], self.days[in_range] - first + 1] = 1
+        cumulative = np.cumsum(done, axis=1)
+        rates = (cumulative[:, window:] - cumulative[:, :-window]) / window
+        return self.habit_ids, rates
+
+    def weekday_histograms(self) -> np.ndarray:
+        """Число выполнений по дням недели (понедельник — 0): матрица привычка x 7"""
+        # 1970-01-01 — четверг
+        weekdays = (self.days + 3) % 7
+        counts = np.bincount(self.habit_index * 7 + weekdays, minlength=len(self.habit_ids) * 7)
+        return counts.reshape(len(self.habit_ids), 7)
+
+    def get_habit_stats(self, frequencies: Optional[Mapping[int, Optional[Dict]]] = None,
+                        period_days: int = 30, today: Optional[date] = None) -> Dict[int, Dict]:
+        """Статистика всех привычек в формате CalendarIntegration.get_habit_stats"""
+        today = today or clock.today()
+        totals = self.total_completions(period_days, today)
+        expected = self.expected_completions(frequencies or {}, period_days).tolist()
+        streaks = self.current_streaks(today)
+        longest = self.longest_streaks()
+        has_completions = np.bincount(self.habit_index, minlength=len(self.habit_ids)) > 0
+
+        stats = {}
+        for index, habit_id in enumerate(self.habit_ids.tolist()):
+            if not has_completions[index]:
+                stats[habit_id] = {'total_completions': 0, 'completion_rate': 0.0, 'streak': 0, 'longest_streak': 0}
+                continue
+            total = int(totals[index])
+            # Округление как у round() в CalendarIntegration, а не np.round
+            rate = round(total / expected[index] * 100, 1) if expected[index] > 0 else 0.0
+            stats[habit_id] = {
+                'total_completions': total,
+                'completion_rate': rate,
+                'streak': int(streaks[index]),
+                'longest_streak': int(longest[index]),
+            }
+        return stats
@@ -0,0 +1,67 @@
+"""
+Кэш результатов разбора текста
+
+Пользователи раз за разом присылают одни и те же фразы ("каждый день
+в 9 утра", "завтра"), поэтому результаты парсеров запоминаются.
+Относительные даты ("завтра", "в пятницу", "25.12" — текущего года) зависят
+от сегодняшнего дня, поэтому с наступлением нового дня кэш очищается целиком.
+Внутри дня результат разбора не меняется: все даты приводятся к полуночи.
+"""
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Hashable
+
+_MISSING = object()
+
+
+class DayCache:
+    """LRU-кэш ограниченного размера, который сбрасывается в полночь"""
+
+    def __init__(self, maxsize: int = 1024, today: Callable[[], date] = date.today):
+        self.maxsize = maxsize
+        self._today = today
+        self._day = None
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Значение из кэша или compute(), результат которого запоминается"""
+        if self.maxsize <= 0:
+            return compute()
+
+        day = self._today()
+        if day != self._day:
+            # Наступил новый день: относительные даты в кэше устарели
+            self._entries.clear()
+            self._day = day
+
+        value = self._entries.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = compute()
+        self._entries[key] = value
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Очищает кэш и счётчики"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий и промахов"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
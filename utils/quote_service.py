@@ -0,0 +1,209 @@
+"""
+Сервис мотивационных цитат для /quotes
+
+Раньше каждая команда /quotes синхронно скачивала страницу QUOTES_URL
+(requests.get с таймаутом 10 с, event loop стоял всё это время) и заново
+разбирала её BeautifulSoup. Теперь страница скачивается асинхронно (aiohttp),
+разбирается один раз в пуле потоков, а цитаты хранятся в памяти: /quotes
+выбирает случайную из готового списка. Фоновая задача обновляет список раз
+в ttl секунд, при ошибке пробует снова через retry_delay. Список сохраняется
+на диск, поэтому после перезапуска цитаты есть сразу, без ожидания сети.
+
+Одновременные загрузки не запускаются: все, кто ждёт цитаты, ждут одну.
+Если она не удалась, /quotes без цитат ещё failure_backoff секунд отвечает
+сразу, не обращаясь к сайту.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+from typing import List, Optional
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from utils.clock import Clock, clock as default_clock
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+# Как часто обновлять цитаты, в секундах
+QUOTES_TTL = 6 * 3600
+# Пауза перед повторной попыткой после ошибки загрузки
+RETRY_DELAY = 300
+# Сколько /quotes без цитат не ждут сайт после неудачной загрузки
+FAILURE_BACKOFF = 30
+REQUEST_TIMEOUT = 10
+
+
+def parse_quotes(html: str) -> List[str]:
+    """Цитаты со страницы: абзацы длиннее 10 символов в блоках field-name-body"""
+    soup = BeautifulSoup(html, 'html.parser')
+    quote_texts = []
+    for quote in soup.find_all('div', class_='field-name-body'):
+        for p in quote.find_all('p'):
+            text = p.get_text(strip=True)
+            if len(text) > 10:
+                quote_texts.append(text)
+    return quote_texts
+
+
+class QuoteService:
+    """Цитаты в памяти с фоновым обновлением и копией на диске"""
+
+    def __init__(self, url: Optional[str], cache_path: Optional[str] = None,
+                 ttl: float = QUOTES_TTL, retry_delay: float = RETRY_DELAY,
+                 timeout: float = REQUEST_TIMEOUT, failure_backoff: float = FAILURE_BACKOFF,
+                 clock: Optional[Clock] = None):
+        self.url = url
+        # None — не сохранять цитаты на диск
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.failure_backoff = failure_backoff
+        self.clock = clock or default_clock
+        self.quotes: List[str] = []
+        # Когда цитаты были скачаны (timestamp), 0 — ещё не скачивались
+        self.updated_at = 0.0
+        # Загрузка, которую сейчас ждут (None — не идёт)
+        self._inflight: Optional[asyncio.Task] = None
+        # Когда не удалась последняя загрузка (clock.monotonic), None — удалась
+        self._failed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Поднимает цитаты с диска и запускает фоновое обновление"""
+        loaded = await asyncio.get_running_loop().run_in_executor(None, self.load_cache)
+        if loaded:
+            logger.info(f"Загружено {loaded} цитат с диска")
+        if self.url and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Останавливает фоновое обновление и незавершённую загрузку"""
+        for task in (self._task, self._inflight):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = None
+
+    def random_quote(self) -> Optional[str]:
+        """Случайная цитата из памяти (None — цитат пока нет)"""
+        return random.choice(self.quotes) if self.quotes else None
+
+    async def get_quote(self) -> Optional[str]:
+        """
+        Случайная цитата. Если цитат ещё нет (первый запуск без копии на диске),
+        дожидается загрузки — одной на всех одновременно спросивших. Сразу
+        после неудачной загрузки сайт не ждёт и возвращает None
+        """
+        if not self.quotes and self.url and not self._backing_off():
+            try:
+                await self.refresh(only_if_empty=True)
+            except Exception as e:
+                logger.error(f"Не удалось загрузить цитаты: {e}")
+        return self.random_quote()
+
+    async def refresh(self, only_if_empty: bool = False) -> int:
+        """
+        Скачивает и разбирает страницу цитат; возвращает число цитат.
+        Вызов во время загрузки ждёт её, а не начинает новую
+        """
+        if only_if_empty and self.quotes:
+            return len(self.quotes)
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._refresh())
+            self._inflight.add_done_callback(self._refresh_done)
+        # Отмена одного ожидающего не прерывает загрузку для остальных
+        return await asyncio.shield(self._inflight)
+
+    async def _refresh(self) -> int:
+        html = await self._fetch()
+        loop = asyncio.get_running_loop()
+        # Разбор страницы занимает десятки миллисекунд — не в event loop
+        quotes = await loop.run_in_executor(None, parse_quotes, html)
+        if not quotes:
+            raise ValueError("на странице не найдено цитат")
+        self.quotes = quotes
+        self.updated_at = self.clock.time()
+        await loop.run_in_executor(None, self.save_cache)
+        return len(quotes)
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._inflight = None
+        # exception() заодно помечает ошибку полученной, даже если ждать было некому
+        if task.cancelled() or task.exception() is not None:
+            self._failed_at = self.clock.monotonic()
+        else:
+            self._failed_at = None
+
+    def _backing_off(self) -> bool:
+        """Последняя загрузка не удалась меньше failure_backoff секунд назад"""
+        return self._failed_at is not None and self.clock.monotonic() - self._failed_at < self.failure_backoff
+
+    async def _fetch(self) -> str:
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(headers=HEADERS, timeout=timeout) as session:
+            async with session.get(self.url) as response:
+                response.raise_for_status()
+                return await response.text()
+
+    async def _refresh_loop(self):
+        """Обновляет цитаты, когда истекает ttl; после ошибки — через retry_delay"""
+        while True:
+            delay = self.updated_at + self.ttl - self.clock.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            try:
+                count = await self.refresh()
+                logger.info(f"Цитаты обновлены: {count} шт.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при загрузке цитат: {e}")
+                await asyncio.sleep(self.retry_delay)
+
+    def load_cache(self) -> int:
+        """Читает сохранённые цитаты; возвращает их число (0 — копии нет или она испорчена)"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return 0
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                data = json.load(f)
+            quotes = [quote for quote in data['quotes'] if isinstance(quote, str)]
+            updated_at = float(data['updated_at'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Копия цитат {self.cache_path} не прочитана: {e}")
+            return 0
+        if quotes and not self.quotes:
+            self.quotes = quotes
+            self.updated_at = updated_at
+        return len(quotes)
+
+    def save_cache(self):
+        """Сохраняет цитаты на диск (через временный файл, чтобы не оставить половину)"""
+        if not self.cache_path:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': self.updated_at, 'quotes': self.quotes}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+
+# Глобальная переменная для сервиса цитат
+quote_service = None
+
+def init_quote_service(url: Optional[str], cache_path: Optional[str] = None) -> QuoteService:
+    """Инициализирует сервис цитат (cache_path — файл копии цитат, None — без копии)"""
+    global quote_service
+    quote_service = QuoteService(url, cache_path=cache_path)
+    return quote_service
+
+def get_quote_service() -> Optional[QuoteService]:
+    """Получает экземпляр сервиса цитат"""
+    return quote_service
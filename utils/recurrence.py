@@ -0,0 +1,160 @@
+"""
+Ленивые повторения привычек по частоте
+
+Recurrence описывает повторение от начальной даты: каждые N дней,
+каждые N недель по набору дней недели или каждые N месяцев в тот же день
+(в коротком месяце — в последний день). Вхождения не хранятся списком:
+следующее вхождение после любого момента считается арифметикой за O(1),
+а диапазоны и бесконечное расписание отдаются генератором.
+"""
+import calendar
+from bisect import bisect_left
+from datetime import date, datetime, time
+import itertools
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+Moment = Union[date, datetime]
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+MONTHLY = 'monthly'
+
+
+class Recurrence:
+    """Повторение привычки от start с частотой frequency_type и шагом interval"""
+
+    def __init__(self, frequency_type: str, interval: int, start: Moment,
+                 weekdays: Optional[Iterable[int]] = None):
+        if frequency_type not in (DAILY, WEEKLY, MONTHLY):
+            raise ValueError(f"Неизвестная частота: {frequency_type}")
+        if interval < 1:
+            raise ValueError(f"Шаг повторения должен быть положительным: {interval}")
+
+        self.frequency_type = frequency_type
+        self.interval = interval
+        # Время вхождений берётся из start (None — вхождения-даты)
+        self.time: Optional[time] = start.time() if isinstance(start, datetime) else None
+        start_day = start.date() if isinstance(start, datetime) else start
+        self.start = start_day
+        self._start = start_day.toordinal()
+
+        # Недели считаются от понедельника: date(1, 1, 1).toordinal() == 1 — понедельник
+        self._start_week = (self._start - 1) // 7
+        self.weekdays: List[int] = sorted(set(weekdays)) if weekdays else [start_day.weekday()]
+        if any(not 0 <= weekday <= 6 for weekday in self.weekdays):
+            raise ValueError(f"Дни недели должны быть от 0 до 6: {self.weekdays}")
+
+        self._start_month = start_day.year * 12 + start_day.month - 1
+        self._month_day = start_day.day
+
+    @classmethod
+    def from_frequency(cls, frequency: Dict, start: Moment) -> "Recurrence":
+        """Из словаря частоты TextParser: {'type': ..., 'interval': ..., 'weekdays': [...]}"""
+        return cls(frequency['type'], frequency.get('interval', 1), start, frequency.get('weekdays'))
+
+    # ---------------------------
+    # Вхождения по номерам дней (date.toordinal)
+    # ---------------------------
+    def _next_ordinal(self, after: int) -> int:
+        """Номер первого дня с вхождением строго после дня after"""
+        day = max(after + 1, self._start)
+
+        if self.frequency_type == DAILY:
+            steps = -(-(day - self._start) // self.interval)
+            return self._start + steps * self.interval
+
+        if self.frequency_type == WEEKLY:
+            week, weekday = divmod(day - 1, 7)
+            offset = (week - self._start_week) % self.interval
+            if offset == 0:
+                index = bisect_left(self.weekdays, weekday)
+                if index < len(self.weekdays):
+                    return week * 7 + self.weekdays[index] + 1
+            # Первый подходящий день следующей активной недели
+            return (week + self.interval - offset) * 7 + self.weekdays[0] + 1
+
+        month = date.fromordinal(day)
+        month_index = month.year * 12 + month.month - 1
+        steps = -(-(month_index - self._start_month) // self.interval)
+        candidate = self._month_occurrence(steps)
+        if candidate < day:
+            candidate = self._month_occurrence(steps + 1)
+        return candidate
+
+    def _month_occurrence(self, step: int) -> int:
+        """Номер дня вхождения через step шагов от начала (день месяца обрезается)"""
+        year, month = divmod(self._start_month + step * self.interval, 12)
+        day = self._month_day
+        # До 28-го числа день есть в любом месяце
+        if day > 28:
+            day = min(day, calendar.monthrange(year, month + 1)[1])
+        return date(year, month + 1, day).toordinal()
+
+    def _ordinals_from(self, first: int) -> Iterator[int]:
+        """Номера дней вхождений начиная с вхождения first, без повторного поиска"""
+        if self.frequency_type == DAILY:
+            yield from itertools.count(first, self.interval)
+        elif self.frequency_type == WEEKLY:
+            week, weekday = divmod(first - 1, 7)
+            index = self.weekdays.index(weekday)
+            while True:
+                for weekday in self.weekdays[index:]:
+                    yield week * 7 + weekday + 1
+                index = 0
+                week += self.interval
+        else:
+            month = date.fromordinal(first)
+            step = (month.year * 12 + month.month - 1 - self._start_month) // self.interval
+            for step in itertools.count(step):
+                yield self._month_occurrence(step)
+
+    def _emit(self, ordinal: int) -> Moment:
+        day = date.fromordinal(ordinal)
+        return datetime.combine(day, self.time) if self.time is not None else day
+
+    def _at(self, ordinal: int) -> datetime:
+        """Момент вхождения в день ordinal (для сравнения с datetime)"""
+        return datetime.combine(date.fromordinal(ordinal), self.time or time.min)
+
+    def _ordinal_from(self, moment: Moment, inclusive: bool) -> int:
+        """Номер дня первого вхождения после moment (или в сам moment, если inclusive)"""
+        if isinstance(moment, datetime):
+            ordinal = self._next_ordinal(moment.toordinal() - 1)
+            # Вхождение в тот же день могло уже пройти
+            at = self._at(ordinal)
+            if at < moment or (at == moment and not inclusive):
+                ordinal = self._next_ordinal(ordinal)
+            return ordinal
+        return self._next_ordinal(moment.toordinal() - (1 if inclusive else 0))
+
+    # ---------------------------
+    # Публичный интерфейс
+    # ---------------------------
+    def next_after(self, moment: Moment) -> Moment:
+        """Первое вхождение строго после moment"""
+        return self._emit(self._ordinal_from(moment, inclusive=False))
+
+    def between(self, start: Moment, end: Moment) -> Iterator[Moment]:
+        """Вхождения с start по end включительно, по возрастанию"""
+        last = end.toordinal()
+        # Вхождение в последний день может быть позже end по времени
+        if isinstance(end, datetime) and self._at(last) > end:
+            last -= 1
+        for ordinal in self._ordinals_from(self._ordinal_from(start, inclusive=True)):
+            if ordinal > last:
+                return
+            yield self._emit(ordinal)
+
+    def take(self, count: int, after: Optional[Moment] = None) -> List[Moment]:
+        """Первые count вхождений (не раньше after, если указан)"""
+        first = self._ordinal_from(self.start if after is None else after, inclusive=True)
+        return [self._emit(ordinal) for ordinal in itertools.islice(self._ordinals_from(first), count)]
+
+    def __iter__(self) -> Iterator[Moment]:
+        """Бесконечное расписание от начальной даты"""
+        for ordinal in self._ordinals_from(self._next_ordinal(self._start - 1)):
+            yield self._emit(ordinal)
+
+    def __repr__(self) -> str:
+        return (f"Recurrence({self.frequency_type!r}, {self.interval}, {self.start!r}, "
+                f"weekdays={self.weekdays})")
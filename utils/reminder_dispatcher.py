@@ -0,0 +1,264 @@
+"""
+Модуль отправки напоминаний с учётом ограничений Telegram
+
+Все напоминания проходят через общую очередь: она ограничивает частоту
+отправки глобально (~30 сообщений в секунду на бота) и для каждого чата
+(~1 сообщение в секунду), отправляет первыми самые запоздавшие
+напоминания и выдерживает паузу retry_after при flood control.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from utils.clock import Clock, clock as default_clock
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 30        # сообщений в секунду на бота
+PER_CHAT_RATE = 1       # сообщений в секунду в один чат
+MAX_RETRIES = 3
+
+
+class TokenBucket:
+    """Классический token bucket на монотонных часах"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до появления токена (0 — токен есть)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float):
+        """Запрещает отправку на seconds секунд (после flood control)"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Message:
+    """Сообщение в очереди отправки"""
+
+    __slots__ = ('due_at', 'seq', 'chat_id', 'kwargs', 'future', 'not_before', 'attempts')
+
+    def __init__(self, due_at: float, seq: int, chat_id: int, kwargs: Dict, future: asyncio.Future):
+        self.due_at = due_at
+        self.seq = seq
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.future = future
+        self.not_before = 0.0
+        self.attempts = 0
+
+    def __lt__(self, other: "_Message") -> bool:
+        # Чем раньше должно было уйти сообщение, тем больше оно опоздало
+        return (self.due_at, self.seq) < (other.due_at, other.seq)
+
+
+class DispatcherMetrics:
+    """Метрики очереди отправки"""
+
+    def __init__(self, window: int = 1000):
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.max_queue_depth = 0
+        # Задержка от запланированного времени до фактической отправки
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def snapshot(self, queue_depth: int) -> Dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        return {
+            'queue_depth': queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'latency_p50': percentile(0.5),
+            'latency_p99': percentile(0.99),
+        }
+
+
+class ReminderDispatcher:
+    """Очередь отправки сообщений с ограничением частоты"""
+
+    def __init__(self, bot: Bot, global_rate: float = GLOBAL_RATE,
+                 per_chat_rate: float = PER_CHAT_RATE, max_retries: int = MAX_RETRIES,
+                 clock: Optional[Clock] = None):
+        self.bot = bot
+        self.clock = clock or default_clock
+        self.per_chat_rate = per_chat_rate
+        self.max_retries = max_retries
+        self.metrics = DispatcherMetrics()
+
+        now = self.clock.monotonic()
+        self._global_bucket = TokenBucket(global_rate, global_rate, now)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        # Готовые к отправке — по опозданию; отложенные — по времени, когда можно повторить
+        self._ready: List[_Message] = []
+        self._delayed: List[tuple] = []
+        self._seq = itertools.count()
+        self._waiter: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+        self._send_tasks = set()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._ready) + len(self._delayed)
+
+    def get_metrics(self) -> Dict:
+        return self.metrics.snapshot(self.queue_depth)
+
+    def send(self, chat_id: int, text: str, reply_markup=None, due_at: float = None) -> asyncio.Future:
+        """
+        Ставит сообщение в очередь
+        Возвращает Future, который завершится после отправки (или с ошибкой)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        message = _Message(
+            due_at if due_at is not None else self.clock.time(), next(self._seq), chat_id,
+            {'chat_id': chat_id, 'text': text, 'reply_markup': reply_markup}, future
+        )
+        heapq.heappush(self._ready, message)
+        self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self.queue_depth)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wake()
+        return future
+
+    async def stop(self):
+        """Останавливает очередь; неотправленные сообщения получают CancelledError"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._send_tasks:
+            await asyncio.gather(*self._send_tasks, return_exceptions=True)
+        for message in self._ready + [item[-1] for item in self._delayed]:
+            if not message.future.done():
+                message.future.cancel()
+        self._ready.clear()
+        self._delayed.clear()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def _sleep(self, timeout: Optional[float]):
+        self._waiter = asyncio.get_running_loop().create_future()
+        timer = self.clock.call_later(timeout, self._wake) if timeout is not None else None
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+            if timer is not None:
+                timer.cancel()
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Не даём словарю расти бесконечно: убираем простаивающие чаты
+            if len(self._chat_buckets) >= 10000:
+                self._chat_buckets = {
+                    chat: b for chat, b in self._chat_buckets.items() if not b.is_full(now)
+                }
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, 1, now)
+        return bucket
+
+    def _defer(self, message: _Message, until: float):
+        message.not_before = until
+        heapq.heappush(self._delayed, (until, message.seq, message))
+
+    async def _run(self):
+        while True:
+            now = self.clock.monotonic()
+
+            # Возвращаем в очередь сообщения, которым уже можно уйти
+            while self._delayed and self._delayed[0][0] <= now:
+                heapq.heappush(self._ready, heapq.heappop(self._delayed)[-1])
+
+            if not self._ready:
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                await self._sleep(timeout)
+                continue
+
+            message = self._ready[0]
+            chat_delay = self._chat_bucket(message.chat_id, now).delay(now)
+            if chat_delay > 0:
+                # Чат занят — пропускаем вперёд сообщения в другие чаты
+                heapq.heappop(self._ready)
+                self._defer(message, now + chat_delay)
+                continue
+
+            global_delay = self._global_bucket.delay(now)
+            if global_delay > 0:
+                await self._sleep(global_delay)
+                continue
+
+            heapq.heappop(self._ready)
+            self._global_bucket.take(now)
+            self._chat_buckets[message.chat_id].take(now)
+            task = asyncio.create_task(self._send(message))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send(self, message: _Message):
+        message.attempts += 1
+        try:
+            result = await self.bot.send_message(**message.kwargs)
+        except TelegramRetryAfter as e:
+            now = self.clock.monotonic()
+            logger.warning(f"Flood control, пауза {e.retry_after} с")
+            self._global_bucket.pause(now, e.retry_after)
+            self._chat_bucket(message.chat_id, now).pause(now, e.retry_after)
+            if message.attempts <= self.max_retries:
+                self.metrics.retried += 1
+                self._defer(message, now + e.retry_after)
+                self._wake()
+            else:
+                self.metrics.failed += 1
+                if not message.future.done():
+                    message.future.set_exception(e)
+        except Exception as e:
+            self.metrics.failed += 1
+            if not message.future.done():
+                message.future.set_exception(e)
+        else:
+            self.metrics.sent += 1
+            self.metrics.latencies.append(self.clock.time() - message.due_at)
+            if not message.future.done():
+                message.future.set_result(result)
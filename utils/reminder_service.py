@@ -1,59 +1,348 @@
 """
 Модуль для работы с напоминаниями
+
+Время срабатывания хранится как UTC timestamp. Время «на часах» (naive
+datetime) переводится в UTC по часовому поясу пользователя, поэтому
+напоминания «в 9:00» пользователей из разных поясов расходятся по разным
+часам UTC, а не срабатывают разом в одну секунду сервера.
 """
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
 import asyncio
+import heapq
+import itertools
+import logging
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+import database.async_db as adb
+from database.database import due_index
+from utils.clock import Clock, clock as default_clock
+from utils.reminder_dispatcher import ReminderDispatcher
+from utils.timezones import Zone, to_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Напоминания загружаются из базы окнами такой длины (в секундах)
+LOAD_WINDOW = 3600
+# За сколько секунд до конца окна подгружать следующее
+LOAD_AHEAD = 60
+# Пауза планировщика после ошибки (например, недоступной базы), в секундах
+SCHEDULER_RETRY_DELAY = 5
+
+
+class Reminder:
+    """Запланированное напоминание (компактная запись для кучи планировщика)"""
+
+    # seq — id строки в таблице reminders (или порядковый номер без базы)
+    __slots__ = ('user_id', 'habit_name', 'habit_id', 'fire_at', 'seq', 'cancelled')
+
+    def __init__(self, user_id: int, habit_name: str, habit_id, fire_at: float, seq: int):
+        self.user_id = user_id
+        self.habit_name = habit_name
+        self.habit_id = habit_id
+        self.fire_at = fire_at
+        self.seq = seq
+        self.cancelled = False
+
+    def __lt__(self, other: "Reminder") -> bool:
+        # Порядок в куче: время срабатывания, затем порядок постановки
+        return (self.fire_at, self.seq) < (other.fire_at, other.seq)
+
+    @property
+    def reminder_id(self) -> str:
+        return f"{self.user_id}_{self.habit_id}_{self.fire_at}"
+
+    @property
+    def reminder_time(self) -> datetime:
+        """Момент срабатывания (aware datetime в UTC)"""
+        return datetime.fromtimestamp(self.fire_at, timezone.utc)
+
+    def as_dict(self) -> Dict:
+        return {
+            'reminder_id': self.reminder_id,
+            'user_id': self.user_id,
+            'habit_name': self.habit_name,
+            'habit_id': self.habit_id,
+            'reminder_time': self.reminder_time
+        }
+
 
 class ReminderService:
     """Сервис для управления напоминаниями"""
     
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, persistent: bool = True, load_window: float = LOAD_WINDOW,
+                 dispatcher: Optional[ReminderDispatcher] = None, clock: Optional[Clock] = None):
         self.bot = bot
-        self.active_reminders = {}
-        self.reminder_tasks = {}
+        # Время и таймеры — из часов: SimulatedClock прокручивает планировщик без ожидания
+        self.clock = clock or default_clock
+        # Отправка идёт через очередь с ограничением частоты Telegram
+        self.dispatcher = dispatcher or ReminderDispatcher(bot, clock=self.clock)
+        # persistent=False — только память (без базы данных), для бенчмарков
+        self.persistent = persistent
+        self.load_window = load_window
+        # Min-куча напоминаний по времени срабатывания. Отменённые записи
+        # помечаются и удаляются лениво, когда оказываются на вершине
+        self._heap: List[Reminder] = []
+        self._seq = itertools.count(1)
+        self._active_count = 0
+        # Напоминания с fire_at < _horizon загружены в кучу, остальные ждут в базе
+        self._horizon = 0.0 if persistent else float('inf')
+        # Вторичный индекс загруженных напоминаний: user_id -> habit_id -> {seq: Reminder}
+        self._by_user: Dict[int, Dict[str, Dict[int, Reminder]]] = {}
+        # Future, которого ждёт спящий планировщик; завершается при пробуждении
+        self._waiter: Optional[asyncio.Future] = None
+        self._scheduler_task: Optional[asyncio.Task] = None
+        self._send_tasks = set()
+        # Индекс сроков получил срок внутри загруженного окна (новая привычка,
+        # отметка): планировщик заберёт его на следующем шаге, не дожидаясь окна
+        self._due_pending = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    async def start(self):
+        """
+        Восстанавливает напоминания после перезапуска и запускает планировщик.
+        Загружается только ближайшее окно, остальное подгружается по мере хода времени
+        """
+        if self.persistent:
+            stale = await adb.drop_stale_reminders()
+            if stale:
+                logger.warning(f"Пропущено {stale} напоминаний, отправка которых прервалась при остановке")
+            self._loop = asyncio.get_running_loop()
+            due_index.listener = self._on_due_added
+            await self._load_next_window()
+        self._ensure_scheduler()
     
     async def schedule_reminder(self, user_id: int, habit_name: str, 
-                              reminder_time: datetime, habit_id: str = None):
+                              reminder_time: datetime, habit_id: str = None, tz: Zone = None):
         """
-        Планирует напоминание о привычке
+        Планирует напоминание о привычке. Naive reminder_time — время на часах
+        пользователя в поясе tz (None — пояс по умолчанию), aware — точный момент
         """
-        reminder_id = f"{user_id}_{habit_id}_{reminder_time.timestamp()}"
-        
-        # Вычисляем задержку до напоминания
-        delay = (reminder_time - datetime.now()).total_seconds()
+        fire_at = to_timestamp(reminder_time, tz)
         
-        if delay <= 0:
+        if fire_at <= self.clock.time():
             # Напоминание уже просрочено
             return False
         
-        # Создаем задачу напоминания
-        task = asyncio.create_task(
-            self._send_reminder(user_id, habit_name, habit_id, delay)
-        )
+        if self.persistent:
+            seq = await adb.add_reminder(user_id, habit_id, habit_name, fire_at)
+            if fire_at >= self._horizon:
+                # Загрузится из базы вместе со своим окном
+                return True
+        else:
+            seq = next(self._seq)
         
-        self.reminder_tasks[reminder_id] = task
-        self.active_reminders[reminder_id] = {
-            'user_id': user_id,
-            'habit_name': habit_name,
-            'habit_id': habit_id,
-            'reminder_time': reminder_time
-        }
+        reminder = self._push(Reminder(user_id, habit_name, habit_id, fire_at, seq))
+        
+        self._ensure_scheduler()
+        # Будим планировщик, только если новое напоминание стало ближайшим
+        if reminder is not None and self._heap[0] is reminder:
+            self._wake()
         
         return True
     
-    async def _send_reminder(self, user_id: int, habit_name: str, 
-                           habit_id: str, delay: float):
+    def _push(self, reminder: Reminder) -> Optional[Reminder]:
+        """Кладёт напоминание в кучу и индекс, если оно ещё не загружено"""
+        habits = self._by_user.get(reminder.user_id)
+        if habits is None:
+            habits = self._by_user[reminder.user_id] = {}
+        habit_key = str(reminder.habit_id)
+        bucket = habits.get(habit_key)
+        if bucket is None:
+            bucket = habits[habit_key] = {}
+        elif reminder.seq in bucket:
+            return None
+        bucket[reminder.seq] = reminder
+        heapq.heappush(self._heap, reminder)
+        self._active_count += 1
+        return reminder
+    
+    def _forget(self, reminder: Reminder):
+        """Убирает напоминание из индекса (из кучи оно уходит отдельно)"""
+        habits = self._by_user[reminder.user_id]
+        habit_key = str(reminder.habit_id)
+        bucket = habits[habit_key]
+        del bucket[reminder.seq]
+        if not bucket:
+            del habits[habit_key]
+            if not habits:
+                del self._by_user[reminder.user_id]
+        self._active_count -= 1
+    
+    def _loaded_user_reminders(self, user_id: int) -> List[Reminder]:
+        """Загруженные напоминания пользователя за O(число его напоминаний)"""
+        habits = self._by_user.get(user_id)
+        if not habits:
+            return []
+        return [r for bucket in habits.values() for r in bucket.values()]
+    
+    async def _load_next_window(self):
+        """Подгружает из базы напоминания следующего временного окна"""
+        from_ts = self._horizon
+        # Горизонт сдвигаем до запроса: напоминания, созданные во время
+        # загрузки, попадут в кучу либо напрямую, либо из результата запроса
+        self._horizon = max(from_ts, self.clock.time()) + self.load_window
+        try:
+            rows = await adb.get_pending_reminders(from_ts, self._horizon)
+        except Exception:
+            # Окно не загружено — повторим с того же места
+            self._horizon = from_ts
+            raise
+        for reminder_id, user_id, habit_id, habit_name, fire_at in rows:
+            self._push(Reminder(user_id, habit_name, habit_id, fire_at, reminder_id))
+        await self._remind_due_habits()
+    
+    async def _remind_due_habits(self):
+        """
+        Планирует напоминания о привычках, срок которых наступает до конца
+        окна (по индексу сроков). Привычка вернётся в индекс со следующим сроком
+        """
+        self._due_pending = False
+        due = due_index.pop_due(self._horizon)
+        if not due:
+            return
+        # Напоминание сохраняется вместе с переносом срока в базе: после
+        # перезапуска загрузится оно, а не ещё одно по тому же сроку
+        try:
+            claimed = await adb.claim_due_habits(due, self.clock.time())
+        except Exception:
+            # Сроки возвращаются в индекс и будут забраны при следующей попытке
+            for due_at, habit_id in due:
+                due_index.update(habit_id, due_at)
+            raise
+        for reminder_id, telegram_id, habit_id, habit_name, fire_at in claimed:
+            self._push(Reminder(telegram_id, habit_name, str(habit_id), fire_at, reminder_id))
+    
+    def _on_due_added(self, due_at: float):
+        """Слушатель индекса сроков; вызывается из потока базы данных"""
+        if due_at < self._horizon:
+            self._loop.call_soon_threadsafe(self._due_added)
+    
+    def _due_added(self):
+        self._due_pending = True
+        self._wake()
+    
+    def _ensure_scheduler(self):
+        """Запускает цикл планировщика, если он ещё не работает"""
+        if self._scheduler_task is None or self._scheduler_task.done():
+            self._scheduler_task = asyncio.create_task(self._scheduler_loop())
+    
+    async def stop(self):
+        """Останавливает планировщик (при завершении бота)"""
+        if due_index.listener == self._on_due_added:
+            due_index.listener = None
+        if self._scheduler_task is not None:
+            self._scheduler_task.cancel()
+            await asyncio.gather(self._scheduler_task, return_exceptions=True)
+            self._scheduler_task = None
+        # Уже переданные в Telegram сообщения дожидаемся, остальные снимаются
+        # с очереди и возвращаются в базу до следующего запуска
+        await self.dispatcher.stop()
+        if self._send_tasks:
+            await asyncio.gather(*self._send_tasks, return_exceptions=True)
+    
+    async def _scheduler_loop(self):
+        """
+        Единый цикл планировщика: спит до ближайшего напоминания
+        и отправляет все, время которых наступило. Ошибка шага (например,
+        базы данных) записывается в лог, и цикл продолжается после паузы
+        """
+        while True:
+            try:
+                await self._scheduler_step()
+            except Exception:
+                logger.exception("Ошибка планировщика напоминаний")
+                await self._pause(SCHEDULER_RETRY_DELAY)
+    
+    async def _scheduler_step(self):
+        """Один шаг планировщика: загрузка окна, сроки привычек, сон или отправка"""
+        self._drop_cancelled_head()
+        now = self.clock.time()
+        
+        load_at = self._horizon - LOAD_AHEAD
+        if now >= load_at:
+            await self._load_next_window()
+            return
+        if self._due_pending:
+            await self._remind_due_habits()
+            return
+        
+        wake_at = min(self._heap[0].fire_at if self._heap else load_at, load_at)
+        if wake_at > now:
+            await self._sleep(None if wake_at == float('inf') else wake_at - now)
+            return
+        
+        reminder = heapq.heappop(self._heap)
+        self._forget(reminder)
+        task = asyncio.create_task(self._deliver(reminder))
+        self._send_tasks.add(task)
+        task.add_done_callback(self._send_tasks.discard)
+    
+    async def _pause(self, delay: float):
+        """Пауза после ошибки: в отличие от _sleep, новые напоминания её не прерывают"""
+        done = asyncio.get_running_loop().create_future()
+        timer = self.clock.call_later(delay, lambda: done.done() or done.set_result(None))
+        try:
+            await done
+        finally:
+            timer.cancel()
+    
+    async def _sleep(self, timeout: Optional[float]):
+        """Спит timeout секунд (None — без ограничения) или до вызова _wake"""
+        self._waiter = asyncio.get_running_loop().create_future()
+        timer = self.clock.call_later(timeout, self._wake) if timeout is not None else None
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+            if timer is not None:
+                timer.cancel()
+    
+    def _wake(self):
+        """Будит планировщик, чтобы он пересчитал время ближайшего срабатывания"""
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+    
+    async def _deliver(self, reminder: Reminder):
+        """
+        Отправляет напоминание ровно один раз: перед отправкой оно помечается
+        в базе как отправляемое, после — удаляется
+        """
+        if self.persistent and not await adb.claim_reminder(reminder.seq):
+            # Отменено в базе или уже отправляется
+            return
+        try:
+            await self._send_reminder(reminder)
+        except asyncio.CancelledError:
+            # Не успели отправить до остановки бота — отправим после перезапуска
+            if self.persistent:
+                await adb.release_reminder(reminder.seq)
+            raise
+        if self.persistent:
+            await adb.finish_reminder(reminder.seq)
+    
+    def _drop_cancelled_head(self):
+        """Убирает отменённые напоминания с вершины кучи"""
+        heap = self._heap
+        while heap and heap[0].cancelled:
+            heapq.heappop(heap)
+    
+    def _mark_cancelled(self, reminder: Reminder):
+        """Отменяет напоминание за O(1); запись удалится из кучи позже"""
+        reminder.cancelled = True
+        self._forget(reminder)
+        # Если отменённых записей больше половины — перестраиваем кучу
+        if len(self._heap) > 2 * self._active_count + 64:
+            self._heap = [r for r in self._heap if not r.cancelled]
+            heapq.heapify(self._heap)
+    
+    async def _send_reminder(self, reminder: Reminder):
         """
         Отправляет напоминание пользователю
         """
+        habit_id = reminder.habit_id
         try:
-            # Ждем до времени напоминания
-            await asyncio.sleep(delay)
-            
             # Создаем клавиатуру для быстрого ответа
             keyboard = InlineKeyboardMarkup(
                 inline_keyboard=[
@@ -78,72 +367,68 @@ class ReminderService:
             
             reminder_text = (
                 f"⏰ Напоминание о привычке\n\n"
-                f"📝 {habit_name}\n\n"
+                f"📝 {reminder.habit_name}\n\n"
                 f"Время выполнить привычку! 💪"
             )
             
-            await self.bot.send_message(
-                chat_id=user_id,
+            await self.dispatcher.send(
+                chat_id=reminder.user_id,
                 text=reminder_text,
-                reply_markup=keyboard
+                reply_markup=keyboard,
+                due_at=reminder.fire_at
             )
             
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            print(f"Ошибка при отправке напоминания: {e}")
-        finally:
-            # Удаляем задачу из активных
-            reminder_id = f"{user_id}_{habit_id}_{datetime.now().timestamp()}"
-            self.reminder_tasks.pop(reminder_id, None)
-            self.active_reminders.pop(reminder_id, None)
-    
-    def cancel_reminder(self, user_id: int, habit_id: str):
-        """
-        Отменяет напоминание
-        """
-        # Находим и отменяем задачу
-        for reminder_id, task in self.reminder_tasks.items():
-            if (reminder_id.startswith(f"{user_id}_{habit_id}") and 
-                not task.done()):
-                task.cancel()
-                del self.reminder_tasks[reminder_id]
-                del self.active_reminders[reminder_id]
-                return True
+            logger.error(f"Ошибка при отправке напоминания: {e}")
+    
+    async def cancel_reminder(self, user_id: int, habit_id: str):
+        """
+        Отменяет ближайшее напоминание пользователя по привычке
+        """
+        bucket = self._by_user.get(user_id, {}).get(str(habit_id))
+        if bucket:
+            reminder = min(bucket.values())
+            self._mark_cancelled(reminder)
+            if self.persistent:
+                await adb.cancel_reminders([reminder.seq])
+            return True
         
+        if self.persistent:
+            return await adb.cancel_next_reminder(user_id, habit_id)
         return False
     
-    def get_user_reminders(self, user_id: int) -> List[Dict]:
+    async def get_user_reminders(self, user_id: int) -> List[Dict]:
         """
         Получает список активных напоминаний пользователя
         """
-        user_reminders = []
-        for reminder_id, reminder_data in self.active_reminders.items():
-            if reminder_data['user_id'] == user_id:
-                user_reminders.append({
-                    'reminder_id': reminder_id,
-                    **reminder_data
-                })
-        
-        return user_reminders
+        if self.persistent:
+            rows = await adb.get_user_reminders(user_id)
+            return [
+                Reminder(user_id, habit_name, habit_id, fire_at, reminder_id).as_dict()
+                for reminder_id, user_id, habit_id, habit_name, fire_at in rows
+            ]
+        return [r.as_dict() for r in sorted(self._loaded_user_reminders(user_id))]
     
-    def cancel_all_user_reminders(self, user_id: int):
+    async def cancel_all_user_reminders(self, user_id: int):
         """
         Отменяет все напоминания пользователя
         """
-        cancelled_count = 0
-        for reminder_id, task in list(self.reminder_tasks.items()):
-            if (reminder_id.startswith(f"{user_id}_") and not task.done()):
-                task.cancel()
-                del self.reminder_tasks[reminder_id]
-                del self.active_reminders[reminder_id]
-                cancelled_count += 1
+        user_reminders = self._loaded_user_reminders(user_id)
+        for reminder in user_reminders:
+            self._mark_cancelled(reminder)
         
-        return cancelled_count
+        if self.persistent:
+            return await adb.cancel_user_reminders(user_id)
+        return len(user_reminders)
     
-    async def schedule_daily_reminders(self, user_id: int, habits: List[Dict]):
+    async def schedule_daily_reminders(self, user_id: int, habits: List[Dict], tz: Zone = None):
         """
         Планирует ежедневные напоминания для всех привычек пользователя
+        (reminder_time привычек — время на часах пользователя в поясе tz)
         """
-        current_time = datetime.now()
+        current_time = self.clock.now(tz)
         
         for habit in habits:
             if not habit.get('reminder_enabled', False):
@@ -156,7 +441,8 @@ class ReminderService:
                     user_id=user_id,
                     habit_name=habit['name'],
                     reminder_time=reminder_time,
-                    habit_id=habit.get('id', 'unknown')
+                    habit_id=habit.get('id', 'unknown'),
+                    tz=tz
                 )
     
     def _get_reminder_time(self, habit: Dict, current_time: datetime) -> Optional[datetime]:
@@ -168,21 +454,27 @@ class ReminderService:
         
         reminder_time = habit['reminder_time']
         
-        # Если время уже прошло сегодня, планируем на завтра
+        # Если время уже прошло сегодня, планируем на завтра. Сутки прибавляются
+        # к времени на часах, поэтому при переходе на летнее время напоминание
+        # остаётся в тот же час, а не сдвигается на час
         if reminder_time <= current_time:
             return reminder_time + timedelta(days=1)
         
         return reminder_time
     
-    def get_reminder_stats(self, user_id: int) -> Dict:
+    async def get_reminder_stats(self, user_id: int) -> Dict:
         """
         Получает статистику напоминаний пользователя
         """
-        user_reminders = self.get_user_reminders(user_id)
+        user_reminders = await self.get_user_reminders(user_id)
+        if self.persistent:
+            total_reminders = await adb.count_pending_reminders()
+        else:
+            total_reminders = self._active_count
         
         return {
             'active_reminders': len(user_reminders),
-            'total_reminders': len(self.active_reminders),
+            'total_reminders': total_reminders,
             'user_reminders': user_reminders
         }
 
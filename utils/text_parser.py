@@ -1,75 +1,124 @@
 """
 Модуль для парсинга текстовых данных
 """
+import itertools
+import os
 import re
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
+from .clock import Clock, clock as default_clock
 from .date_parser import date_parser
+from .timezones import Zone
+from .parse_cache import DayCache
+
+# Пакетный разбор: меньше этого числа текстов разбираем в текущем процессе,
+# больше — пулом процессов, пачками по CHUNK_SIZE текстов
+PARALLEL_THRESHOLD = 2000
+CHUNK_SIZE = 500
+
+# Парсер в процессе пула (см. TextParser.parse_many)
+_worker_parser = None
+
+# Символы, которые re.IGNORECASE сопоставляет буквам паттернов, хотя lower()
+# их не меняет (ı, ſ, старинные начертания кириллицы). В тексте с ними
+# наличие слова в нижнем регистре ничего не говорит о совпадении
+_CASE_FOLD_EXCEPTIONS = re.compile('[\u0131\u017f\u1c80-\u1c85]')
 
 
 class TextParser:
     """Класс для парсинга текстовых данных"""
     
-    def __init__(self):
-        # Паттерны для извлечения информации
-        self.patterns = {
+    def __init__(self, cache_size: int = 1024, clock: Optional[Clock] = None):
+        # Текущее время и «сегодня» берутся из часов (в бенчмарках — SimulatedClock)
+        self.clock = clock or default_clock
+        # Результаты разбора повторяющихся сообщений (0 — без кэша)
+        self.cache = DayCache(cache_size, today=self.clock.today)
+        
+        # Паттерны для извлечения информации. Рядом с каждым — кусок текста
+        # (в нижнем регистре), который входит в любое его совпадение: перед
+        # поиском проверяется, что он есть в тексте, и обычно это отсекает
+        # почти все паттерны проверкой подстроки, без запуска регулярки.
+        # Меняя паттерн, проверьте его кусок; '' — проверять нечего
+        self._table: Dict[str, List[Tuple[str, str]]] = {
             'frequency': [
-                r'каждый\s+день',
-                r'ежедневно',
-                r'раз\s+в\s+день',
-                r'каждый\s+(\d+)\s+дн(?:я|ей|ь)',
-                r'раз\s+в\s+(\d+)\s+дн(?:я|ей|ь)',
-                r'каждые\s+(\d+)\s+дн(?:я|ей|ь)',
-                r'каждую\s+неделю',
-                r'раз\s+в\s+неделю',
-                r'каждые\s+(\d+)\s+нед(?:елю|ели|ель)',
-                r'раз\s+в\s+(\d+)\s+нед(?:елю|ели|ель)',
-                r'каждый\s+месяц',
-                r'раз\s+в\s+месяц',
-                r'каждые\s+(\d+)\s+мес(?:яц|яца|яцев)',
-                r'раз\s+в\s+(\d+)\s+мес(?:яц|яца|яцев)',
+                (r'каждый\s+день', 'каждый'),
+                (r'ежедневно', 'ежедневно'),
+                (r'раз\s+в\s+день', 'день'),
+                (r'каждый\s+(\d+)\s+дн(?:я|ей|ь)', 'каждый'),
+                (r'раз\s+в\s+(\d+)\s+дн(?:я|ей|ь)', 'раз'),
+                (r'каждые\s+(\d+)\s+дн(?:я|ей|ь)', 'каждые'),
+                (r'каждую\s+неделю', 'неделю'),
+                (r'раз\s+в\s+неделю', 'неделю'),
+                (r'каждые\s+(\d+)\s+нед(?:елю|ели|ель)', 'каждые'),
+                (r'раз\s+в\s+(\d+)\s+нед(?:елю|ели|ель)', 'нед'),
+                (r'каждый\s+месяц', 'каждый'),
+                (r'раз\s+в\s+месяц', 'месяц'),
+                (r'каждые\s+(\d+)\s+мес(?:яц|яца|яцев)', 'каждые'),
+                (r'раз\s+в\s+(\d+)\s+мес(?:яц|яца|яцев)', 'мес'),
             ],
             'time': [
-                r'в\s+(\d{1,2}):(\d{2})',
-                r'в\s+(\d{1,2})\s+час(?:а|ов)?',
-                r'в\s+(\d{1,2})\s+утра',
-                r'в\s+(\d{1,2})\s+вечера',
-                r'утром',
-                r'днем',
-                r'вечером',
-                r'ночью',
+                (r'в\s+(\d{1,2}):(\d{2})', ':'),
+                (r'в\s+(\d{1,2})\s+час(?:а|ов)?', 'час'),
+                (r'в\s+(\d{1,2})\s+утра', 'утра'),
+                (r'в\s+(\d{1,2})\s+вечера', 'вечера'),
+                (r'утром', 'утром'),
+                (r'днем', 'днем'),
+                (r'вечером', 'вечером'),
+                (r'ночью', 'ночью'),
             ],
             'duration': [
-                r'(\d+)\s+мин(?:ут|уты|уты)?',
-                r'(\d+)\s+час(?:а|ов)?',
-                r'(\d+)\s+ч\.',
-                r'(\d+)\s+м\.',
+                (r'(\d+)\s+мин(?:ут|уты|уты)?', 'мин'),
+                (r'(\d+)\s+час(?:а|ов)?', 'час'),
+                (r'(\d+)\s+ч\.', 'ч.'),
+                (r'(\d+)\s+м\.', 'м.'),
             ],
             'reminder': [
-                r'напомни\s+мне',
-                r'напомнить',
-                r'уведомить',
-                r'уведомление',
+                (r'напомни\s+мне', 'напомни'),
+                (r'напомнить', 'напомнить'),
+                (r'уведомить', 'уведомить'),
+                (r'уведомление', 'уведомление'),
+            ]
+        }
+        self.patterns = {
+            category: [pattern for pattern, _literal in table]
+            for category, table in self._table.items()
+        }
+        
+        # Паттерны компилируются один раз
+        self._compiled = {
+            category: [
+                (pattern, re.compile(pattern), re.compile(pattern, re.IGNORECASE), literal)
+                for pattern, literal in table
             ]
+            for category, table in self._table.items()
         }
     
-    def parse_habit_text(self, text: str) -> Dict:
+    def parse_habit_text(self, text: str, tz: Zone = None) -> Dict:
         """
         Парсит текст привычки и извлекает структурированную информацию
+        (относительные даты — от сегодняшнего дня в поясе пользователя tz)
         """
-        result = {
-            'name': text.strip(),
-            'frequency': None,
-            'time': None,
-            'duration': None,
-            'reminder': False,
-            'dates': [],
-            'parsed_successfully': True,
-            'errors': []
+        # В разных поясах «завтра» — разные даты, поэтому день входит в ключ
+        key = (self.clock.today(tz), text)
+        result = self.cache.get_or_compute(key, lambda: self._parse_habit_text(text, tz))
+        # Результат из кэша общий — отдаём копию, чтобы его не испортили
+        return {
+            **result,
+            'frequency': dict(result['frequency']) if result['frequency'] else result['frequency'],
+            'time': dict(result['time']) if result['time'] else result['time'],
+            'duration': dict(result['duration']) if result['duration'] else result['duration'],
+            'dates': list(result['dates']),
+            'errors': list(result['errors']),
         }
+    
+    def _parse_habit_text(self, text: str, tz: Zone = None) -> Dict:
+        """Разбор текста без кэша"""
+        result = self._empty_result(text)
         
         # Извлекаем даты
-        dates = self._extract_dates(text)
+        dates = self._extract_dates(text, tz)
         result['dates'] = dates
         
         # Извлекаем частоту
@@ -92,32 +141,110 @@ class TextParser:
         
         return result
     
-    def _extract_dates(self, text: str) -> List[datetime]:
+    @staticmethod
+    def _empty_result(text: str) -> Dict:
+        """Результат разбора, в котором ничего не найдено"""
+        return {
+            'name': text.strip(),
+            'frequency': None,
+            'time': None,
+            'duration': None,
+            'reminder': False,
+            'dates': [],
+            'parsed_successfully': True,
+            'errors': []
+        }
+    
+    def parse_many(self, texts: Iterable[str], workers: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE,
+                   parallel_threshold: int = PARALLEL_THRESHOLD, tz: Zone = None) -> Iterator[Dict]:
+        """
+        Разбирает много текстов (например, список привычек из файла экспорта)
+        и возвращает результаты по одному в том же порядке
+        
+        Небольшие списки разбираются в текущем процессе. Большие — пулом
+        из workers процессов: тексты уходят в пул пачками по chunk_size,
+        чтобы пересылка между процессами не съедала выигрыш, а в работе
+        одновременно не больше двух пачек на процесс, поэтому texts может
+        быть и ленивым потоком строк. Текст, который не разобрался,
+        не прерывает импорт: в его результате parsed_successfully=False
+        и текст ошибки в errors.
+        Генератор выполняется синхронно — из обработчиков его стоит
+        запускать в отдельном потоке (loop.run_in_executor)
+        """
+        texts = iter(texts)
+        head = list(itertools.islice(texts, parallel_threshold))
+        if len(head) < parallel_threshold:
+            for text in head:
+                yield self._parse_or_error(text, tz)
+            return
+        
+        workers = workers or os.cpu_count() or 1
+        chunks = self._chunks(itertools.chain(head, texts), chunk_size)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,))
+        try:
+            pending = deque(pool.submit(_parse_chunk, chunk, tz) for chunk in itertools.islice(chunks, workers * 2))
+            while pending:
+                results = pending.popleft().result()
+                # На место готовой пачки отправляем следующую
+                for chunk in itertools.islice(chunks, 1):
+                    pending.append(pool.submit(_parse_chunk, chunk, tz))
+                yield from results
+        finally:
+            # Если результаты перестали читать, невыполненные пачки отменяются
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    @staticmethod
+    def _chunks(texts: Iterator[str], size: int) -> Iterator[List[str]]:
+        """Нарезает поток текстов на списки по size штук"""
+        while True:
+            chunk = list(itertools.islice(texts, size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def _parse_or_error(self, text: str, tz: Zone = None) -> Dict:
+        """Разбор текста, при ошибке — пустой результат с её описанием"""
+        try:
+            return self.parse_habit_text(text, tz)
+        except ValueError as e:
+            result = self._empty_result(text)
+            result['parsed_successfully'] = False
+            result['errors'].append(f"Не удалось разобрать: {e}")
+            return result
+    
+    def _extract_dates(self, text: str, tz: Zone = None) -> List[datetime]:
         """Извлекает даты из текста"""
-        dates = []
-        words = text.split()
-        
-        # Проверяем каждое слово и комбинации слов
-        for i in range(len(words)):
-            for j in range(i + 1, min(i + 5, len(words) + 1)):
-                phrase = ' '.join(words[i:j])
-                date = date_parser.parse_date(phrase)
-                if date:
-                    is_valid, error = date_parser.validate_date(date)
-                    if is_valid:
-                        dates.append(date)
-                    else:
-                        # Пропускаем невалидные даты
-                        pass
-        
-        return dates
+        return [date for date, _span in self.extract_date_spans(text, tz)]
+    
+    def extract_date_spans(self, text: str, tz: Zone = None) -> List[Tuple[datetime, Tuple[int, int]]]:
+        """
+        Извлекает даты вместе с их позициями в тексте за один проход.
+        Пересекающиеся совпадения не дублируются, одинаковые даты не повторяются
+        """
+        result = []
+        seen = set()
+        # Время запрашивается один раз на весь текст, а не на каждую дату
+        now = self.clock.now(tz)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        for date, span in date_parser.find_dates(text, midnight):
+            if date in seen:
+                continue
+            is_valid, _error = date_parser.validate_date(date, tz, now)
+            if is_valid:
+                seen.add(date)
+                result.append((date, span))
+        
+        return result
     
     def _extract_frequency(self, text: str) -> Optional[Dict]:
         """Извлекает информацию о частоте"""
         text_lower = text.lower()
         
-        for pattern in self.patterns['frequency']:
-            match = re.search(pattern, text_lower)
+        for pattern, compiled, _ignorecase, literal in self._compiled['frequency']:
+            if literal not in text_lower:
+                continue
+            match = compiled.search(text_lower)
             if match:
                 if 'каждый день' in pattern or 'ежедневно' in pattern or 'раз в день' in pattern:
                     return {'type': 'daily', 'interval': 1}
@@ -141,8 +268,10 @@ class TextParser:
         """Извлекает информацию о времени"""
         text_lower = text.lower()
         
-        for pattern in self.patterns['time']:
-            match = re.search(pattern, text_lower)
+        for pattern, compiled, _ignorecase, literal in self._compiled['time']:
+            if literal not in text_lower:
+                continue
+            match = compiled.search(text_lower)
             if match:
                 if ':' in pattern:
                     hour, minute = map(int, match.groups())
@@ -171,8 +300,10 @@ class TextParser:
         """Извлекает информацию о продолжительности"""
         text_lower = text.lower()
         
-        for pattern in self.patterns['duration']:
-            match = re.search(pattern, text_lower)
+        for pattern, compiled, _ignorecase, literal in self._compiled['duration']:
+            if literal not in text_lower:
+                continue
+            match = compiled.search(text_lower)
             if match:
                 value = int(match.group(1))
                 if 'мин' in pattern:
@@ -186,8 +317,8 @@ class TextParser:
         """Проверяет, есть ли в тексте запрос на напоминание"""
         text_lower = text.lower()
         
-        for pattern in self.patterns['reminder']:
-            if re.search(pattern, text_lower):
+        for _pattern, compiled, _ignorecase, literal in self._compiled['reminder']:
+            if literal in text_lower and compiled.search(text_lower):
                 return True
         
         return False
@@ -195,24 +326,39 @@ class TextParser:
     def _clean_habit_name(self, text: str, parsed_data: Dict) -> str:
         """Очищает название привычки от служебной информации"""
         cleaned = text
+        cleaned_lower = text.lower()
+        # Без особых символов паттерн без учёта регистра может совпасть,
+        # только если его обязательный кусок есть в тексте в нижнем регистре
+        check_literals = not _CASE_FOLD_EXCEPTIONS.search(text)
         
-        # Удаляем временные маркеры
-        for pattern in self.patterns['time']:
-            cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
-        
-        # Удаляем маркеры продолжительности
-        for pattern in self.patterns['duration']:
-            cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
+        # Удаляем временные маркеры, затем маркеры продолжительности и напоминаний.
+        # Замены идут по очереди: удаление одного маркера может склеить другой,
+        # поэтому куски проверяются в тексте после предыдущих замен
+        for category in ('time', 'duration', 'reminder'):
+            for _pattern, _compiled, ignorecase, literal in self._compiled[category]:
+                if check_literals and literal not in cleaned_lower:
+                    continue
+                replaced = ignorecase.sub('', cleaned)
+                if replaced != cleaned:
+                    cleaned = replaced
+                    cleaned_lower = cleaned.lower()
         
-        # Удаляем маркеры напоминаний
-        for pattern in self.patterns['reminder']:
-            cleaned = re.sub(pattern, '', cleaned, flags=re.IGNORECASE)
-        
-        # Удаляем лишние пробелы
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+        # Удаляем лишние пробелы: split() делит по тем же пробельным символам, что и \s
+        cleaned = ' '.join(cleaned.split())
         
         return cleaned if cleaned else text
 
 
+def _init_worker(parser: TextParser):
+    """Запоминает парсер в процессе пула"""
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _parse_chunk(texts: List[str], tz: Zone = None) -> List[Dict]:
+    """Разбирает пачку текстов в процессе пула"""
+    return [_worker_parser._parse_or_error(text, tz) for text in texts]
+
+
 # Создаем глобальный экземпляр парсера
 text_parser = TextParser()
@@ -0,0 +1,74 @@
+"""
+Часовые пояса пользователей
+
+У каждого пользователя свой часовой пояс (users.timezone, имя из базы IANA,
+например "Asia/Yekaterinburg"); если он не задан — пояс по умолчанию из
+config.DEFAULT_TIMEZONE. «Сегодня», «завтра» и полночь считаются в поясе
+пользователя, а моменты срабатывания напоминаний хранятся как UTC
+timestamp, поэтому «в 9:00» пользователей из разных поясов попадает в разные
+минуты UTC, а не в одну секунду на сервере.
+
+Время «на часах» пользователя (naive datetime) переводится в UTC с учётом
+перехода на летнее время: несуществующее время (весенний переход) сдвигается
+вперёд на длину перехода, неоднозначное (осенний) берётся первым.
+Текущее время и «сегодня» в поясе — у часов (utils.clock).
+"""
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from typing import Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = "Europe/Moscow"
+
+# Имя пояса, объект tzinfo или None — пояс по умолчанию
+Zone = Union[str, tzinfo, None]
+
+_default_zone: tzinfo = ZoneInfo(DEFAULT_TIMEZONE)
+
+
+@lru_cache(maxsize=None)
+def _zone_by_name(name: str) -> tzinfo:
+    return ZoneInfo(name)
+
+
+def is_valid_timezone(name: str) -> bool:
+    """Есть ли такой пояс в базе часовых поясов"""
+    try:
+        _zone_by_name(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def set_default_timezone(name: str):
+    """Задаёт пояс по умолчанию (из конфигурации при запуске бота)"""
+    global _default_zone
+    _default_zone = _zone_by_name(name)
+
+
+def get_zone(zone: Zone = None) -> tzinfo:
+    """tzinfo по имени пояса; None и неизвестное имя — пояс по умолчанию"""
+    if zone is None:
+        return _default_zone
+    if isinstance(zone, tzinfo):
+        return zone
+    try:
+        return _zone_by_name(zone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return _default_zone
+
+
+def to_timestamp(moment: datetime, zone: Zone = None) -> float:
+    """
+    UTC timestamp момента. Naive datetime — время на часах пользователя
+    в поясе zone, aware — переводится как есть
+    """
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=get_zone(zone))
+    return moment.timestamp()
+
+
+def from_timestamp(timestamp: float, zone: Zone = None) -> datetime:
+    """Время на часах пользователя (naive datetime) для UTC timestamp"""
+    return datetime.fromtimestamp(timestamp, get_zone(zone)).replace(tzinfo=None)
+